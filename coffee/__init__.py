@@ -1,8 +1,23 @@
 """Tools for scraping and analyzing CoffeeReview.com data.
 
 This package implements the scraping half of the pipeline: discovering review
-URLs (:mod:`review_urls`), fetching them (:mod:`fetch`), and parsing each page
-into structured records (:mod:`review_scraper`, :mod:`parser`), plus shared
-configuration (:mod:`config`) and helpers (:mod:`utils`). Data cleaning and
-analysis live in the project's notebooks.
+URLs (:mod:`review_urls`, or :mod:`sitemaps` incrementally), fetching them
+(:mod:`fetch`, with failures queued in :mod:`dead_letters`), and parsing each
+changed page (:mod:`changes`) into typed records (:mod:`review_scraper`,
+:mod:`parser`, :mod:`records`), roaster-name resolution (:mod:`roasters`),
+typed Parquet storage of the results (:mod:`storage`), plus shared
+configuration (:mod:`config`) and helpers (:mod:`utils`). The runnable steps
+are subcommands of the ``coffee`` command (:mod:`cli`, :mod:`commands`), and
+:mod:`pipeline` runs them as a DAG, rebuilding only what changed.
+:mod:`profiling` holds the opt-in CPU and memory profiling hooks they share,
+and :mod:`stub_server` a synthetic CoffeeReview.com to scrape for load and
+fault testing.
+
+Roaster locations are geocoded by :mod:`geocode`, offline where it can.
+
+Reusable text preprocessing and features for the analysis live in :mod:`text`
+and :mod:`tfidf`, lexicon-based flavor descriptors in :mod:`flavors`, with
+similar-review search in :mod:`similar` and incrementally maintained EDA
+rollups in :mod:`aggregates`; data cleaning and exploration live in the
+project's notebooks.
 """
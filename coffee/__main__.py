@@ -0,0 +1,5 @@
+"""Run the ``coffee`` command line as ``python -m coffee``."""
+
+from coffee.cli import main
+
+main()
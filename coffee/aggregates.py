@@ -0,0 +1,360 @@
+"""Incrementally maintained rollups for the EDA: per-year ratings, prices, counts.
+
+The EDA notebook recomputes the same handful of summaries from the full
+cleaned CSV on every run. :class:`AggregateStore` keeps them instead as
+mergeable partial states, per review year:
+
+- moments: count, sum, sum of squares, min and max of a numeric column, from
+  which mean, variance and standard deviation follow exactly;
+- histograms: counts over fixed bin edges, from which approximate quantiles
+  follow;
+- counts: occurrences of each value of a categorical column.
+
+Every one of these merges by addition (min/max by min/max), so a new scrape
+batch is summarized on its own and folded into the stored state; nothing is
+recomputed from the corpus. Readers load one small Parquet file whose size
+depends on the number of years and bins, not the number of reviews.
+
+Reviews are ingested once, by key (the review URL): keys already in the store
+are skipped, so feeding an overlapping batch doesn't double count. Because
+min/max can't be un-merged, a changed review isn't corrected in place; rebuild
+the store from scratch after a re-clean.
+
+On disk the store is a directory::
+
+    state.parquet   one long table of partial states, rollup x year x value/bin
+    keys.txt        ingested review keys, one per line
+
+``state.parquet`` is replaced atomically and records how many keys it covers,
+so keys appended by an interrupted update are ignored on the next load.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from coffee.config import Config
+from coffee.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE = Config.DATA_DIR / "processed" / "aggregates"
+KEYS_METADATA = b"n_keys"
+
+STATE_COLUMNS = [
+    "rollup",
+    "year",
+    "value",
+    "bin",
+    "count",
+    "sum",
+    "sumsq",
+    "min",
+    "max",
+]
+GROUP_COLUMNS = ["rollup", "year", "value", "bin"]
+
+
+@dataclass(frozen=True)
+class Rollup:
+    """A summary kept per review year.
+
+    With `bins`, `column` is numeric and gets moments plus a histogram over
+    those edges (values past the last edge land in the last bin). Without,
+    `column` is categorical and its values are counted; `split` counts each
+    part of a delimited value (e.g. "ethiopia;kenya") separately.
+    """
+
+    name: str
+    column: str
+    bins: Sequence[float] | np.ndarray | None = None
+    split: str | None = None
+    edges: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        edges = np.asarray(self.bins if self.bins is not None else [], dtype=float)
+        object.__setattr__(self, "edges", edges)
+
+    @property
+    def numeric(self) -> bool:
+        return self.bins is not None
+
+
+# Ratings are integers, so one bin per point; prices are binned at $5/lb up
+# to $1000/lb, past which the EDA treats them as outliers anyway.
+DEFAULT_ROLLUPS = (
+    Rollup("rating", "rating", bins=np.arange(0, 102)),
+    Rollup("price_per_lb", "price_usd_adj_per_lb", bins=np.arange(0, 1005, 5)),
+    Rollup("origin_country", "origin_country", split=";"),
+    Rollup("roaster_country", "roaster_country"),
+    Rollup("roast_level", "roast_level"),
+)
+
+
+def _years(df: pd.DataFrame) -> pd.Series:
+    if "year" in df:
+        return pd.to_numeric(df["year"], errors="coerce")
+    return pd.to_datetime(df["review_date"], errors="coerce").dt.year
+
+
+def _numeric_partials(
+    rollup: Rollup, years: pd.Series, values: pd.Series
+) -> pd.DataFrame:
+    frame = pd.DataFrame({"year": years, "x": pd.to_numeric(values, errors="coerce")})
+    frame = frame.dropna()
+    moments = (
+        frame.assign(x2=frame["x"] ** 2)
+        .groupby("year")
+        .agg(
+            count=("x", "size"),
+            sum=("x", "sum"),
+            sumsq=("x2", "sum"),
+            min=("x", "min"),
+            max=("x", "max"),
+        )
+        .reset_index()
+    )
+    edges = rollup.edges
+    bins = np.clip(
+        np.searchsorted(edges, frame["x"], side="right") - 1, 0, len(edges) - 2
+    )
+    histogram = (
+        frame.assign(bin=bins)
+        .groupby(["year", "bin"])
+        .size()
+        .rename("count")
+        .reset_index()
+    )
+    return pd.concat([moments, histogram], ignore_index=True)
+
+
+def _count_partials(
+    rollup: Rollup, years: pd.Series, values: pd.Series
+) -> pd.DataFrame:
+    frame = pd.DataFrame({"year": years, "value": values}).dropna()
+    frame["value"] = frame["value"].astype(str)
+    if rollup.split is not None:
+        frame = frame.assign(value=frame["value"].str.split(rollup.split)).explode(
+            "value"
+        )
+    frame["value"] = frame["value"].str.strip()
+    frame = frame[frame["value"] != ""]
+    return frame.groupby(["year", "value"]).size().rename("count").reset_index()
+
+
+def partials(
+    df: pd.DataFrame, rollups: Iterable[Rollup] = DEFAULT_ROLLUPS
+) -> pd.DataFrame:
+    """Partial states for `df` alone, in the store's long format.
+
+    `df` needs a ``year`` or ``review_date`` column. Rollups whose column is
+    missing from `df` are skipped with a warning.
+    """
+    years = _years(df)
+    parts = []
+    for rollup in rollups:
+        if rollup.column not in df:
+            logger.warning(
+                "No %r column; skipping the %s rollup", rollup.column, rollup.name
+            )
+            continue
+        build = _numeric_partials if rollup.numeric else _count_partials
+        parts.append(build(rollup, years, df[rollup.column]).assign(rollup=rollup.name))
+    if not parts:
+        return pd.DataFrame(columns=STATE_COLUMNS)
+    return pd.concat(parts, ignore_index=True).reindex(columns=STATE_COLUMNS)
+
+
+def merge(*states: pd.DataFrame) -> pd.DataFrame:
+    """Combine partial states: counts and sums add, min/max take the extreme."""
+    frames = [s for s in states if not s.empty]
+    if not frames:
+        return pd.DataFrame(columns=STATE_COLUMNS)
+    combined = pd.concat(frames, ignore_index=True)
+    merged = (
+        combined.groupby(GROUP_COLUMNS, dropna=False, sort=True)
+        .agg(
+            count=("count", "sum"),
+            sum=("sum", lambda s: s.sum(min_count=1)),
+            sumsq=("sumsq", lambda s: s.sum(min_count=1)),
+            min=("min", "min"),
+            max=("max", "max"),
+        )
+        .reset_index()
+    )
+    return merged.reindex(columns=STATE_COLUMNS)
+
+
+class AggregateStore:
+    """Per-year rollups on disk, updated batch by batch."""
+
+    def __init__(
+        self, path: Path = DEFAULT_STORE, rollups: Sequence[Rollup] = DEFAULT_ROLLUPS
+    ):
+        self.path = Path(path)
+        self.rollups = {r.name: r for r in rollups}
+        state_path = self.path / "state.parquet"
+        self.n_keys = 0
+        if state_path.exists():
+            table = pq.read_table(state_path)
+            self.n_keys = int((table.schema.metadata or {}).get(KEYS_METADATA, b"0"))
+            self.state = table.to_pandas()
+        else:
+            self.state = pd.DataFrame(columns=STATE_COLUMNS)
+        self._seen: set[str] | None = None
+
+    def __len__(self) -> int:
+        return self.n_keys
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.seen
+
+    @property
+    def seen(self) -> set[str]:
+        """Keys of every ingested review (read on first use; readers never need it)."""
+        if self._seen is None:
+            keys_path = self.path / "keys.txt"
+            keys = keys_path.read_text().splitlines() if keys_path.exists() else []
+            if len(keys) > self.n_keys:
+                # Appended by an update whose state never landed; drop them.
+                logger.warning(
+                    "Discarding %d uncommitted keys", len(keys) - self.n_keys
+                )
+                keys = keys[: self.n_keys]
+                keys_path.write_text("".join(f"{k}\n" for k in keys))
+            self._seen = set(keys)
+        return self._seen
+
+    # -- writing -------------------------------------------------------------
+
+    @profiled("aggregates.update")
+    def update(self, df: pd.DataFrame, key: str = "url") -> int:
+        """Fold the reviews in `df` not seen before into the store.
+
+        Returns how many reviews were added. `df` is a batch of cleaned
+        reviews with the rollups' columns (see :data:`DEFAULT_ROLLUPS`).
+        """
+        fresh = df[~df[key].isin(self.seen)].drop_duplicates(key)
+        if fresh.empty:
+            return 0
+        self.state = merge(self.state, partials(fresh, self.rollups.values()))
+        new_keys = fresh[key].astype(str).tolist()
+        self._save(new_keys)
+        logger.info(
+            "Added %d reviews to %s (%d total)", len(fresh), self.path, len(self)
+        )
+        return len(fresh)
+
+    def _save(self, new_keys: list[str]) -> None:
+        self.seen.update(new_keys)  # load before keys.txt grows
+        self.n_keys += len(new_keys)
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / "keys.txt", "a", encoding="utf-8") as f:
+            f.writelines(f"{k}\n" for k in new_keys)
+
+        table = pa.Table.from_pandas(
+            self.state.astype({"year": "Int16", "bin": "Int16", "value": "string"}),
+            preserve_index=False,
+        )
+        table = table.replace_schema_metadata(
+            {
+                **(table.schema.metadata or {}),
+                KEYS_METADATA: str(self.n_keys).encode(),
+            }
+        )
+        tmp = self.path / "state.parquet.tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, self.path / "state.parquet")
+
+    # -- reading -------------------------------------------------------------
+
+    def _select(self, name: str, years: Iterable[int] | None) -> pd.DataFrame:
+        if name not in self.rollups:
+            raise KeyError(f"Unknown rollup {name!r}; have {sorted(self.rollups)}")
+        rows = self.state[self.state["rollup"] == name]
+        if years is not None:
+            rows = rows[rows["year"].isin(list(years))]
+        return rows
+
+    def moments(self, name: str) -> pd.DataFrame:
+        """Per-year count, mean, std, min and max of a numeric rollup."""
+        rows = self._select(name, None)
+        rows = rows[rows["bin"].isna()].set_index("year").sort_index()
+        return _describe(rows)
+
+    def overall(self, name: str, years: Iterable[int] | None = None) -> pd.Series:
+        """Moments of a numeric rollup across all (or the given) years."""
+        rows = self._select(name, years)
+        rows = rows[rows["bin"].isna()]
+        total = rows[["count", "sum", "sumsq"]].sum().to_frame().T
+        total["min"], total["max"] = rows["min"].min(), rows["max"].max()
+        return _describe(total).iloc[0]
+
+    def histogram(self, name: str, years: Iterable[int] | None = None) -> pd.DataFrame:
+        """Bin edges and counts of a numeric rollup, summed over `years`."""
+        edges = self.rollups[name].edges
+        rows = self._select(name, years)
+        counts = (
+            rows[rows["bin"].notna()]
+            .groupby("bin")["count"]
+            .sum()
+            .reindex(range(len(edges) - 1), fill_value=0)
+        )
+        return pd.DataFrame(
+            {"left": edges[:-1], "right": edges[1:], "count": counts.to_numpy()}
+        )
+
+    def quantile(
+        self, name: str, q: float | Sequence[float], years: Iterable[int] | None = None
+    ) -> np.ndarray:
+        """Approximate quantiles, interpolated linearly within histogram bins."""
+        hist = self.histogram(name, years)
+        cumulative = np.concatenate([[0], np.cumsum(hist["count"])])
+        if cumulative[-1] == 0:
+            return np.full(np.shape(q), np.nan)
+        edges = np.concatenate([hist["left"], hist["right"].iloc[-1:]])
+        return np.interp(np.asarray(q) * cumulative[-1], cumulative, edges)
+
+    def counts(self, name: str, years: Iterable[int] | None = None) -> pd.Series:
+        """Occurrences per value of a categorical rollup, most common first."""
+        rows = self._select(name, years)
+        return (
+            rows.groupby("value")["count"]
+            .sum()
+            .astype(int)
+            .sort_values(ascending=False)
+            .rename("count")
+        )
+
+    def counts_by_year(self, name: str) -> pd.DataFrame:
+        """Year x value table of a categorical rollup's counts."""
+        rows = self._select(name, None)
+        return rows.pivot_table(
+            index="year", columns="value", values="count", aggfunc="sum", fill_value=0
+        )
+
+
+def _describe(rows: pd.DataFrame) -> pd.DataFrame:
+    count = rows["count"].astype(float)
+    mean = rows["sum"] / count
+    # Sample variance from the raw sums; clip the tiny negatives rounding makes.
+    var = ((rows["sumsq"] - count * mean**2) / (count - 1)).clip(lower=0)
+    return pd.DataFrame(
+        {
+            "count": rows["count"].astype(int),
+            "mean": mean,
+            "std": np.sqrt(var.where(count > 1)),
+            "min": rows["min"],
+            "max": rows["max"],
+        },
+        index=rows.index,
+    )
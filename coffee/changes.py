@@ -0,0 +1,106 @@
+"""Detect which fetched reviews actually changed, by hashing their content.
+
+Most review pages fetched again are the same review: the bytes differ only in
+boilerplate (ads, nonces, sidebar widgets). The scraper hashes just the
+review's main content region (:func:`coffee.parser.main_content`) and checks
+it against a :class:`ContentManifest`, a URL -> hash CSV kept beside the
+review dataset. A page whose hash is unchanged is not parsed again: its
+record is already the one stored in the dataset under the same URL, and it is
+reused from there. Only added and modified reviews are emitted.
+
+Each run's change set (URL, ``added`` or ``modified``) is written to
+:data:`DEFAULT_CHANGES`, for downstream stages to process instead of the
+whole corpus. Hashes are staged during the scrape and only saved once the
+records they describe are in the dataset, so the manifest never claims a
+record the dataset lacks.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import os
+import re
+from collections.abc import Iterable
+from pathlib import Path
+
+from coffee.config import Config
+
+DEFAULT_CONTENT_MANIFEST = Config.DATA_DIR / "processed" / "review_content.csv"
+DEFAULT_CHANGES = Config.DATA_DIR / "processed" / "review_changes.csv"
+
+ADDED = "added"
+MODIFIED = "modified"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_hash(content: str) -> str:
+    """Hash of a page region, insensitive to whitespace and indentation."""
+    normalized = _WHITESPACE.sub(" ", content).strip()
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+class ContentManifest:
+    """URL -> content hash of the record stored for it, kept in a CSV.
+
+    :meth:`check` each fetched page during a scrape; after the changed records
+    are written, :meth:`save` folds their new hashes in. `reparse` makes every
+    page count as modified (e.g. after a parser change), re-hashing it too.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CONTENT_MANIFEST, reparse: bool = False):
+        self.path = Path(path)
+        self.reparse = reparse
+        self.hashes: dict[str, str] = {}
+        if self.path.exists():
+            with self.path.open(newline="") as f:
+                self.hashes = {row["url"]: row["hash"] for row in csv.DictReader(f)}
+        # This run's outcome, per URL checked.
+        self.changes: dict[str, str] = {}
+        self.unchanged: set[str] = set()
+        self._pending: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def retain(self, urls: Iterable[str]) -> None:
+        """Forget the hashes of URLs not in `urls`, e.g. the stored reviews."""
+        keep = set(urls)
+        self.hashes = {u: h for u, h in self.hashes.items() if u in keep}
+
+    def check(self, url: str, content: str) -> bool:
+        """Whether `url`'s `content` is new or changed and must be parsed."""
+        digest = content_hash(content)
+        stored = self.hashes.get(url)
+        if stored == digest and not self.reparse:
+            self.unchanged.add(url)
+            return False
+        self.changes[url] = ADDED if stored is None else MODIFIED
+        self._pending[url] = digest
+        return True
+
+    def save(self) -> Path:
+        """Commit the staged hashes and write the manifest atomically."""
+        self.hashes.update(self._pending)
+        self._pending.clear()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["url", "hash"])
+            writer.writerows(sorted(self.hashes.items()))
+        os.replace(tmp, self.path)
+        return self.path
+
+    def save_changes(self, path: Path = DEFAULT_CHANGES) -> Path:
+        """Write this run's change set (``url,change``), sorted by URL."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["url", "change"])
+            writer.writerows(sorted(self.changes.items()))
+        os.replace(tmp, path)
+        return path
@@ -0,0 +1,134 @@
+"""The ``coffee`` command: one entry point for the pipeline's tools.
+
+Usage::
+
+    coffee scrape [-o DIR] [-c N] ...
+    coffee rates [-i FILE] [-o FILE]
+    coffee roasters NAMES.csv [--index [PATH]] ...
+    coffee geocode [-i DATASET] [-o FILE] [--offline]
+    coffee flavors [-i DATASET] [-o DIR] [--lexicon FILE]
+    coffee pipeline [STAGE ...] [--force STAGE] [--dry-run]
+
+Each subcommand lives in a module under :mod:`coffee.commands` exposing
+``add_arguments(parser)`` and ``run(args)``. Only the chosen subcommand's
+module is imported, and those modules import their heavy dependencies
+(pandas, aiohttp, pyarrow, the resolver) inside ``run``, so ``coffee --help``
+and ``coffee <command> --help`` start in tens of milliseconds.
+``scripts/benchmark_startup.py`` checks that this stays true.
+
+``coffee --profile COMMAND`` (or ``COFFEE_PROFILE=1``) profiles the run; see
+:mod:`coffee.profiling`.
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+
+from coffee import profiling
+
+# name -> (module, one-line summary). Adding a command is one entry here plus
+# a module with add_arguments() and run().
+COMMANDS: dict[str, tuple[str, str]] = {
+    "scrape": (
+        "coffee.commands.scrape_reviews",
+        "scrape every review to CSV and the Parquet dataset",
+    ),
+    "rates": (
+        "coffee.commands.openex",
+        "fetch historical exchange rates for the review dates",
+    ),
+    "roasters": (
+        "coffee.commands.resolve_roasters",
+        "cluster roaster spellings into the canonical crosswalk",
+    ),
+    "geocode": (
+        "coffee.commands.geocode",
+        "geocode roaster locations (gazetteer, cache, then the API)",
+    ),
+    "flavors": (
+        "coffee.commands.flavors",
+        "tag flavor descriptors in tasting notes into a sparse matrix",
+    ),
+    "pipeline": (
+        "coffee.commands.pipeline",
+        "rebuild the stages whose inputs or code changed",
+    ),
+    "stub-server": (
+        "coffee.commands.stub_server",
+        "serve a synthetic CoffeeReview.com for load and fault testing",
+    ),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    width = max(map(len, COMMANDS))
+    listing = "\n".join(
+        f"  {name:<{width}}  {summary}" for name, (_, summary) in COMMANDS.items()
+    )
+    parser = argparse.ArgumentParser(
+        prog="coffee",
+        description="Scrape and process CoffeeReview.com data.",
+        epilog=f"commands:\n{listing}\n\nRun 'coffee COMMAND --help' for its options.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Log at DEBUG level."
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write CPU, memory and event-loop profiles of the run to "
+        "data/intermediate/profiles/ (also: COFFEE_PROFILE=1).",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=Path,
+        help="Collect profiled runs here instead; implies --profile.",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also report the lines allocating the most memory in each stage, "
+        "from tracemalloc snapshots (slow on large data); implies --profile "
+        "(also: COFFEE_PROFILE_SNAPSHOTS=1).",
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="COMMAND")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    module_name, summary = COMMANDS[args.command]
+    module = importlib.import_module(module_name)
+
+    parser = argparse.ArgumentParser(
+        prog=f"coffee {args.command}",
+        description=module.__doc__ or summary,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    module.add_arguments(parser)
+    command_args = parser.parse_args(args.args)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    root = args.profile_dir
+    if (args.profile or args.profile_memory) and root is None:
+        root = profiling.DEFAULT_PROFILE_ROOT
+    if args.profile_memory:
+        os.environ[profiling.SNAPSHOTS_ENV] = "1"
+    if root is not None:
+        # Subprocesses (the pipeline's stages) profile into the same root.
+        os.environ[profiling.PROFILE_ENV] = str(root)
+    with profiling.session(args.command, root):
+        module.run(command_args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,9 @@
+"""Subcommands of the ``coffee`` command line (see :mod:`coffee.cli`).
+
+Each module defines ``add_arguments(parser)`` and ``run(args)``, plus a
+``main()`` for running it on its own. Module-level imports are kept to the
+standard library and :mod:`coffee.config`; everything heavier is imported in
+``run`` so that parsing options, including ``--help``, stays fast. Library
+defaults a command needs for its options are copied rather than imported,
+and :mod:`coffee.commands.options` keeps the list of those copies.
+"""
@@ -0,0 +1,113 @@
+"""Tag flavor descriptors in every review's tasting notes.
+
+Reads ``url``, ``blind_assessment`` and ``notes`` from the Parquet review
+dataset (or a scraped CSV), tags them with the bundled flavor lexicon
+(:class:`coffee.flavors.FlavorLexicon`, or ``--lexicon``) and writes the
+sparse review x descriptor counts to a directory: ``counts.npz``,
+``urls.txt`` and ``descriptors.csv`` with each descriptor's category, number
+of reviews and mentions. No NLP model is loaded; the whole corpus takes
+seconds.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from coffee import profiling
+from coffee.commands.options import positive_int
+from coffee.config import Config
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Mirror coffee.storage/coffee.flavors defaults so --help doesn't import them
+# (checked against them by coffee.commands.options.MIRRORED_DEFAULTS).
+DEFAULT_INPUT = Config.DATA_DIR / "processed" / "reviews"
+DEFAULT_OUTPUT = Config.DATA_DIR / "processed" / "flavor_features"
+TEXT_COLUMNS = ("blind_assessment", "notes")
+
+
+def load_texts(path: Path) -> pd.DataFrame:
+    """URL and tasting-note text of every review, from a dataset dir or a CSV."""
+    import pandas as pd
+
+    columns = ["url", *TEXT_COLUMNS]
+    if path.is_dir():
+        from coffee.storage import load_reviews
+
+        return load_reviews(path, columns=columns)
+    reviews = pd.read_csv(path)
+    # Older raw scrapes have space-separated column names.
+    reviews.columns = reviews.columns.str.replace(" ", "_")
+    return reviews[columns]
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-i",
+        "--input",
+        type=Path,
+        default=DEFAULT_INPUT,
+        help="Parquet review dataset directory, or a scraped .csv file.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=DEFAULT_OUTPUT,
+        help="Destination directory for the counts matrix and descriptor totals.",
+    )
+    parser.add_argument(
+        "--lexicon",
+        type=Path,
+        help="Flavor lexicon CSV (descriptor,category,synonyms) to use instead "
+        "of the bundled one.",
+    )
+    parser.add_argument(
+        "--top",
+        type=positive_int,
+        default=15,
+        help="Log the N descriptors mentioned by the most reviews.",
+    )
+
+
+def run(args: argparse.Namespace) -> None:
+    from coffee.flavors import LEXICON, FlavorLexicon, extract
+
+    with profiling.stage("load reviews"):
+        reviews = load_texts(args.input)
+    lexicon = FlavorLexicon(args.lexicon or LEXICON)
+    with profiling.stage("tag flavors"):
+        features = extract(reviews, lexicon)
+    features.save(args.output)
+
+    totals = features.totals().nlargest(args.top, "n_reviews")
+    for row in totals.itertuples():
+        logger.info(
+            "%-16s %-12s %6d reviews", row.descriptor, row.category, row.n_reviews
+        )
+    logger.info(
+        "Wrote %d reviews x %d descriptors (%d nonzero) to %s",
+        *features.counts.shape,
+        features.counts.nnz,
+        args.output,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    with profiling.session("flavors"):
+        run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Geocode the roaster locations of the scraped reviews.
+
+Reads ``roaster_location`` from the Parquet review dataset (or a scraped CSV),
+resolves each distinct location with :class:`coffee.geocode.Geocoder` (bundled
+gazetteer, then the local cache, then the geocoding API for what's left) and
+writes one row per location: how many reviews name it, and its city, region,
+country, coordinates and source. A first run over the corpus costs a few
+hundred API lookups; reruns reuse the cache and only look up new locations.
+
+The API key is ``GEOCODE_API_KEY``; without one (or with ``--offline``) only
+the gazetteer and cache are used.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from coffee import profiling
+from coffee.commands.options import positive_int
+from coffee.config import Config
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Mirror coffee.storage/coffee.geocode defaults so --help doesn't import them
+# (checked against them by coffee.commands.options.MIRRORED_DEFAULTS).
+DEFAULT_INPUT = Config.DATA_DIR / "processed" / "reviews"
+DEFAULT_OUTPUT = Config.DATA_DIR / "processed" / "roaster_locations.csv"
+DEFAULT_API_URL = "https://geocode.maps.co/search"
+DEFAULT_CONCURRENCY = 2
+
+
+def load_locations(path: Path) -> pd.Series:
+    """The roaster location of every review, from a dataset dir or a CSV."""
+    import pandas as pd
+
+    if path.is_dir():
+        from coffee.storage import load_reviews
+
+        return load_reviews(path, columns=["roaster_location"])["roaster_location"]
+    reviews = pd.read_csv(path)
+    # Older raw scrapes have space-separated column names.
+    column = "roaster_location" if "roaster_location" in reviews else "roaster location"
+    return reviews[column]
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-i",
+        "--input",
+        type=Path,
+        default=DEFAULT_INPUT,
+        help="Parquet review dataset directory, or a scraped .csv file.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=DEFAULT_OUTPUT,
+        help="Destination CSV, one row per distinct roaster location.",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        help="Cache of API answers (default: data/external/geocode_cache.csv).",
+    )
+    parser.add_argument(
+        "--api-url",
+        default=DEFAULT_API_URL,
+        help="Geocoding search endpoint, e.g. a local 'coffee stub-server' "
+        "(http://127.0.0.1:8089/geocode/search).",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=positive_int,
+        default=DEFAULT_CONCURRENCY,
+        help="Maximum number of concurrent API requests.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use only the gazetteer and the cache; never call the API.",
+    )
+
+
+def run(args: argparse.Namespace) -> None:
+    import asyncio
+
+    from coffee.geocode import DEFAULT_CACHE, GeocodeCache, Geocoder
+
+    with profiling.stage("load locations"):
+        locations = load_locations(args.input)
+    counts = locations.dropna().value_counts()
+    logger.info("%d reviews name %d roaster locations", counts.sum(), len(counts))
+
+    geocoder = Geocoder(
+        cache=GeocodeCache(args.cache or DEFAULT_CACHE),
+        api_url=args.api_url,
+        api_key="" if args.offline else None,
+        concurrency=args.concurrency,
+    )
+    with profiling.stage("geocode"):
+        places = asyncio.run(geocoder.geocode(counts.index))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with args.output.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["roaster_location", "n_reviews", "city", "region", "country"]
+            + ["lat", "lon", "source"]
+        )
+        for location, n_reviews in counts.items():
+            if (place := places.get(location)) is None:
+                continue
+            writer.writerow(
+                [location, n_reviews, place.city, place.region, place.country]
+                + [place.lat, place.lon, place.source]
+            )
+    located = sum(place.located for place in places.values())
+    logger.info(
+        "Located %d of %d roaster locations; wrote %s",
+        located,
+        len(places),
+        args.output,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    with profiling.session("geocode"):
+        run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
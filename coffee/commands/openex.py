@@ -0,0 +1,175 @@
+"""Fetch historical exchange rates from the OpenExchangeRates API.
+
+Reads the unique review dates from the Parquet review dataset (or a scraped
+CSV/JSON file) and downloads the historical rates for each date, writing them
+to JSON. Free-tier accounts are
+limited to 1000 requests per month.
+
+pandas and requests are imported by the functions that use them, so parsing
+the command's options stays cheap.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from coffee import profiling
+from coffee.config import OpenExConfig
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import requests
+
+logger = logging.getLogger(__name__)
+
+# coffee.storage.DEFAULT_DATASET, spelled out so --help doesn't import pyarrow.
+DEFAULT_INPUT = OpenExConfig.DATA_DIR / "processed" / "reviews"
+DEFAULT_OUTPUT = OpenExConfig.DATA_DIR / "external" / "openex_exchange_rates.json"
+
+# OpenExchangeRates' historical data begins in 1999.
+EARLIEST_DATE = "1999-01-01"
+
+
+def load_review_dates(path: Path) -> list[date]:
+    """Return the sorted, unique review dates (>= 1999) from scraped reviews.
+
+    `path` is a Parquet review dataset directory or a .csv/.json file.
+    """
+    import pandas as pd
+
+    if path.is_dir():
+        from coffee.storage import load_reviews
+
+        review_dates = load_reviews(path, columns=["review_date"])["review_date"]
+        return _unique_dates(review_dates)
+
+    readers = {".csv": pd.read_csv, ".json": pd.read_json}
+    if path.suffix not in readers:
+        raise ValueError(f"Unsupported file type {path.suffix!r}; use .csv or .json.")
+    if not path.exists():
+        raise FileNotFoundError(f"{path} does not exist.")
+
+    reviews = readers[path.suffix](path)
+    if "review_date" in reviews:
+        # Typed scrapes (see coffee.records) write ISO dates.
+        review_dates = pd.to_datetime(reviews["review_date"])
+    else:
+        # Older raw scrapes store "Month Year", e.g. "November 2016".
+        review_dates = pd.to_datetime(reviews["review date"], format="%B %Y")
+    return _unique_dates(review_dates)
+
+
+def _unique_dates(review_dates: pd.Series) -> list[date]:
+    return (
+        review_dates[review_dates >= EARLIEST_DATE]
+        .dt.date.drop_duplicates()
+        .sort_values()
+        .tolist()
+    )
+
+
+def _build_session(retries: int = 3) -> requests.Session:
+    """Session that reuses connections and retries transient errors."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=1,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    session.headers.update(OpenExConfig.HEADERS)
+    return session
+
+
+def fetch_rate(session: requests.Session, day: date, app_id: str) -> dict[str, float]:
+    """Fetch rates for a single date; return an empty dict on failure."""
+    import requests
+
+    url = f"{OpenExConfig.API_URL}{day}.json"
+    try:
+        response = session.get(
+            url, params={"app_id": app_id}, timeout=OpenExConfig.TIMEOUT
+        )
+        response.raise_for_status()
+        return response.json().get("rates", {})
+    except requests.RequestException:
+        logger.warning("Failed to fetch rates for %s", day, exc_info=True)
+        return {}
+
+
+def fetch_rates(dates: list[date], app_id: str) -> dict[str, dict[str, float]]:
+    """Fetch rates for every date, keyed by ISO date string."""
+    from tqdm import tqdm
+
+    session = _build_session()
+    return {
+        str(day): fetch_rate(session, day, app_id)
+        for day in tqdm(dates, desc="Fetching exchange rates")
+    }
+
+
+def save_rates(rates: dict[str, dict[str, float]], path: Path) -> None:
+    """Write the exchange-rate mapping to a JSON file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(rates, f, indent=2)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-i",
+        "--input",
+        type=Path,
+        default=DEFAULT_INPUT,
+        help="Parquet review dataset directory, or a scraped .csv/.json file.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=DEFAULT_OUTPUT,
+        help="Destination JSON file for exchange rates.",
+    )
+
+
+def run(args: argparse.Namespace) -> None:
+    app_id = OpenExConfig.OPENEXCHANGERATES_API_ID
+    if not app_id:
+        raise SystemExit("OPENEXCHANGERATES_API_ID is not set (add it to your .env).")
+
+    with profiling.stage("load dates"):
+        dates = load_review_dates(args.input)
+    logger.info("Fetching rates for %d unique dates", len(dates))
+    with profiling.stage("fetch"):
+        rates = fetch_rates(dates, app_id)
+
+    failures = sum(1 for r in rates.values() if not r)
+    if failures:
+        logger.warning("%d/%d dates returned no rates", failures, len(dates))
+
+    save_rates(rates, args.output)
+    logger.info("Wrote exchange rates to %s", args.output)
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    with profiling.session("rates"):
+        run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Option-parsing pieces shared by the subcommands.
+
+:func:`positive_int` is the argparse type for counts such as ``--concurrency``.
+
+To keep ``--help`` light, commands spell out some library defaults instead of
+importing the module that defines them. :data:`MIRRORED_DEFAULTS` lists every
+such copy with its source, and :func:`mirror_mismatches` reports the ones that
+have drifted; ``scripts/benchmark_startup.py`` runs it. It imports the
+libraries, so nothing calls it while parsing options.
+"""
+
+import argparse
+import importlib
+
+# (command module, name) -> (library module, name) of the value it copies.
+MIRRORED_DEFAULTS: dict[tuple[str, str], tuple[str, str]] = {
+    ("coffee.commands.flavors", "DEFAULT_INPUT"): ("coffee.storage", "DEFAULT_DATASET"),
+    ("coffee.commands.flavors", "DEFAULT_OUTPUT"): ("coffee.flavors", "DEFAULT_OUTPUT"),
+    ("coffee.commands.flavors", "TEXT_COLUMNS"): ("coffee.flavors", "TEXT_COLUMNS"),
+    ("coffee.commands.geocode", "DEFAULT_INPUT"): ("coffee.storage", "DEFAULT_DATASET"),
+    ("coffee.commands.geocode", "DEFAULT_API_URL"): (
+        "coffee.geocode",
+        "DEFAULT_API_URL",
+    ),
+    ("coffee.commands.geocode", "DEFAULT_CONCURRENCY"): (
+        "coffee.geocode",
+        "DEFAULT_CONCURRENCY",
+    ),
+    ("coffee.commands.openex", "DEFAULT_INPUT"): ("coffee.storage", "DEFAULT_DATASET"),
+    ("coffee.commands.resolve_roasters", "LINKAGES"): ("coffee.roasters", "LINKAGES"),
+    ("coffee.commands.scrape_reviews", "DISCOVERY_MODES"): ("coffee.sitemaps", "MODES"),
+    ("coffee.commands.stub_server", "DEFAULT_HOST"): (
+        "coffee.stub_server",
+        "DEFAULT_HOST",
+    ),
+    ("coffee.commands.stub_server", "DEFAULT_PORT"): (
+        "coffee.stub_server",
+        "DEFAULT_PORT",
+    ),
+}
+
+
+def positive_int(value: str) -> int:
+    """argparse type that rejects non-positive integers."""
+    ivalue = int(value)
+    if ivalue < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value!r}")
+    return ivalue
+
+
+def mirror_mismatches() -> list[str]:
+    """One message per mirrored default that no longer matches its source."""
+    mismatches = []
+    for (module, name), (source, source_name) in MIRRORED_DEFAULTS.items():
+        value = getattr(importlib.import_module(module), name)
+        expected = getattr(importlib.import_module(source), source_name)
+        if value != expected:
+            mismatches.append(
+                f"{module}.{name} is {value!r} but {source}.{source_name} "
+                f"is {expected!r}"
+            )
+    return mismatches
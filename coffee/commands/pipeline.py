@@ -0,0 +1,93 @@
+"""Rebuild whatever in the pipeline is out of date.
+
+Runs the stages of :mod:`coffee.pipeline` in dependency order: scrape, rates,
+roasters, and the cleaning, EDA and text notebooks. A stage is skipped when
+its inputs' content and its code are unchanged since its last successful run,
+and independent stages run in parallel. After a new scrape, this rebuilds
+only what the scrape actually changed:
+
+    coffee pipeline                  # everything that's stale
+    coffee pipeline clean            # 'clean' and whatever it depends on
+    coffee pipeline --force scrape   # re-scrape, then rebuild downstream
+    coffee pipeline --dry-run
+"""
+
+import argparse
+import logging
+import os
+from pathlib import Path
+
+from coffee import profiling
+from coffee.commands.options import positive_int
+
+logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "stages",
+        nargs="*",
+        metavar="STAGE",
+        help="Stages to bring up to date, with their upstream (default: all).",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="append",
+        default=[],
+        metavar="STAGE",
+        help="Run STAGE even if it is up to date (repeatable).",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=os.cpu_count() or 1,
+        help="Maximum number of stages to run at once.",
+    )
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="List the stages that would run, without running them.",
+    )
+    parser.add_argument(
+        "--state",
+        type=Path,
+        help="Pipeline state file (default: data/intermediate/pipeline/state.json).",
+    )
+
+
+def run(args: argparse.Namespace) -> None:
+    from coffee.pipeline import DEFAULT_STATE, FAILED, Pipeline
+
+    pipeline = Pipeline(state=args.state or DEFAULT_STATE)
+    try:
+        if args.dry_run:
+            for name in pipeline.plan(args.stages, args.force):
+                print(name)
+            return
+        outcome = pipeline.run(args.stages, args.force, jobs=args.jobs)
+    except KeyError as e:
+        raise SystemExit(
+            f"{e.args[0]}; choose from {', '.join(pipeline.stages)}"
+        ) from None
+
+    for name, result in outcome.items():
+        print(f"{name}\t{result}")
+    if FAILED in outcome.values():
+        raise SystemExit(1)
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    with profiling.session("pipeline"):
+        run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
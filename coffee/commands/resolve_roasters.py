@@ -0,0 +1,120 @@
+"""Cluster messy coffee roaster names into canonical entities.
+
+Thin CLI over :mod:`coffee.roasters`, where the normalization, scoring and
+clustering live (and where the reasoning behind them is written down).
+
+Writes crosswalk.csv (raw_name -> canonical_name) and review.csv (pairs in the
+honest-uncertainty band) to --outdir. With --index, the names are instead
+merged into the persistent crosswalk the scraper looks names up in — typically
+the pending queue the scraper leaves behind:
+
+    coffee roasters names.csv --column roaster --outdir ./out
+    coffee roasters data/processed/roaster_pending.csv --index
+"""
+
+import argparse
+import csv
+from pathlib import Path
+
+from coffee import profiling
+
+# Mirrors coffee.roasters.LINKAGES; kept here so --help doesn't import the
+# resolver (scipy, rapidfuzz, pandas).
+LINKAGES = ("single", "complete")
+DEFAULT_INDEX = "default"  # --index with no path: the crosswalk the scraper uses
+
+
+def _header(path: Path) -> list[str]:
+    with path.open(newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("infile", type=Path, help="CSV containing the names")
+    ap.add_argument("--column", default="roaster", help="column holding the names")
+    ap.add_argument("--outdir", type=Path, default=Path("."))
+    ap.add_argument(
+        "--auto",
+        type=int,
+        default=92,
+        help="score >= this: merge automatically (raise if you see false merges)",
+    )
+    ap.add_argument(
+        "--review",
+        type=int,
+        default=82,
+        help="score in [review, auto): send to human review queue "
+        "(lower it if true matches are being missed entirely)",
+    )
+    ap.add_argument(
+        "--linkage",
+        choices=LINKAGES,
+        default="single",
+        help="'complete' only merges clusters whose every pair clears --auto "
+        "(use if chain-risk fires often)",
+    )
+    ap.add_argument(
+        "--index",
+        nargs="?",
+        const=DEFAULT_INDEX,
+        help="merge the names into this persistent crosswalk (default: "
+        "data/processed/roaster_crosswalk.csv) and save it in place",
+    )
+
+
+def run(args: argparse.Namespace) -> None:
+    from coffee.roasters import (
+        DEFAULT_CROSSWALK,
+        RoasterIndex,
+        load_name_counts,
+        resolve,
+    )
+
+    counts = load_name_counts(args.infile, args.column)
+    thresholds = {
+        "auto_threshold": args.auto,
+        "review_threshold": args.review,
+        "linkage": args.linkage,
+    }
+
+    args.outdir.mkdir(parents=True, exist_ok=True)
+    if args.index:
+        path = DEFAULT_CROSSWALK if args.index == DEFAULT_INDEX else Path(args.index)
+        index = RoasterIndex(path)
+        review = index.update(counts, **thresholds)
+        crosswalk = index.crosswalk
+        print(f"Updated roaster index -> {index.save()}")
+        if "n_records" in _header(args.infile):
+            # A pending queue is consumed once its names are in the crosswalk.
+            index.clear_pending(args.infile)
+    else:
+        crosswalk, review = resolve(list(counts.elements()), **thresholds)
+        crosswalk.to_csv(args.outdir / "crosswalk.csv", index=False)
+    review.to_csv(args.outdir / "review.csv", index=False)
+
+    # These three numbers are your run diagnostics. Read them in order:
+    #   merged        — did it do anything at all?
+    #   review        — how much human work is left?
+    #   chain-risk    — did single-linkage misbehave? THIS IS THE ONE THAT MATTERS.
+    n_raw = crosswalk.raw_name.nunique()
+    n_can = crosswalk.canonical_name.nunique()
+    print(f"{n_raw} distinct spellings -> {n_can} roasters ({n_raw - n_can} merged)")
+    print(f"{len(review)} pairs queued for review  -> review.csv")
+    print(
+        f"{int(crosswalk.chain_risk.sum())} rows in chain-risk clusters"
+        f" ({int(crosswalk.incomplete.sum())} with unscored pairs)"
+        f"{'  <-- INSPECT THESE' if crosswalk.chain_risk.any() else ''}"
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(
+        description="Cluster messy coffee roaster names into canonical entities."
+    )
+    add_arguments(ap)
+    with profiling.session("roasters"):
+        run(ap.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""Scrape all coffee reviews from CoffeeReview.com to CSV and Parquet.
+
+Discovers review URLs, scrapes each review concurrently, and writes a dated
+CSV to the output directory plus the typed, year-partitioned Parquet dataset
+from :mod:`coffee.storage`. Discovery reads the site's sitemaps and, against
+the lastmod manifest of earlier scrapes, keeps only new or modified reviews,
+which are merged into the dataset; if the site has no sitemap it crawls the
+listings and scrapes everything (see :mod:`coffee.sitemaps`).
+
+Reviews that fail to download are recorded in a dead-letter queue (see
+:mod:`coffee.dead_letters`); ``--retry-failed`` re-attempts only those, and
+reviews the site has removed are tombstoned and skipped from then on.
+
+Each fetched review's main content is hashed and compared with the content
+manifest (see :mod:`coffee.changes`): unchanged reviews keep their stored
+record without being parsed, only added and modified ones are written, and
+the run's change set is saved for downstream stages.
+
+Reviews are collected straight into a columnar
+:class:`coffee.records.ReviewBatch`. Each record gets a ``roaster_canonical``
+from the roaster crosswalk; spellings the crosswalk has never seen are queued
+in a pending CSV for ``coffee roasters --index``.
+
+The scraping stack (asyncio, aiohttp, pandas, pyarrow, the resolver) is
+imported when the command runs, not when its options are parsed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from coffee import profiling
+from coffee.commands.options import positive_int
+from coffee.config import Config
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+    from coffee.changes import ContentManifest
+    from coffee.dead_letters import DeadLetterQueue
+    from coffee.roasters import RoasterIndex
+    from coffee.sitemaps import LastmodManifest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_DIR = Config.DATA_DIR / "raw"
+DEFAULT_CONCURRENCY = 10
+# Mirrors coffee.sitemaps.MODES; kept here so --help doesn't import aiohttp.
+DISCOVERY_MODES = ("auto", "sitemap", "crawl")
+
+
+async def scrape_all_reviews(
+    output_dir: Path,
+    concurrency: int,
+    roaster_index: RoasterIndex | None = None,
+    dataset_dir: Path | None = None,
+    base_url: str = Config.BASE_URL,
+    discovery: str = "auto",
+    manifest: LastmodManifest | None = None,
+    full: bool = False,
+    dead_letters: DeadLetterQueue | None = None,
+    retry_failed: bool = False,
+    content_manifest: ContentManifest | None = None,
+) -> None:
+    """Discover review URLs, scrape each review, and save to CSV + Parquet.
+
+    `dataset_dir` defaults to :data:`coffee.storage.DEFAULT_DATASET`.
+    `base_url` is the review listing root, e.g. a :mod:`coffee.stub_server`.
+    `discovery` is a :data:`coffee.sitemaps.MODES` mode. Given a `manifest`,
+    only reviews new or modified since it was saved are scraped (all of them
+    if `full`), and the manifest is updated with what was scraped.
+
+    Failed reviews are recorded in `dead_letters`, and tombstoned ones are
+    never requested. With `retry_failed`, discovery is skipped and only the
+    queued reviews are scraped, under :data:`coffee.dead_letters.RETRY_BACKOFF`;
+    the lastmod manifest is then left as it was.
+
+    Given a `content_manifest`, reviews whose content hasn't changed are not
+    parsed or written, and the manifest is saved once the changes are stored.
+    """
+    import asyncio
+
+    import aiohttp
+    import pyarrow as pa
+    from tqdm.asyncio import tqdm
+
+    from coffee.dead_letters import RETRY_BACKOFF
+    from coffee.fetch import DEFAULT_BACKOFF
+    from coffee.records import ReviewBatch
+    from coffee.review_scraper import scrape_review
+    from coffee.sitemaps import Discovery, discover
+    from coffee.storage import (
+        DEFAULT_DATASET,
+        open_dataset,
+        read_reviews,
+        upsert_reviews,
+        write_reviews,
+    )
+    from coffee.utils import create_filename
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = output_dir / create_filename("reviews", "csv")
+
+    dataset_dir = dataset_dir or DEFAULT_DATASET
+    if content_manifest is not None:
+        # Only a stored record can be reused, so forget hashes of any other.
+        stored = (
+            open_dataset(dataset_dir).to_table(columns=["url"])["url"].to_pylist()
+            if dataset_dir.exists()
+            else []
+        )
+        content_manifest.retain(stored)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    batch = ReviewBatch()
+
+    async with (
+        profiling.watch_event_loop(),
+        aiohttp.ClientSession(headers=Config.HEADERS) as session,
+    ):
+        start = time.perf_counter()
+        if retry_failed:
+            if dead_letters is None:
+                raise ValueError("retry_failed needs a dead-letter queue")
+            queued = dead_letters.pending()
+            found = Discovery("dead letters", queued, {}, total=len(queued))
+        else:
+            with profiling.stage("discover"):
+                found = await discover(
+                    base_url,
+                    session,
+                    semaphore,
+                    manifest=None if full else manifest,
+                    mode=discovery,
+                )
+        urls = found.urls
+        if dead_letters is not None:
+            urls = dead_letters.without_tombstones(urls)
+        logger.info(
+            "Found %d review links to scrape (of %d, via %s) in %.2f seconds",
+            len(urls),
+            found.total,
+            found.source,
+            time.perf_counter() - start,
+        )
+        if not urls:
+            logger.info("No new, modified or failed reviews; nothing to scrape.")
+            return
+
+        # The semaphore bounds concurrent requests while still improving on
+        # pure-synchronous scraping.
+        tasks = [
+            scrape_review(
+                url,
+                session,
+                semaphore,
+                backoff=RETRY_BACKOFF if retry_failed else DEFAULT_BACKOFF,
+                roaster_index=roaster_index,
+                on_failure=dead_letters.record if dead_letters is not None else None,
+                content_manifest=content_manifest,
+            )
+            for url in urls
+        ]
+        with profiling.stage("reviews"):
+            for future in tqdm(asyncio.as_completed(tasks), total=len(tasks)):
+                # Failed scrapes return None; skip them so they don't become
+                # all-NaN rows in the output.
+                if (review := await future) is not None:
+                    batch.append(review)
+                    if dead_letters is not None:
+                        dead_letters.resolve(review.url)
+
+    unchanged = content_manifest.unchanged if content_manifest is not None else set()
+    failed = len(urls) - len(batch) - len(unchanged)
+    if failed:
+        logger.warning("%d of %d reviews failed to scrape", failed, len(urls))
+    if unchanged:
+        logger.info(
+            "%d of %d fetched reviews unchanged; kept their stored records",
+            len(unchanged),
+            len(unchanged) + len(batch),
+        )
+    if dead_letters is not None:
+        for url in unchanged:
+            dead_letters.resolve(url)
+        logger.info(
+            "%d reviews in the dead-letter queue (%d tombstoned) at %s",
+            len(dead_letters),
+            len(dead_letters.tombstones),
+            dead_letters.save(),
+        )
+
+    if not batch and not unchanged:
+        logger.warning("No reviews scraped; nothing written.")
+        return
+
+    scraped = sorted(unchanged)
+    if batch:
+        # Reviews arrive in completion order; sorting makes an unchanged
+        # scrape write identical files, so the pipeline sees no change
+        # downstream.
+        table = batch.to_table().sort_by("url")
+        scraped += table["url"].to_pylist()
+        _csv_frame(table).to_csv(csv_path, index=False)
+        logger.info("Wrote %d changed reviews to %s", table.num_rows, csv_path)
+        # A retry covers only the failed reviews, never the whole site.
+        if retry_failed or found.incremental:
+            # Only part of the site was scraped; keep the rest of the dataset.
+            upsert_reviews(table, dataset_dir)
+        else:
+            # A full write replaces whole years; carry the stored records of
+            # reviews reused unchanged or whose fetch failed this time. Only
+            # removed (tombstoned) pages drop out.
+            gone = dead_letters.tombstones if dead_letters is not None else set()
+            carried = set(urls).difference(table["url"].to_pylist(), gone)
+            if carried and dataset_dir.exists():
+                reused = read_reviews(carried, dataset_dir)
+                table = pa.concat_tables([table, reused.cast(table.schema)])
+            write_reviews(table.sort_by("url"), dataset_dir)
+    else:
+        logger.info("No review changed; the dataset is current.")
+
+    if content_manifest is not None:
+        content_manifest.save()
+    # A retry knows no sitemap lastmod, and an empty one would make the next
+    # discovery treat every retried review as modified. Leaving the manifest
+    # as it was costs one re-check each, which the content hash keeps from
+    # rewriting anything.
+    if manifest is not None and not retry_failed:
+        manifest.update({url: found.lastmod.get(url) for url in scraped})
+        logger.info("Updated the lastmod manifest at %s", manifest.save())
+
+
+def _csv_frame(table: pa.Table) -> pd.DataFrame:
+    """Flatten the review table for CSV, one column per spill-over spec key."""
+    import pandas as pd
+
+    extra = pd.DataFrame(
+        [dict(row) if row else {} for row in table["extra"].to_pylist()]
+    )
+    return pd.concat([table.drop_columns("extra").to_pandas(), extra], axis=1)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=Path,
+        default=DEFAULT_OUTPUT_DIR,
+        help="Directory for the dated reviews CSV.",
+    )
+    parser.add_argument(
+        "--dataset",
+        type=Path,
+        help="Root of the year-partitioned Parquet review dataset "
+        "(default: data/processed/reviews).",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=positive_int,
+        default=DEFAULT_CONCURRENCY,
+        help="Maximum number of concurrent review requests.",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=Config.BASE_URL,
+        help="Review listing root to crawl, e.g. a local 'coffee stub-server'.",
+    )
+    parser.add_argument(
+        "--discovery",
+        choices=DISCOVERY_MODES,
+        default="auto",
+        help="Find reviews from the sitemaps, the listing crawl, or sitemaps "
+        "falling back to the crawl (default).",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        help="Lastmod manifest of scraped reviews "
+        "(default: data/processed/review_lastmod.csv).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Scrape every review, not just those new or modified since the "
+        "manifest was saved.",
+    )
+    parser.add_argument(
+        "--reparse",
+        action="store_true",
+        help="Parse and rewrite every fetched review even if its content is "
+        "unchanged, e.g. after a parser change.",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Skip discovery and re-attempt only the reviews in the dead-letter "
+        "queue, with a slower backoff.",
+    )
+    parser.add_argument(
+        "--dead-letters",
+        type=Path,
+        help="Queue of reviews that failed to scrape "
+        "(default: data/processed/dead_letters.csv).",
+    )
+    parser.add_argument(
+        "--content-manifest",
+        type=Path,
+        help="Content hashes of the stored reviews "
+        "(default: data/processed/review_content.csv).",
+    )
+    parser.add_argument(
+        "--changes",
+        type=Path,
+        help="Where to write the run's changed reviews "
+        "(default: data/processed/review_changes.csv).",
+    )
+    parser.add_argument(
+        "--roaster-index",
+        type=Path,
+        help="Roaster crosswalk CSV used to attach roaster_canonical "
+        "(default: data/processed/roaster_crosswalk.csv).",
+    )
+    parser.add_argument(
+        "--roaster-pending",
+        type=Path,
+        help="CSV that unseen roaster spellings are queued in "
+        "(default: data/processed/roaster_pending.csv).",
+    )
+
+
+def run(args: argparse.Namespace) -> None:
+    import asyncio
+
+    from coffee.changes import (
+        DEFAULT_CHANGES,
+        DEFAULT_CONTENT_MANIFEST,
+        ContentManifest,
+    )
+    from coffee.dead_letters import DEFAULT_DEAD_LETTERS, DeadLetterQueue
+    from coffee.roasters import DEFAULT_CROSSWALK, DEFAULT_PENDING, RoasterIndex
+    from coffee.sitemaps import DEFAULT_MANIFEST, LastmodManifest
+
+    pending = args.roaster_pending or DEFAULT_PENDING
+    roaster_index = RoasterIndex(args.roaster_index or DEFAULT_CROSSWALK)
+    content_manifest = ContentManifest(
+        args.content_manifest or DEFAULT_CONTENT_MANIFEST, reparse=args.reparse
+    )
+    asyncio.run(
+        scrape_all_reviews(
+            args.output_dir,
+            args.concurrency,
+            roaster_index,
+            args.dataset,
+            args.base_url,
+            args.discovery,
+            LastmodManifest(args.manifest or DEFAULT_MANIFEST),
+            args.full,
+            DeadLetterQueue(args.dead_letters or DEFAULT_DEAD_LETTERS),
+            args.retry_failed,
+            content_manifest,
+        )
+    )
+    changes = content_manifest.save_changes(args.changes or DEFAULT_CHANGES)
+    logger.info(
+        "%d reviews changed (change set at %s)", len(content_manifest.changes), changes
+    )
+
+    if queued := roaster_index.flush_pending(pending):
+        logger.info("%d unseen roaster spellings queued in %s", queued, pending)
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    with profiling.session("scrape"):
+        run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
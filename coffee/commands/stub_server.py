@@ -0,0 +1,164 @@
+"""Serve a synthetic CoffeeReview.com locally for load and fault testing.
+
+Listing, review and sitemap pages are generated on request (see
+:mod:`coffee.stub_server`), so a 100k-review site starts instantly. Point the
+scraper at it, and read the server's request counts afterwards:
+
+    coffee stub-server --reviews 100000 --latency 0.05 --rate-429 0.02
+    coffee scrape --base-url http://127.0.0.1:8089/review/ -o /tmp/stub
+    curl http://127.0.0.1:8089/_stats
+"""
+
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Mirror coffee.stub_server's defaults so --help doesn't import aiohttp.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8089
+
+
+def _rate(value: str) -> float:
+    """argparse type for a probability in [0, 1]."""
+    rate = float(value)
+    if not 0 <= rate <= 1:
+        raise argparse.ArgumentTypeError(f"must be between 0 and 1, got {value!r}")
+    return rate
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "-n", "--reviews", type=int, default=1_000, help="Number of reviews."
+    )
+    parser.add_argument(
+        "--per-page", type=int, default=20, help="Reviews per listing page."
+    )
+    parser.add_argument(
+        "--pagination-window",
+        type=int,
+        default=2,
+        help="Neighbouring pages each listing page links to, on each side.",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Median response delay in seconds (log-normal).",
+    )
+    parser.add_argument(
+        "--latency-sigma",
+        type=float,
+        default=0.5,
+        help="Spread of the log-normal delay; 0 for a fixed delay.",
+    )
+    parser.add_argument(
+        "--rate-429", type=_rate, default=0.0, help="Share of requests given 429."
+    )
+    parser.add_argument(
+        "--rate-5xx", type=_rate, default=0.0, help="Share of requests given a 5xx."
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=int,
+        default=1,
+        help="Retry-After seconds sent with 429s; negative to omit the header.",
+    )
+    parser.add_argument(
+        "--capacity",
+        type=int,
+        help="Concurrent requests served before answering 429 (default: no cap).",
+    )
+    parser.add_argument(
+        "--no-etag",
+        dest="etag",
+        action="store_false",
+        help="Don't send ETags or answer If-None-Match with 304.",
+    )
+    parser.add_argument(
+        "--padding",
+        type=int,
+        default=0,
+        help="Filler bytes per page, to mimic the real site's page size.",
+    )
+    parser.add_argument(
+        "--sitemap-size",
+        type=int,
+        default=1_000,
+        help="Review URLs per review sitemap.",
+    )
+    parser.add_argument(
+        "--revision",
+        type=int,
+        default=0,
+        help="Site revision; each one edits every --edit-every'th review and "
+        "bumps its sitemap lastmod.",
+    )
+    parser.add_argument(
+        "--edit-every",
+        type=int,
+        default=100,
+        help="Spacing of the reviews a revision edits.",
+    )
+    parser.add_argument(
+        "--gone-every",
+        type=int,
+        default=0,
+        help="Answer 410 Gone for every Nth review, still listed (default: none).",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def run(args: argparse.Namespace) -> None:
+    from aiohttp import web
+
+    from coffee.stub_server import StubConfig, make_app
+
+    config = StubConfig(
+        n_reviews=args.reviews,
+        per_page=args.per_page,
+        pagination_window=args.pagination_window,
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after if args.retry_after >= 0 else None,
+        capacity=args.capacity,
+        etag=args.etag,
+        padding=args.padding,
+        sitemap_size=args.sitemap_size,
+        revision=args.revision,
+        edit_every=args.edit_every,
+        gone_every=args.gone_every,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+    )
+    logger.info(
+        "Serving %d reviews on %d listing pages at %s",
+        config.n_reviews,
+        config.n_pages,
+        config.base_url,
+    )
+    web.run_app(
+        make_app(config),
+        host=config.host,
+        port=config.port,
+        access_log=None,
+        print=None,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,16 @@ current working directory, so it is stable whether imported from a script or a
 notebook — and a derived ``DATA_DIR``. :class:`Config` and :class:`OpenExConfig`
 hold the request headers, base URL, and API keys loaded from the environment or
 a project-root ``.env`` (``OPENEXCHANGERATES_API_ID``, ``GEOCODE_API_KEY``).
+
+The ``.env`` file is read on first access to an API key (or an explicit
+:func:`load_env`), not at import, so tools that never touch a key don't pay
+for it.
 """
 
 import os
+from functools import cache
 from pathlib import Path
 
-from dotenv import load_dotenv
-
 
 def _find_project_root(marker: str = "pyproject.toml") -> Path:
     """Walk up from this file until a directory containing ``marker`` is found.
@@ -30,8 +33,24 @@ def _find_project_root(marker: str = "pyproject.toml") -> Path:
 
 PROJECT_ROOT: Path = _find_project_root()
 
-# Load environment variables from a .env file at the project root, if present.
-load_dotenv(PROJECT_ROOT / ".env")
+
+@cache
+def load_env() -> None:
+    """Load environment variables from the project-root ``.env``, once."""
+    from dotenv import load_dotenv
+
+    load_dotenv(PROJECT_ROOT / ".env")
+
+
+class _EnvVar:
+    """Class attribute read from the environment (after ``.env``) on access."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, instance: object, owner: type) -> str | None:
+        load_env()
+        return os.environ.get(self.name)
 
 
 class Config:
@@ -39,8 +58,8 @@ class Config:
     DATA_DIR: Path = PROJECT_ROOT / "data"
     # Kept as an alias for backwards compatibility; prefer PROJECT_ROOT.
     BASEDIR: Path = PROJECT_ROOT
-    OPENEXCHANGERATES_API_ID = os.environ.get("OPENEXCHANGERATES_API_ID")
-    GEOCODE_API_KEY = os.environ.get("GEOCODE_API_KEY")
+    OPENEXCHANGERATES_API_ID = _EnvVar("OPENEXCHANGERATES_API_ID")
+    GEOCODE_API_KEY = _EnvVar("GEOCODE_API_KEY")
     BASE_URL = "https://www.coffeereview.com/review/"
     HEADERS = {
         "user-agent": (
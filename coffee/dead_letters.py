@@ -0,0 +1,137 @@
+"""A persistent dead-letter queue of review URLs that failed to scrape.
+
+When :func:`coffee.fetch.fetch` gives up on a review (retries exhausted, or
+a permanent error such as 404), the scraper records the
+:class:`~coffee.fetch.FetchFailure` here instead of just counting it. Each
+entry keeps the last HTTP status, the error class, the attempts spent across
+all runs, and when the URL first and last failed.
+
+``coffee scrape --retry-failed`` re-attempts only the queued URLs, with the
+slower, more patient :data:`RETRY_BACKOFF` policy; a URL that then succeeds
+leaves the queue. Pages that are gone for good (404/410) are tombstoned
+instead: they stay in the file but are never requested again, even when
+discovery lists them.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+from coffee.config import Config
+from coffee.fetch import Backoff, FetchFailure
+
+DEFAULT_DEAD_LETTERS = Config.DATA_DIR / "processed" / "dead_letters.csv"
+
+# Retrying known failures is not urgent: fewer, later attempts give an
+# overloaded or flaky site time to recover.
+RETRY_BACKOFF = Backoff(retries=4, base_delay=10.0, max_delay=300.0, jitter=10.0)
+
+_FIELDS = (
+    "url",
+    "status",
+    "error",
+    "attempts",
+    "first_failed",
+    "last_failed",
+    "tombstone",
+)
+
+
+@dataclass
+class DeadLetter:
+    """One failed URL, accumulated over the runs it failed in."""
+
+    url: str
+    status: int | None
+    error: str
+    attempts: int
+    first_failed: datetime
+    last_failed: datetime
+    tombstone: bool = False
+
+
+class DeadLetterQueue:
+    """Failed review URLs, kept in a CSV (one row per URL).
+
+    Load it, pass :meth:`record` as a fetch's `on_failure` and :meth:`resolve`
+    each URL that succeeds, then :meth:`save`.
+    """
+
+    def __init__(self, path: Path = DEFAULT_DEAD_LETTERS):
+        self.path = Path(path)
+        self.letters: dict[str, DeadLetter] = {}
+        if self.path.exists():
+            with self.path.open(newline="") as f:
+                for row in csv.DictReader(f):
+                    self.letters[row["url"]] = DeadLetter(
+                        url=row["url"],
+                        status=int(row["status"]) if row["status"] else None,
+                        error=row["error"],
+                        attempts=int(row["attempts"]),
+                        first_failed=datetime.fromisoformat(row["first_failed"]),
+                        last_failed=datetime.fromisoformat(row["last_failed"]),
+                        tombstone=row["tombstone"] == "1",
+                    )
+
+    def __len__(self) -> int:
+        return len(self.letters)
+
+    def record(self, failure: FetchFailure) -> None:
+        """Queue a failed fetch, or add to the URL's entry if already queued."""
+        now = datetime.now(UTC)
+        letter = self.letters.get(failure.url)
+        if letter is None:
+            letter = self.letters[failure.url] = DeadLetter(
+                failure.url, failure.status, failure.error, 0, now, now
+            )
+        letter.status = failure.status
+        letter.error = failure.error
+        letter.attempts += failure.attempts
+        letter.last_failed = now
+        letter.tombstone = letter.tombstone or failure.gone
+
+    def resolve(self, url: str) -> None:
+        """Drop `url` from the queue after it was fetched successfully."""
+        self.letters.pop(url, None)
+
+    def pending(self) -> list[str]:
+        """The queued URLs worth retrying (everything but tombstones)."""
+        return sorted(u for u, letter in self.letters.items() if not letter.tombstone)
+
+    @property
+    def tombstones(self) -> set[str]:
+        """URLs of pages that are gone and must not be requested again."""
+        return {u for u, letter in self.letters.items() if letter.tombstone}
+
+    def without_tombstones(self, urls: Iterable[str]) -> list[str]:
+        """`urls` minus the tombstoned ones, in order."""
+        gone = self.tombstones
+        return [url for url in urls if url not in gone]
+
+    def save(self) -> Path:
+        """Write the queue atomically; returns its path."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(_FIELDS)
+            for url in sorted(self.letters):
+                letter = self.letters[url]
+                writer.writerow(
+                    [
+                        url,
+                        "" if letter.status is None else letter.status,
+                        letter.error,
+                        letter.attempts,
+                        letter.first_failed.isoformat(),
+                        letter.last_failed.isoformat(),
+                        int(letter.tombstone),
+                    ]
+                )
+        os.replace(tmp, self.path)
+        return self.path
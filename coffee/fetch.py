@@ -5,57 +5,142 @@ a per-request timeout, retries limited to transient failures (429/5xx) with
 exponential backoff and jitter honoring ``Retry-After``, and backoff performed
 outside the caller's semaphore so a slow-failing URL never holds a concurrency
 slot idle. Permanent errors (e.g. 404) return ``None`` immediately.
+
+:func:`fetch_with` is the same request path with a caller-supplied reader for
+the response body, for callers that stream it (e.g. sitemap parsing) rather
+than read it whole.
+
+The retry budget and delays are a :class:`Backoff` policy. Callers that need
+to know why a URL failed (e.g. :mod:`coffee.dead_letters`) pass `on_failure`,
+which receives a :class:`FetchFailure` whenever ``None`` is returned.
 """
 
 import asyncio
 import logging
 import random
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
+from typing import TypeVar
 
 import aiohttp
 
+T = TypeVar("T")
+
 # Only retry transient failures; other 4xx (e.g. 404 for a removed review) are
 # permanent and should fail fast instead of burning retries.
 RETRY_STATUSES: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+# Statuses meaning the page is gone for good, not just unavailable.
+GONE_STATUSES: frozenset[int] = frozenset({404, 410})
 REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=20)
 BASE_DELAY = 1.0  # seconds; exponential backoff base
 MAX_DELAY = 30.0
 JITTER = 1.0
 
 
-def _retry_delay(attempt: int, retry_after: str | None) -> float:
-    """Exponential backoff with jitter, honoring a numeric Retry-After header."""
-    if retry_after and retry_after.isdigit():
-        return float(retry_after)
-    return min(BASE_DELAY * 2**attempt, MAX_DELAY) + random.uniform(0, JITTER)
+@dataclass(frozen=True)
+class Backoff:
+    """How often to try a URL and how long to wait between attempts."""
+
+    retries: int = 5
+    base_delay: float = BASE_DELAY
+    max_delay: float = MAX_DELAY
+    jitter: float = JITTER
+
+    def delay(self, attempt: int, retry_after: str | None = None) -> float:
+        """Exponential backoff with jitter, honoring a numeric Retry-After."""
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return min(self.base_delay * 2**attempt, self.max_delay) + random.uniform(
+            0, self.jitter
+        )
+
+
+DEFAULT_BACKOFF = Backoff()
+
+
+@dataclass(frozen=True)
+class FetchFailure:
+    """Why :func:`fetch_with` gave up on a URL.
+
+    `status` is the last HTTP status received (None if the last attempt got
+    no response) and `error` the class of the last error: the exception's, or
+    ``ClientResponseError`` for an unwanted status.
+    """
+
+    url: str
+    status: int | None
+    error: str
+    attempts: int
+
+    @property
+    def gone(self) -> bool:
+        """Whether the page no longer exists, so retrying is pointless."""
+        return self.status in GONE_STATUSES
 
 
 async def fetch(
     url: str,
     session: aiohttp.ClientSession,
     semaphore: asyncio.Semaphore,
-    retries: int = 5,
+    backoff: Backoff = DEFAULT_BACKOFF,
+    on_failure: Callable[[FetchFailure], None] | None = None,
 ) -> str | None:
     """Fetch a URL with bounded concurrency, retrying only transient failures.
 
     The semaphore is held only for the request itself, not during backoff
     sleeps, so a slow-failing URL does not hold a concurrency slot idle.
     """
-    for attempt in range(retries):
+    return await fetch_with(
+        url, session, semaphore, _read_text, backoff=backoff, on_failure=on_failure
+    )
+
+
+async def _read_text(response: aiohttp.ClientResponse) -> str:
+    return await response.text()
+
+
+async def fetch_with(
+    url: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    read: Callable[[aiohttp.ClientResponse], Awaitable[T]],
+    backoff: Backoff = DEFAULT_BACKOFF,
+    on_failure: Callable[[FetchFailure], None] | None = None,
+    params: Mapping[str, str] | None = None,
+) -> T | None:
+    """Like :func:`fetch`, but return ``await read(response)`` for a 200.
+
+    `read` runs inside the request, so it can stream the body; an I/O error
+    while reading is retried like any other transient failure. `params` are
+    added to the query string but kept out of log messages (e.g. API keys).
+    """
+    status: int | None = None
+    error = ""
+    for attempt in range(backoff.retries):
         delay: float | None = None
         try:
             async with semaphore:
-                async with session.get(url, timeout=REQUEST_TIMEOUT) as response:
-                    if response.status == 200:
-                        return await response.text()
-                    if response.status not in RETRY_STATUSES:
-                        logging.warning("Skipping %s (HTTP %d)", url, response.status)
+                async with session.get(
+                    url, params=params, timeout=REQUEST_TIMEOUT
+                ) as response:
+                    status = response.status
+                    if status == 200:
+                        return await read(response)
+                    error = aiohttp.ClientResponseError.__name__
+                    if status not in RETRY_STATUSES:
+                        logging.warning("Skipping %s (HTTP %d)", url, status)
+                        if on_failure is not None:
+                            on_failure(FetchFailure(url, status, error, attempt + 1))
                         return None
-                    delay = _retry_delay(attempt, response.headers.get("Retry-After"))
-        except (aiohttp.ClientError, asyncio.TimeoutError):
-            delay = _retry_delay(attempt, None)
+                    delay = backoff.delay(attempt, response.headers.get("Retry-After"))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status, error = None, type(e).__name__
+            delay = backoff.delay(attempt)
 
-        if delay is not None and attempt < retries - 1:
+        if delay is not None and attempt < backoff.retries - 1:
             await asyncio.sleep(delay)
 
-    logging.error("Failed to fetch %s after %d attempts.", url, retries)
+    logging.error("Failed to fetch %s after %d attempts.", url, backoff.retries)
+    if on_failure is not None:
+        on_failure(FetchFailure(url, status, error, backoff.retries))
     return None
@@ -0,0 +1,257 @@
+"""Tag flavor descriptors in tasting notes with a compiled lexicon.
+
+The text notebook gets at flavor vocabulary only indirectly, through spaCy
+lemmas and TF-IDF over every word. :class:`FlavorLexicon` instead compiles a
+curated list of descriptors (the bundled ``flavors.csv``: fruit, floral,
+chocolate, nut, spice, roast and roast defects), each with its synonyms and
+multi-word phrases, into a single token trie. :meth:`FlavorLexicon.tag` walks
+a text through it in one left-to-right pass, taking the longest phrase that
+matches at each position, so ``dark chocolate`` counts as dark chocolate and
+not also as chocolate. Lookahead is bounded by the longest phrase (a few
+words), so tagging is linear in the length of the text, and no NLP model is
+loaded: :func:`extract` tags the ``blind_assessment`` and ``notes`` of the
+whole corpus in seconds.
+
+The result is a :class:`FlavorFeatures`: a sparse review x descriptor count
+matrix keyed by review URL, with per-descriptor totals and a per-category
+rollup. Matching is on whole lowercased words with apostrophes dropped, and
+the plural of each phrase's last word is added when the lexicon is compiled.
+"""
+
+from __future__ import annotations
+
+import csv
+import logging
+import re
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, load_npz, save_npz
+
+from coffee.config import Config
+from coffee.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+LEXICON = Path(__file__).with_name("flavors.csv")
+DEFAULT_OUTPUT = Config.DATA_DIR / "processed" / "flavor_features"
+TEXT_COLUMNS = ("blind_assessment", "notes")
+
+# Column of a blocker phrase: matched (so it shadows shorter phrases inside
+# it) but never counted.
+_BLOCKED = -1
+_TOKEN = re.compile(r"[^\W\d_]+")
+_APOSTROPHES = str.maketrans("", "", "'’")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased words of `text`, apostrophes dropped: ``Baker's`` -> ``bakers``."""
+    return _TOKEN.findall(text.lower().translate(_APOSTROPHES))
+
+
+def _plural(word: str) -> str:
+    if word.endswith("y") and word[-2:-1] not in "aeiou":
+        return word[:-1] + "ies"
+    if word.endswith(("s", "x", "ch", "sh")):
+        return word + "es"
+    return word + "s"
+
+
+class _Node:
+    __slots__ = ("children", "column")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.column: int | None = None
+
+
+class FlavorLexicon:
+    """Flavor descriptors and their phrases, compiled into one token trie.
+
+    The CSV has ``descriptor,category,synonyms`` rows, synonyms separated by
+    ``|``; a descriptor always matches its own name too. A row with an empty
+    category is a blocker: its phrases are matched but tag nothing, so e.g.
+    ``honey process`` isn't counted as honey. A phrase listed twice keeps its
+    first descriptor, and listed phrases win over generated plurals.
+    """
+
+    def __init__(self, path: Path = LEXICON):
+        self.descriptors: list[str] = []
+        self.categories: list[str] = []
+        self._root = _Node()
+        phrases: list[tuple[list[str], int]] = []
+        with Path(path).open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                column = _BLOCKED
+                if row["category"]:
+                    column = len(self.descriptors)
+                    self.descriptors.append(row["descriptor"])
+                    self.categories.append(row["category"])
+                names = [row["descriptor"], *filter(None, row["synonyms"].split("|"))]
+                phrases.extend((tokens, column) for tokens in map(tokenize, names))
+        for tokens, column in phrases:
+            self._insert(tokens, column)
+        for tokens, column in phrases:
+            self._insert([*tokens[:-1], _plural(tokens[-1])], column)
+
+    def __len__(self) -> int:
+        return len(self.descriptors)
+
+    def _insert(self, tokens: list[str], column: int) -> None:
+        node = self._root
+        for token in tokens:
+            node = node.children.setdefault(token, _Node())
+        if node.column is None:
+            node.column = column
+
+    def tag(self, text: str) -> list[int]:
+        """The descriptor column of every mention in `text`, in order."""
+        tokens = tokenize(text)
+        root = self._root.children
+        found: list[int] = []
+        i, n = 0, len(tokens)
+        while i < n:
+            node = root.get(tokens[i])
+            if node is None:
+                i += 1
+                continue
+            # Follow the trie as far as the text goes; the last terminal node
+            # passed is the longest phrase starting here.
+            column, end = node.column, i + 1
+            j = i + 1
+            while j < n and (node := node.children.get(tokens[j])) is not None:
+                j += 1
+                if node.column is not None:
+                    column, end = node.column, j
+            if column is None:
+                i += 1
+                continue
+            if column != _BLOCKED:
+                found.append(column)
+            i = end
+        return found
+
+    def count(self, texts: Iterable[str | None]) -> csr_matrix:
+        """Descriptor mention counts, one row per text; missing texts are empty."""
+        indices: list[int] = []
+        indptr = [0]
+        for text in texts:
+            if isinstance(text, str):
+                indices.extend(self.tag(text))
+            indptr.append(len(indices))
+        counts = csr_matrix(
+            (
+                np.ones(len(indices), dtype=np.int32),
+                np.asarray(indices, dtype=np.int32),
+                np.asarray(indptr, dtype=np.int64),
+            ),
+            shape=(len(indptr) - 1, len(self.descriptors)),
+        )
+        # Repeated mentions in a row are separate entries until summed.
+        counts.sum_duplicates()
+        return counts
+
+
+@dataclass
+class FlavorFeatures:
+    """Descriptor mention counts per review, as a sparse URL x descriptor matrix.
+
+    On disk (:meth:`save`) a directory of ``counts.npz``, ``urls.txt`` (one
+    review URL per row, in order) and ``descriptors.csv`` (one row per column,
+    with its category and totals).
+    """
+
+    urls: list[str]
+    descriptors: list[str]
+    categories: list[str]
+    counts: csr_matrix
+
+    def totals(self) -> pd.DataFrame:
+        """Per descriptor: category, reviews mentioning it, and total mentions."""
+        return pd.DataFrame(
+            {
+                "descriptor": self.descriptors,
+                "category": self.categories,
+                "n_reviews": self.counts.getnnz(axis=0),
+                "mentions": np.asarray(self.counts.sum(axis=0)).ravel(),
+            }
+        )
+
+    def by_category(self) -> FlavorFeatures:
+        """The same counts summed per category (a category per column)."""
+        names = list(dict.fromkeys(self.categories))
+        index = {name: i for i, name in enumerate(names)}
+        membership = csr_matrix(
+            (
+                np.ones(len(self.categories), dtype=np.int32),
+                (np.arange(len(self.categories)), [index[c] for c in self.categories]),
+            ),
+            shape=(len(self.categories), len(names)),
+        )
+        return FlavorFeatures(
+            urls=self.urls,
+            descriptors=names,
+            categories=names,
+            counts=(self.counts @ membership).tocsr(),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """The counts as a sparse-backed DataFrame indexed by URL."""
+        return pd.DataFrame.sparse.from_spmatrix(
+            self.counts,
+            index=pd.Index(self.urls, name="url"),
+            columns=self.descriptors,
+        )
+
+    def save(self, directory: Path = DEFAULT_OUTPUT) -> Path:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        save_npz(directory / "counts.npz", self.counts)
+        (directory / "urls.txt").write_text(
+            "".join(f"{url}\n" for url in self.urls), encoding="utf-8"
+        )
+        self.totals().to_csv(directory / "descriptors.csv", index=False)
+        return directory
+
+    @classmethod
+    def load(cls, directory: Path = DEFAULT_OUTPUT) -> FlavorFeatures:
+        directory = Path(directory)
+        columns = pd.read_csv(directory / "descriptors.csv")
+        return cls(
+            urls=(directory / "urls.txt").read_text(encoding="utf-8").splitlines(),
+            descriptors=columns["descriptor"].tolist(),
+            categories=columns["category"].tolist(),
+            counts=load_npz(directory / "counts.npz").tocsr(),
+        )
+
+
+@profiled("flavors.extract")
+def extract(
+    reviews: pd.DataFrame,
+    lexicon: FlavorLexicon | None = None,
+    columns: Sequence[str] = TEXT_COLUMNS,
+) -> FlavorFeatures:
+    """Tag the text `columns` of every review, summing mentions across them.
+
+    `reviews` also needs a ``url`` column, which keys the rows.
+    """
+    lexicon = lexicon or FlavorLexicon()
+    counts = csr_matrix((len(reviews), len(lexicon)), dtype=np.int32)
+    for column in columns:
+        counts = counts + lexicon.count(reviews[column])
+    features = FlavorFeatures(
+        urls=reviews["url"].tolist(),
+        descriptors=list(lexicon.descriptors),
+        categories=list(lexicon.categories),
+        counts=counts.tocsr(),
+    )
+    logger.info(
+        "Tagged %d flavor mentions (%d descriptors) in %d reviews",
+        features.counts.sum(),
+        len(lexicon),
+        len(reviews),
+    )
+    return features
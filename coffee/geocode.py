@@ -0,0 +1,411 @@
+"""Geocode roaster locations: offline gazetteer first, a cached API for misses.
+
+Roaster locations repeat heavily (``Portland, Oregon``, ``Taipei, Taiwan``), so
+:class:`Geocoder` first reduces them to distinct normalized queries
+(:func:`normalize_location`: accents, case, punctuation and spacing folded).
+Each query is then resolved by the cheapest source that can answer it:
+
+1. the bundled gazetteer (``gazetteer.csv``), with coordinates for the cities
+   roasters are most often in. Countries and their states or provinces are
+   recognized with pycountry, which also tells apart e.g. Portland, Oregon
+   from Portland, Maine;
+2. the local cache of earlier API answers (:data:`DEFAULT_CACHE`), empty
+   answers included, so a query is never sent twice;
+3. the geocoding API (geocode.maps.co, keyed by ``GEOCODE_API_KEY``), with
+   bounded concurrency and the shared retry/backoff of :mod:`coffee.fetch`.
+
+A query that no source locates keeps what pycountry could tell (its country,
+maybe its region) without coordinates. Without an API key, the geocoder works
+offline from the first two sources. The stub server (:mod:`coffee.stub_server`)
+answers the API's search endpoint for offline tests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import logging
+import os
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass, replace
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from unidecode import unidecode
+
+from coffee.config import Config
+
+if TYPE_CHECKING:
+    import aiohttp
+
+    from coffee.fetch import Backoff
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER = Path(__file__).with_name("gazetteer.csv")
+DEFAULT_CACHE = Config.DATA_DIR / "external" / "geocode_cache.csv"
+DEFAULT_API_URL = "https://geocode.maps.co/search"
+# The free API tier allows a couple of requests per second.
+DEFAULT_CONCURRENCY = 2
+
+# Where a Place's answer came from.
+GAZETTEER_SOURCE = "gazetteer"
+API = "api"
+COUNTRY = "country"  # country (and region) only, no coordinates
+UNRESOLVED = "unresolved"
+
+# Country names roaster locations use that pycountry's lookup doesn't know.
+_COUNTRY_ALIASES = {
+    "usa": "US",
+    "us": "US",
+    "united states": "US",
+    "uk": "GB",
+    "england": "GB",
+    "scotland": "GB",
+    "wales": "GB",
+    "russia": "RU",
+    "korea": "KR",
+}
+# Countries whose states/provinces appear in place of a country.
+_SUBDIVISION_COUNTRIES = ("US", "CA", "AU")
+_FIELDS = ("query", "city", "region", "country", "lat", "lon", "source")
+
+
+@dataclass(frozen=True)
+class Place:
+    """What a location query resolved to.
+
+    `region` is an ISO 3166-2 code (``US-OR``) and `country` an ISO 3166-1
+    alpha-2 code; `lat`/`lon` are None unless some source located it.
+    """
+
+    query: str
+    city: str | None
+    region: str | None
+    country: str | None
+    lat: float | None
+    lon: float | None
+    source: str
+
+    @property
+    def located(self) -> bool:
+        return self.lat is not None and self.lon is not None
+
+
+def _normalize_part(text: str) -> str:
+    text = unidecode(text).lower().replace(".", "").replace("-", " ")
+    return " ".join(text.split())
+
+
+def normalize_location(text: str) -> str:
+    """Fold a location for matching: ``"Chia-Yi,  Taiwan"`` -> ``"chia yi, taiwan"``."""
+    parts = (_normalize_part(part) for part in text.split(","))
+    return ", ".join(part for part in parts if part)
+
+
+@cache
+def _subdivisions() -> dict[str, str]:
+    """Normalized state/province name or postal abbreviation -> ISO 3166-2."""
+    import pycountry
+
+    out: dict[str, str] = {}
+    for country in _SUBDIVISION_COUNTRIES:
+        for sub in pycountry.subdivisions.get(country_code=country):
+            out.setdefault(_normalize_part(sub.name), sub.code)
+            out.setdefault(sub.code.partition("-")[2].lower(), sub.code)
+    return out
+
+
+@cache
+def _country_code(name: str) -> str | None:
+    """ISO alpha-2 code for a normalized country name or code, if it is one."""
+    if name in _COUNTRY_ALIASES:
+        return _COUNTRY_ALIASES[name]
+    import pycountry
+
+    try:
+        return pycountry.countries.lookup(name).alpha_2
+    except LookupError:
+        return None
+
+
+def _split(query: str) -> tuple[str | None, str | None, str | None]:
+    """(city, region, country) of a normalized query, as far as they're known."""
+    parts = query.split(", ")
+    if len(parts) == 1:
+        # A lone name is a country, else a state, else (presumably) a city.
+        if country := _country_code(query):
+            return None, None, country
+        if region := _subdivisions().get(query):
+            return None, region, region[:2]
+        return query, None, None
+
+    city, region, country = parts[0], None, None
+    for token in parts[1:]:
+        # After a city, "Georgia" is the US state; a trailing country wins.
+        if region is None and (sub := _subdivisions().get(token)):
+            region = sub
+        elif code := _country_code(token):
+            country = code
+    if region is not None:
+        if country is None:
+            country = region[:2]
+        elif region[:2] != country:
+            region = None
+    return city, region, country
+
+
+class Gazetteer:
+    """Offline coordinates for common roaster cities, from a bundled CSV.
+
+    The CSV has ``city,aliases,region,country,lat,lon`` rows, aliases
+    separated by ``|``. When a city name is ambiguous and the query names no
+    region, the first row wins, so list the likelier city first.
+    """
+
+    def __init__(self, path: Path = GAZETTEER):
+        self._places: dict[tuple[str, str], Place] = {}
+        with Path(path).open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                place = Place(
+                    query="",
+                    city=row["city"],
+                    region=row["region"] or None,
+                    country=row["country"],
+                    lat=float(row["lat"]),
+                    lon=float(row["lon"]),
+                    source=GAZETTEER_SOURCE,
+                )
+                names = [row["city"], *filter(None, row["aliases"].split("|"))]
+                for name in map(_normalize_part, names):
+                    for scope in (place.region, place.country, ""):
+                        if scope is not None:
+                            self._places.setdefault((name, scope), place)
+
+    def __len__(self) -> int:
+        return len({id(place) for place in self._places.values()})
+
+    def lookup(
+        self, city: str, region: str | None = None, country: str | None = None
+    ) -> Place | None:
+        """The gazetteer entry for a normalized city name, most specific first.
+
+        An entry in another country or region than the one given never matches:
+        Portland, Texas is not Portland, Oregon.
+        """
+        for scope in (region, country, ""):
+            if scope is None or (place := self._places.get((city, scope))) is None:
+                continue
+            if country is not None and place.country != country:
+                continue
+            if region is not None and place.region not in (None, region):
+                continue
+            return place
+        return None
+
+    def resolve(self, query: str) -> Place:
+        """Resolve a normalized query offline; unlocated if not in the gazetteer."""
+        city, region, country = _split(query)
+        if city is not None and (place := self.lookup(city, region, country)):
+            return replace(place, query=query)
+        return Place(
+            query=query,
+            city=city.title() if city else None,
+            region=region,
+            country=country,
+            lat=None,
+            lon=None,
+            source=COUNTRY if country else UNRESOLVED,
+        )
+
+
+class GeocodeCache:
+    """Normalized query -> the API's answer, kept in a CSV.
+
+    Empty answers are cached too (source ``api``, no coordinates), so a query
+    the API can't place is not asked again.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE):
+        self.path = Path(path)
+        self.places: dict[str, Place] = {}
+        if self.path.exists():
+            with self.path.open(newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    self.places[row["query"]] = Place(
+                        query=row["query"],
+                        city=row["city"] or None,
+                        region=row["region"] or None,
+                        country=row["country"] or None,
+                        lat=float(row["lat"]) if row["lat"] else None,
+                        lon=float(row["lon"]) if row["lon"] else None,
+                        source=row["source"],
+                    )
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def get(self, query: str) -> Place | None:
+        return self.places.get(query)
+
+    def put(self, place: Place) -> None:
+        self.places[place.query] = place
+
+    def save(self) -> Path:
+        """Write the cache atomically; returns its path."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(_FIELDS)
+            for query in sorted(self.places):
+                place = self.places[query]
+                writer.writerow(
+                    [
+                        "" if getattr(place, f) is None else getattr(place, f)
+                        for f in _FIELDS
+                    ]
+                )
+        os.replace(tmp, self.path)
+        return self.path
+
+
+def _merge(offline: Place, answer: Place) -> Place:
+    """An offline partial answer completed with the API's coordinates."""
+    if not answer.located:
+        return offline
+    return replace(
+        offline,
+        country=offline.country or answer.country,
+        lat=answer.lat,
+        lon=answer.lon,
+        source=API,
+    )
+
+
+async def _read_json(response: aiohttp.ClientResponse) -> Any:
+    return await response.json(content_type=None)
+
+
+class Geocoder:
+    """Resolve many locations with as few API calls as possible.
+
+    `api_key` defaults to ``Config.GEOCODE_API_KEY``; pass ``api_key=""`` to
+    stay offline. `api_url` can point at a stub server.
+    """
+
+    def __init__(
+        self,
+        cache: GeocodeCache | None = None,
+        gazetteer: Gazetteer | None = None,
+        api_url: str = DEFAULT_API_URL,
+        api_key: str | None = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        backoff: Backoff | None = None,
+    ):
+        self.cache = cache if cache is not None else GeocodeCache()
+        self.gazetteer = gazetteer if gazetteer is not None else Gazetteer()
+        self.api_url = api_url
+        self.api_key = Config.GEOCODE_API_KEY if api_key is None else api_key
+        self.concurrency = concurrency
+        self.backoff = backoff
+
+    async def geocode(self, locations: Iterable[str | None]) -> dict[str, Place]:
+        """Raw location -> :class:`Place`, for each distinct non-blank location."""
+        queries = {
+            loc: query
+            for loc in set(locations)
+            if loc and (query := normalize_location(str(loc)))
+        }
+        places: dict[str, Place] = {}
+        misses: list[str] = []
+        for query in sorted(set(queries.values())):
+            place = self.gazetteer.resolve(query)
+            if not place.located:
+                if (answer := self.cache.get(query)) is not None:
+                    place = _merge(place, answer)
+                else:
+                    misses.append(query)
+            places[query] = place
+        logger.info(
+            "%d locations -> %d distinct queries; %d resolved offline or cached, "
+            "%d to look up",
+            len(queries),
+            len(places),
+            len(places) - len(misses),
+            len(misses),
+        )
+
+        if misses and self.api_key:
+            answers = await self._lookup(misses)
+            for query, answer in answers.items():
+                places[query] = _merge(places[query], answer)
+        elif misses:
+            logger.warning(
+                "No GEOCODE_API_KEY; %d queries stay without coordinates", len(misses)
+            )
+
+        counts = Counter(place.source for place in places.values())
+        logger.info("Geocoded by source: %s", dict(sorted(counts.items())))
+        return {loc: places[query] for loc, query in queries.items()}
+
+    async def _lookup(self, queries: list[str]) -> dict[str, Place]:
+        """Ask the API for each query, caching every answer it gives."""
+        import aiohttp
+        from tqdm.asyncio import tqdm
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        answers: dict[str, Place] = {}
+        async with aiohttp.ClientSession(headers=Config.HEADERS) as session:
+            tasks = [self._search(q, session, semaphore) for q in queries]
+            try:
+                for future in tqdm(asyncio.as_completed(tasks), total=len(tasks)):
+                    if (answer := await future) is not None:
+                        answers[answer.query] = answer
+                        self.cache.put(answer)
+            finally:
+                # Keep what was paid for even if the batch is interrupted.
+                logger.info(
+                    "Geocode cache (%d) at %s", len(self.cache), self.cache.save()
+                )
+        if failed := len(queries) - len(answers):
+            logger.warning("%d geocoding requests failed; not cached", failed)
+        return answers
+
+    async def _search(
+        self,
+        query: str,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+    ) -> Place | None:
+        """The API's best match for `query` (unlocated if none); None on failure."""
+        from coffee.fetch import DEFAULT_BACKOFF, fetch_with
+
+        results = await fetch_with(
+            self.api_url,
+            session,
+            semaphore,
+            _read_json,
+            backoff=self.backoff or DEFAULT_BACKOFF,
+            params={"q": query, "api_key": self.api_key or ""},
+        )
+        if results is None:
+            return None
+        if not isinstance(results, list) or not results:
+            return Place(query, None, None, None, None, None, API)
+        best = results[0]
+        # Nominatim-style names end with the country's name; a bare two- or
+        # three-letter tail is more likely a state ("Sterling, Va").
+        tail = _normalize_part(str(best.get("display_name", "")).rpartition(",")[2])
+        country = (
+            _country_code(tail) if len(tail) > 3 or tail in _COUNTRY_ALIASES else None
+        )
+        lat: float | None
+        lon: float | None
+        try:
+            lat, lon = float(best["lat"]), float(best["lon"])
+        except (KeyError, TypeError, ValueError):
+            lat = lon = None
+        return Place(query, None, None, country, lat, lon, API)
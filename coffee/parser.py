@@ -2,9 +2,17 @@
 
 :func:`parse_html` extracts the rating, roaster, title, blind assessment,
 notes, and bottom line, then merges in the review's spec table (coffee origin,
-price, agtron, etc.). Parsing is pure CPU work with no I/O, so the functions
-are synchronous; run them in a thread (e.g. ``asyncio.to_thread``) to avoid
-blocking the event loop during a scrape.
+price, agtron, etc.). :func:`parse_review` converts that dict once into a
+typed :class:`coffee.records.Review`, which is what the scraper keeps. Parsing
+is pure CPU work with no I/O, so the functions are synchronous; run them in a
+thread (e.g. ``asyncio.to_thread``) to avoid blocking the event loop during a
+scrape.
+
+Everything those functions read sits inside the page's
+``<div class="review-template">``; the rest (header, sidebar widgets, ads,
+scripts) is most of the page's bytes. :func:`main_content` cuts that region
+out with a cheap scan, without building a tree, so the scraper can hash it to
+detect changed reviews and parse just it.
 """
 
 import logging
@@ -13,6 +21,11 @@ import re
 from bs4 import BeautifulSoup
 from bs4.element import Tag
 
+from coffee.records import Review
+
+_MAIN_CONTENT = re.compile(r'<div\b[^>]*\bclass="review-template"')
+_DIV_TAG = re.compile(r"<(/?)div\b", re.IGNORECASE)
+
 
 def _parse_element(
     soup: BeautifulSoup,
@@ -88,3 +101,26 @@ def parse_html(text: str) -> dict[str, str | None]:
         data.update(table_data)
 
     return data
+
+
+def main_content(text: str) -> str | None:
+    """The review's ``<div class="review-template">`` element, as source text.
+
+    Matches ``<div>`` tags by depth rather than parsing the page; returns None
+    if the page has no such element or it is never closed.
+    """
+    start = _MAIN_CONTENT.search(text)
+    if start is None:
+        return None
+    depth = 0
+    for tag in _DIV_TAG.finditer(text, start.start()):
+        depth += -1 if tag[1] else 1
+        if depth == 0:
+            end = text.find(">", tag.end())
+            return text[start.start() : end + 1] if end != -1 else None
+    return None
+
+
+def parse_review(text: str, url: str) -> Review:
+    """Parse a review page straight into a typed :class:`Review`."""
+    return Review.from_fields(url, parse_html(text))
@@ -0,0 +1,479 @@
+"""Stage DAG for the end-to-end pipeline, with content-hash caching.
+
+The pipeline is a handful of steps that each read some files and write
+others: scrape, exchange rates, cleaning, roaster resolution, the analysis
+notebooks. A :class:`Stage` declares its command, the paths it reads
+(``inputs``), the paths it writes (``outputs``) and the source files its
+behaviour depends on (``code``). Stage B depends on stage A whenever one of
+B's inputs is, or lies inside, one of A's outputs, or B names A in
+``after`` (for files A writes only sometimes, like the roaster queue).
+
+Before a stage runs, its fingerprint is computed: a SHA-256 over the command,
+the content of every input (directories file by file) and the code files
+(for notebooks, only the code cells, so re-running one doesn't change its
+version). A stage is up to date if its fingerprint matches the one recorded
+after its last successful run and all its outputs still exist. Inputs a stage
+``consumes`` (a queue it empties once processed) are re-hashed after the run,
+so the emptied queue isn't taken for new input next time. Fingerprints
+are computed only once the stage's upstream has finished, so a stage whose
+upstream re-ran but wrote byte-identical outputs is still skipped.
+
+Independent stages run in parallel, each as a subprocess. A failed stage
+fails only its downstream; unrelated stages still run.
+
+State lives in one JSON file: the fingerprint of each stage, plus a cache of
+file digests keyed by size and modification time so unchanged inputs aren't
+re-read on every run.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Iterable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+from coffee.config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE = Config.DATA_DIR / "intermediate" / "pipeline" / "state.json"
+NOTEBOOK_OUTPUT_DIR = Config.DATA_DIR / "intermediate" / "pipeline" / "notebooks"
+_CHUNK_SIZE = 1 << 20
+
+# Outcomes reported by Pipeline.run.
+RAN = "ran"
+SKIPPED = "up to date"
+FAILED = "failed"
+MISSING = "missing input"
+BLOCKED = "blocked"  # an upstream stage failed
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One pipeline step: a command and the files it reads and writes.
+
+    Paths are relative to the project root unless absolute. A stage with no
+    inputs (e.g. the scrape, whose source is the website) runs only when its
+    outputs are missing or it is forced. ``after`` names stages that must
+    finish first without any declared file between them. ``consumes`` lists
+    inputs the stage itself rewrites; they are fingerprinted as it left them.
+    """
+
+    name: str
+    command: tuple[str, ...]
+    inputs: tuple[Path, ...] = ()
+    outputs: tuple[Path, ...] = ()
+    code: tuple[Path, ...] = ()
+    after: tuple[str, ...] = ()
+    consumes: tuple[Path, ...] = ()
+
+    def __post_init__(self):
+        if not self.outputs:
+            raise ValueError(f"Stage {self.name!r} declares no outputs.")
+        for attr in ("inputs", "outputs", "code", "consumes"):
+            paths = tuple(_resolve(p) for p in getattr(self, attr))
+            object.__setattr__(self, attr, paths)
+        if not set(self.consumes) <= set(self.inputs):
+            raise ValueError(f"Stage {self.name!r} consumes paths it doesn't read.")
+
+
+def _resolve(path: Path | str) -> Path:
+    path = Path(path)
+    return path if path.is_absolute() else Config.PROJECT_ROOT / path
+
+
+def _contains(parent: Path, path: Path) -> bool:
+    return path == parent or parent in path.parents
+
+
+def notebook_stage(
+    name: str,
+    notebook: Path | str,
+    inputs: Iterable[Path | str] = (),
+    outputs: Iterable[Path | str] = (),
+    code: Iterable[Path | str] = (),
+) -> Stage:
+    """A stage that executes `notebook` headlessly with nbconvert.
+
+    The executed copy goes to :data:`NOTEBOOK_OUTPUT_DIR` and is always one of
+    the stage's outputs, so the source notebook is never modified by a run.
+    """
+    notebook = _resolve(notebook)
+    return Stage(
+        name=name,
+        command=(
+            sys.executable,
+            "-m",
+            "nbconvert",
+            "--to",
+            "notebook",
+            "--execute",
+            "--output-dir",
+            str(NOTEBOOK_OUTPUT_DIR),
+            str(notebook),
+        ),
+        inputs=tuple(map(_resolve, inputs)),
+        outputs=(NOTEBOOK_OUTPUT_DIR / notebook.name, *map(_resolve, outputs)),
+        code=(notebook, *map(_resolve, code)),
+    )
+
+
+def _coffee(*args: str) -> tuple[str, ...]:
+    return (sys.executable, "-m", "coffee", *args)
+
+
+_EXTERNAL = Config.DATA_DIR / "external"
+_INTERMEDIATE = Config.DATA_DIR / "intermediate"
+_PROCESSED = Config.DATA_DIR / "processed"
+_DATASET = _PROCESSED / "reviews"
+_RATES = _EXTERNAL / "openex_exchange_rates.json"
+_PENDING = _PROCESSED / "roaster_pending.csv"
+_CROSSWALK = _PROCESSED / "roaster_crosswalk.csv"
+_CLEANED = _INTERMEDIATE / "25072024_reviews_intermediate.csv"
+
+# The project's flow. The notebooks read the files named in their first cells;
+# the paths here mirror them.
+DEFAULT_STAGES: tuple[Stage, ...] = (
+    Stage(
+        "scrape",
+        _coffee("scrape", "--dataset", str(_DATASET)),
+        # The change set lists the reviews this scrape added or modified.
+        outputs=(_DATASET, _PROCESSED / "review_changes.csv"),
+        code=(
+            Path("coffee/commands/scrape_reviews.py"),
+            Path("coffee/review_urls.py"),
+            Path("coffee/sitemaps.py"),
+            Path("coffee/review_scraper.py"),
+            Path("coffee/changes.py"),
+            Path("coffee/parser.py"),
+            Path("coffee/records.py"),
+            Path("coffee/storage.py"),
+        ),
+    ),
+    Stage(
+        "rates",
+        _coffee("rates", "--input", str(_DATASET), "--output", str(_RATES)),
+        inputs=(_DATASET,),
+        outputs=(_RATES,),
+        code=(Path("coffee/commands/openex.py"),),
+    ),
+    Stage(
+        "roasters",
+        _coffee(
+            "roasters",
+            str(_PENDING),
+            "--index",
+            str(_CROSSWALK),
+            "--outdir",
+            str(_INTERMEDIATE / "roasters"),
+        ),
+        inputs=(_PENDING,),
+        outputs=(_CROSSWALK, _INTERMEDIATE / "roasters" / "review.csv"),
+        code=(Path("coffee/commands/resolve_roasters.py"), Path("coffee/roasters.py")),
+        # The scrape appends unseen spellings to the pending queue, but only
+        # when there are any, so the queue can't be one of its outputs.
+        after=("scrape",),
+        # Resolved names leave the queue; only new ones should re-run this.
+        consumes=(_PENDING,),
+    ),
+    Stage(
+        "geocode",
+        _coffee("geocode", "--input", str(_DATASET)),
+        inputs=(_DATASET,),
+        outputs=(_PROCESSED / "roaster_locations.csv",),
+        code=(
+            Path("coffee/commands/geocode.py"),
+            Path("coffee/geocode.py"),
+            Path("coffee/gazetteer.csv"),
+        ),
+    ),
+    Stage(
+        "flavors",
+        _coffee("flavors", "--input", str(_DATASET)),
+        inputs=(_DATASET,),
+        outputs=(_PROCESSED / "flavor_features",),
+        code=(
+            Path("coffee/commands/flavors.py"),
+            Path("coffee/flavors.py"),
+            Path("coffee/flavors.csv"),
+        ),
+    ),
+    notebook_stage(
+        "clean",
+        "notebooks/01-data-cleaning.ipynb",
+        inputs=(
+            _DATASET,
+            _RATES,
+            _EXTERNAL / "consumer_price_index.csv",
+            _PROCESSED / "roaster_locations.csv",
+        ),
+        outputs=(_CLEANED, _PROCESSED / "aggregates"),
+        code=(Path("coffee/aggregates.py"), Path("coffee/storage.py")),
+    ),
+    notebook_stage(
+        "eda",
+        "notebooks/02-data-EDA.ipynb",
+        inputs=(_CLEANED, _PROCESSED / "aggregates"),
+    ),
+    notebook_stage(
+        "text",
+        "notebooks/03-text-features.ipynb",
+        inputs=(_CLEANED,),
+        outputs=(_PROCESSED / "tfidf_store", _PROCESSED / "tfidf_store_nltk"),
+        code=(
+            Path("coffee/text.py"),
+            Path("coffee/ranking.py"),
+            Path("coffee/tfidf.py"),
+        ),
+    ),
+)
+
+
+class FileHasher:
+    """Content digests of files and directories, cached by size and mtime.
+
+    The cache maps a path to ``[size, mtime_ns, digest]``; a file whose size
+    and modification time are unchanged is not re-read.
+    """
+
+    def __init__(self, cache: dict[str, list] | None = None):
+        self.cache: dict[str, list] = cache if cache is not None else {}
+
+    def file_digest(self, path: Path) -> str:
+        stat = path.stat()
+        key = str(path)
+        cached = self.cache.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        if path.suffix == ".ipynb":
+            digest = hashlib.sha256(_notebook_code(path)).hexdigest()
+        else:
+            h = hashlib.sha256()
+            with path.open("rb") as f:
+                while chunk := f.read(_CHUNK_SIZE):
+                    h.update(chunk)
+            digest = h.hexdigest()
+        self.cache[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def digest(self, path: Path) -> str | None:
+        """Digest of a file, or of a directory's files and their relative paths.
+
+        None if `path` doesn't exist.
+        """
+        if path.is_file():
+            return self.file_digest(path)
+        if not path.is_dir():
+            return None
+        h = hashlib.sha256()
+        for file in sorted(p for p in path.rglob("*") if p.is_file()):
+            h.update(file.relative_to(path).as_posix().encode())
+            h.update(self.file_digest(file).encode())
+        return h.hexdigest()
+
+
+def _notebook_code(path: Path) -> bytes:
+    """The code cells of a notebook: its version, ignoring outputs and counts."""
+    cells = json.loads(path.read_text(encoding="utf-8")).get("cells", [])
+    sources = ("".join(c["source"]) for c in cells if c["cell_type"] == "code")
+    return "\n\0".join(sources).encode()
+
+
+class Pipeline:
+    """Runs a set of stages in dependency order, skipping up-to-date ones."""
+
+    def __init__(self, stages: Sequence[Stage] = DEFAULT_STAGES, state=DEFAULT_STATE):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique.")
+        self.state_path = Path(state)
+        self.upstream = {
+            name: {
+                other.name
+                for other in stages
+                if other.name != name
+                and (
+                    other.name in stage.after
+                    or any(
+                        _contains(out, path)
+                        for out in other.outputs
+                        for path in stage.inputs
+                    )
+                )
+            }
+            for name, stage in self.stages.items()
+        }
+        self.order = self._topological_order()
+        self._fingerprints: dict[str, str] = {}
+        self._hasher = FileHasher()
+        if self.state_path.exists():
+            saved = json.loads(self.state_path.read_text())
+            self._fingerprints = saved.get("stages", {})
+            self._hasher = FileHasher(saved.get("files", {}))
+
+    def _topological_order(self) -> list[str]:
+        order: list[str] = []
+        visiting: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependencies form a cycle through {name!r}.")
+            visiting.add(name)
+            for dep in sorted(self.upstream[name]):
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def select(self, targets: Iterable[str] = ()) -> list[str]:
+        """`targets` and everything upstream of them, in run order (all if empty)."""
+        targets = self._known(targets)
+        if not targets:
+            return list(self.order)
+        wanted: set[str] = set()
+        todo = list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in wanted:
+                wanted.add(name)
+                todo.extend(self.upstream[name])
+        return [name for name in self.order if name in wanted]
+
+    def _known(self, names: Iterable[str]) -> list[str]:
+        names = list(names)
+        unknown = set(names) - set(self.stages)
+        if unknown:
+            raise KeyError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+        return names
+
+    def fingerprint(self, name: str) -> str:
+        """Hash of the stage's command, input contents and code version."""
+        stage = self.stages[name]
+        h = hashlib.sha256()
+        h.update(json.dumps(stage.command).encode())
+        for kind, paths in (("in", stage.inputs), ("code", stage.code)):
+            for path in paths:
+                digest = self._hasher.digest(path)
+                if digest is None and kind == "in":
+                    raise FileNotFoundError(f"Stage {name!r} input {path} is missing.")
+                h.update(f"{kind}\0{path}\0{digest}\0".encode())
+        return h.hexdigest()
+
+    def is_current(self, name: str) -> bool:
+        stage = self.stages[name]
+        return self._fingerprints.get(name) == self.fingerprint(name) and all(
+            path.exists() for path in stage.outputs
+        )
+
+    def plan(self, targets: Iterable[str] = (), force: Iterable[str] = ()) -> list[str]:
+        """Stages a run would execute, assuming every upstream change propagates.
+
+        A dry run can't know that an upstream stage will write identical
+        outputs, so this may list stages a real run ends up skipping.
+        """
+        force = set(self._known(force))
+        stale: list[str] = []
+        for name in self.select(targets):
+            try:
+                current = self.is_current(name)
+            except FileNotFoundError:
+                current = False
+            if name in force or not current or self.upstream[name] & set(stale):
+                stale.append(name)
+        return stale
+
+    def _execute(self, name: str) -> None:
+        stage = self.stages[name]
+        for path in stage.outputs:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        logger.info("[%s] %s", name, " ".join(stage.command))
+        start = time.perf_counter()
+        subprocess.run(stage.command, check=True, cwd=Config.PROJECT_ROOT)
+        logger.info("[%s] finished in %.1f s", name, time.perf_counter() - start)
+
+    def run(
+        self,
+        targets: Iterable[str] = (),
+        force: Iterable[str] = (),
+        jobs: int = os.cpu_count() or 1,
+    ) -> dict[str, str]:
+        """Bring `targets` (default: every stage) up to date; stage -> outcome.
+
+        Stages named in `force` run even if up to date. Up to `jobs` stages run
+        at once.
+        """
+        force = set(self._known(force))
+        selected = self.select(targets)
+        outcome: dict[str, str] = {}
+        pending = list(selected)
+        running: dict[Future, tuple[str, str]] = {}
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.upstream[name] & set(selected)
+                    if any(outcome.get(d) in (FAILED, MISSING, BLOCKED) for d in deps):
+                        outcome[name] = BLOCKED
+                        pending.remove(name)
+                        logger.warning("[%s] skipped: an upstream stage failed", name)
+                        continue
+                    if not all(d in outcome for d in deps) or len(running) >= jobs:
+                        continue
+                    pending.remove(name)
+                    try:
+                        fingerprint = self.fingerprint(name)
+                    except FileNotFoundError as e:
+                        outcome[name] = MISSING
+                        logger.warning("[%s] skipped: %s", name, e)
+                        continue
+                    if name not in force and self.is_current(name):
+                        outcome[name] = SKIPPED
+                        logger.info("[%s] up to date", name)
+                        continue
+                    running[pool.submit(self._execute, name)] = (name, fingerprint)
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, fingerprint = running.pop(future)
+                    try:
+                        future.result()
+                    except (OSError, subprocess.CalledProcessError) as e:
+                        outcome[name] = FAILED
+                        logger.error("[%s] failed: %s", name, e)
+                        continue
+                    outcome[name] = RAN
+                    if self.stages[name].consumes:
+                        try:
+                            fingerprint = self.fingerprint(name)
+                        except FileNotFoundError:
+                            pass  # consumed outright; the next run reports it
+                    self._fingerprints[name] = fingerprint
+                    self._save()
+
+        return {name: outcome[name] for name in selected}
+
+    def _save(self) -> None:
+        """Write the state atomically; a crash mid-write keeps the old one."""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {"stages": self._fingerprints, "files": self._hasher.cache}, indent=1
+            )
+        )
+        os.replace(tmp, self.state_path)
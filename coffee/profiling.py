@@ -0,0 +1,420 @@
+"""Opt-in CPU, memory and event-loop profiling, written to a run directory.
+
+Profiling is off unless asked for, either with ``coffee --profile COMMAND``
+or by setting ``COFFEE_PROFILE`` (to ``1`` for the default location, or to a
+directory to collect runs under). The environment variable also reaches the
+``scripts/`` wrappers, subprocesses started by ``coffee pipeline``, and
+library code called from a notebook. Per-line memory diffs are slow on a large
+heap and are a further opt-in: ``coffee --profile-memory`` or
+``COFFEE_PROFILE_SNAPSHOTS=1``.
+
+Work is split into named stages, with :func:`stage` (a context manager) or
+:func:`profiled` (a decorator). The commands and the heavier library entry
+points (lemmatization, TF-IDF appends, roaster resolution, the Parquet
+writer, the aggregate store) already declare theirs. For each stage the run
+directory gets:
+
+- ``NN-<stage>.prof``: a cProfile dump, for ``pstats``/snakeviz, with a
+  readable ``NN-<stage>.txt`` summary next to it. A nested stage has its own
+  profile, and its time is left out of its parent's.
+- ``NN-<stage>.memory.txt``, with snapshots on: the lines holding the most
+  memory allocated during the stage and still live at its end, from a
+  tracemalloc snapshot diff.
+- a row in ``summary.json``: wall and CPU time, tracemalloc peak, net
+  allocated memory, and the process's max RSS. The profiler's own work for
+  nested stages (dumping their profiles, snapshots) is left out of the
+  parent's times.
+
+For asyncio code, :func:`watch_event_loop` puts the loop in debug mode:
+callbacks that block it longer than :data:`SLOW_CALLBACK_SECONDS` go to
+``asyncio.log``, and ``asyncio.json`` gets a time series of the number of
+live tasks.
+
+With profiling off, :func:`stage` and :func:`profiled` cost one function
+call. Everything here is stdlib, imported only when a profiler starts.
+"""
+
+from __future__ import annotations
+
+import atexit
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import (
+    AbstractContextManager,
+    asynccontextmanager,
+    contextmanager,
+    nullcontext,
+)
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from coffee.config import Config
+
+if TYPE_CHECKING:
+    import cProfile
+    import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = "COFFEE_PROFILE"
+SNAPSHOTS_ENV = "COFFEE_PROFILE_SNAPSHOTS"
+DEFAULT_PROFILE_ROOT = Config.DATA_DIR / "intermediate" / "profiles"
+SLOW_CALLBACK_SECONDS = 0.1
+TASK_SAMPLE_SECONDS = 0.5
+TOP_N = 30
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_active: Profiler | None = None
+_env_checked = False
+
+
+class _Frame:
+    """A stage in progress."""
+
+    # A plain class: dataclasses would add to every command's startup time.
+    def __init__(
+        self,
+        name: str,
+        index: int,
+        profile: cProfile.Profile,
+        snapshot: tracemalloc.Snapshot | None,
+        traced: int,
+    ):
+        self.name = name
+        self.index = index
+        self.profile = profile
+        self.snapshot = snapshot
+        self.traced = traced
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.peak = 0
+        # Time the profiler spent on nested stages, left out of this one's.
+        self.overhead_wall = 0.0
+        self.overhead_cpu = 0.0
+
+
+class Profiler:
+    """Per-stage cProfile, tracemalloc and timing, written under `run_dir`.
+
+    Each stage records its tracemalloc peak and net traced memory; with
+    `snapshots`, it also diffs full tracemalloc snapshots for the per-line
+    ``memory.txt`` report, which costs seconds per stage on a large heap.
+    Use one per process: the module-level :func:`start` / :func:`session`
+    manage it.
+    """
+
+    def __init__(self, run_dir: Path, top: int = TOP_N, snapshots: bool = False):
+        import tracemalloc
+
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.top = top
+        self.snapshots = snapshots
+        self.stages: list[dict[str, Any]] = []
+        self._stack: list[_Frame] = []
+        self._count = 0
+        self._started = time.time()
+        self._closed = False
+        self._owns_tracing = not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        import cProfile
+        import tracemalloc
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        parent = self._stack[-1] if self._stack else None
+        if parent is not None:
+            parent.profile.disable()
+            # reset_peak() below would lose the parent's peak so far.
+            parent.peak = max(parent.peak, tracemalloc.get_traced_memory()[1])
+        self._count += 1
+        snapshot = self._snapshot() if self.snapshots else None
+        tracemalloc.reset_peak()
+        frame = _Frame(
+            name=name,
+            index=self._count,
+            profile=cProfile.Profile(),
+            snapshot=snapshot,
+            traced=tracemalloc.get_traced_memory()[0],
+        )
+        self._stack.append(frame)
+        frame.profile.enable()
+        try:
+            yield
+        finally:
+            frame.profile.disable()
+            self._stack.pop()
+            end_wall, end_cpu = self._finish(frame)
+            if parent is not None:
+                parent.peak = max(parent.peak, frame.peak)
+                # Bill the parent for the stage's own run time only.
+                parent.overhead_wall += (
+                    (frame.wall - wall)
+                    + frame.overhead_wall
+                    + (time.perf_counter() - end_wall)
+                )
+                parent.overhead_cpu += (
+                    (frame.cpu - cpu)
+                    + frame.overhead_cpu
+                    + (time.process_time() - end_cpu)
+                )
+                parent.profile.enable()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        import tracemalloc
+
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+
+    def _finish(self, frame: _Frame) -> tuple[float, float]:
+        """Write the stage's reports; return the wall and CPU clocks at its end."""
+        import pstats
+        import tracemalloc
+
+        end_wall, end_cpu = time.perf_counter(), time.process_time()
+        wall = end_wall - frame.wall - frame.overhead_wall
+        cpu = end_cpu - frame.cpu - frame.overhead_cpu
+        traced, peak = tracemalloc.get_traced_memory()
+        frame.peak = max(frame.peak, peak)
+
+        stem = f"{frame.index:02d}-{_slug(frame.name)}"
+        frame.profile.dump_stats(self.run_dir / f"{stem}.prof")
+        with (self.run_dir / f"{stem}.txt").open("w") as f:
+            stats = pstats.Stats(frame.profile, stream=f)
+            stats.sort_stats("cumulative").print_stats(self.top)
+
+        allocated = traced - frame.traced
+        if frame.snapshot is not None:
+            diff = self._snapshot().compare_to(frame.snapshot, "lineno")
+            with (self.run_dir / f"{stem}.memory.txt").open("w") as f:
+                f.write(f"Top {self.top} lines by memory allocated during the stage\n")
+                for stat in diff[: self.top]:
+                    f.write(f"{stat}\n")
+            allocated = sum(stat.size_diff for stat in diff)
+
+        self.stages.append(
+            {
+                "stage": frame.name,
+                "parent": self._stack[-1].name if self._stack else None,
+                "wall_s": round(wall, 4),
+                "cpu_s": round(cpu, 4),
+                "peak_traced_mb": round(frame.peak / 2**20, 2),
+                "allocated_mb": round(allocated / 2**20, 2),
+                "max_rss_mb": _max_rss_mb(),
+                "profile": f"{stem}.prof",
+            }
+        )
+        logger.debug("Profiled stage %s: %.2fs wall, %.2fs CPU", frame.name, wall, cpu)
+        return end_wall, end_cpu
+
+    def close(self) -> Path:
+        """Write ``summary.json`` and stop tracing; return the run directory."""
+        import tracemalloc
+
+        if not self._closed:
+            self._closed = True
+            summary = {
+                "argv": sys.argv,
+                "started": time.strftime(
+                    "%Y-%m-%dT%H:%M:%S", time.localtime(self._started)
+                ),
+                "wall_s": round(time.time() - self._started, 3),
+                "max_rss_mb": _max_rss_mb(),
+                "stages": self.stages,
+            }
+            (self.run_dir / "summary.json").write_text(json.dumps(summary, indent=2))
+            if self._owns_tracing:
+                tracemalloc.stop()
+        return self.run_dir
+
+
+def _slug(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+
+
+def _max_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def _env_root() -> Path | None:
+    value = os.environ.get(PROFILE_ENV, "").strip()
+    if value.lower() in ("", "0", "false", "no", "off"):
+        return None
+    if value.lower() in ("1", "true", "yes", "on"):
+        return DEFAULT_PROFILE_ROOT
+    return Path(value)
+
+
+def _env_snapshots() -> bool:
+    value = os.environ.get(SNAPSHOTS_ENV, "").strip()
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def new_run_dir(name: str, root: Path = DEFAULT_PROFILE_ROOT) -> Path:
+    """A fresh ``<root>/<timestamp>-<name>-<pid>`` path."""
+    return Path(root) / f"{time.strftime('%Y%m%d-%H%M%S')}-{_slug(name)}-{os.getpid()}"
+
+
+def start(
+    name: str, root: Path = DEFAULT_PROFILE_ROOT, snapshots: bool | None = None
+) -> Profiler:
+    """Start profiling this process into a new run directory under `root`.
+
+    `snapshots` turns on per-line memory diffs; by default, when
+    COFFEE_PROFILE_SNAPSHOTS is set.
+    """
+    global _active
+    if _active is not None:
+        raise RuntimeError(f"Already profiling into {_active.run_dir}")
+    if snapshots is None:
+        snapshots = _env_snapshots()
+    _active = Profiler(new_run_dir(name, root), snapshots=snapshots)
+    logger.info("Profiling into %s", _active.run_dir)
+    return _active
+
+
+def stop() -> Path | None:
+    """Finish the active profiler, if any; return its run directory."""
+    global _active
+    if _active is None:
+        return None
+    profiler, _active = _active, None
+    return profiler.close()
+
+
+def active() -> Profiler | None:
+    """The running profiler, starting one on first use if COFFEE_PROFILE is set.
+
+    A profiler started from the environment is finished at interpreter exit.
+    """
+    global _env_checked
+    if _active is None and not _env_checked:
+        _env_checked = True
+        if (root := _env_root()) is not None:
+            start(Path(sys.argv[0]).stem or "python", root)
+            atexit.register(stop)
+    return _active
+
+
+@contextmanager
+def session(name: str, root: Path | None = None) -> Iterator[Profiler | None]:
+    """Profile the enclosed block as stage `name` if `root` or COFFEE_PROFILE is set.
+
+    Yields the profiler, or None when profiling is off.
+    """
+    global _env_checked
+    root = root or _env_root()
+    if root is None or _active is not None:
+        with stage(name):
+            yield _active
+        return
+    _env_checked = True
+    profiler = start(name, root)
+    try:
+        with profiler.stage(name):
+            yield profiler
+    finally:
+        logger.info("Profile written to %s", stop())
+
+
+def stage(name: str) -> AbstractContextManager[None]:
+    """Profile the enclosed block as a stage, if profiling is on."""
+    profiler = active()
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+
+def profiled(name: str) -> Callable[[F], F]:
+    """Decorator: run the function as stage `name` when profiling is on."""
+
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+@asynccontextmanager
+async def watch_event_loop(
+    slow_callback: float = SLOW_CALLBACK_SECONDS,
+    interval: float = TASK_SAMPLE_SECONDS,
+) -> AsyncIterator[None]:
+    """While profiling, log slow callbacks and sample the running task count.
+
+    Callbacks that hold the loop longer than `slow_callback` seconds are
+    logged to ``asyncio.log``; the number of live tasks, every `interval`
+    seconds, goes to ``asyncio.json``. A no-op when profiling is off.
+    """
+    import asyncio
+
+    profiler = active()
+    if profiler is None:
+        yield
+        return
+
+    loop = asyncio.get_running_loop()
+    debug, threshold = loop.get_debug(), loop.slow_callback_duration
+    loop.set_debug(True)
+    loop.slow_callback_duration = slow_callback
+
+    handler = logging.FileHandler(profiler.run_dir / "asyncio.log")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    asyncio_logger = logging.getLogger("asyncio")
+    asyncio_logger.addHandler(handler)
+
+    start_time = time.perf_counter()
+    samples: list[tuple[float, int]] = []
+
+    async def sample() -> None:
+        while True:
+            elapsed = round(time.perf_counter() - start_time, 2)
+            samples.append((elapsed, len(asyncio.all_tasks())))
+            await asyncio.sleep(interval)
+
+    sampler = asyncio.create_task(sample())
+    try:
+        yield
+    finally:
+        sampler.cancel()
+        loop.set_debug(debug)
+        loop.slow_callback_duration = threshold
+        asyncio_logger.removeHandler(handler)
+        handler.close()
+        slow = sum(
+            "Executing" in line
+            for line in (profiler.run_dir / "asyncio.log").read_text().splitlines()
+        )
+        (profiler.run_dir / "asyncio.json").write_text(
+            json.dumps(
+                {
+                    "slow_callback_s": slow_callback,
+                    "slow_callbacks": slow,
+                    # minus the sampler itself
+                    "peak_tasks": max((n - 1 for _, n in samples), default=0),
+                    "task_samples": samples,
+                },
+                indent=2,
+            )
+        )
@@ -0,0 +1,203 @@
+"""Compact, typed review records and a columnar builder for batches of them.
+
+:func:`coffee.parser.parse_html` yields one ``dict`` per page with whatever
+spec-table keys that page has, every value a string. :class:`Review` is the
+fixed-schema form those fields are converted to once, at parse time:
+
+- Scores (rating, aroma, acidity, ...) are ints, the agtron reading "58/76" is
+  split into two ints and the review date is a :class:`datetime.date`.
+- It is a slotted dataclass, so a record is a fixed-size object with no
+  per-instance ``__dict__`` — about half the size of the parsed dict.
+- Spec keys outside the schema are kept in :attr:`Review.extra`, so a new row
+  on the site is carried through rather than lost.
+
+:class:`ReviewBatch` accumulates reviews column by column (numeric fields in
+``array.array`` buffers with a validity mask) and hands them to Arrow or NumPy
+without building an intermediate list of dicts or DataFrame. Its table has the
+schema of :mod:`coffee.storage` and can be written with
+:func:`coffee.storage.write_reviews` directly.
+"""
+
+from __future__ import annotations
+
+import re
+from array import array
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from coffee.storage import (
+    PARTITION_COLUMN,
+    REVIEW_DATE_FORMAT,
+    SCHEMA,
+    SCORE_COLUMNS,
+    column_name,
+)
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def parse_score(value: str | None) -> int | None:
+    """ "93" -> 93; qualitative or missing values (e.g. "Very Low") -> None."""
+    if value is None:
+        return None
+    value = value.strip()
+    if not _NUMBER.fullmatch(value):
+        return None
+    return round(float(value))
+
+
+def parse_agtron(value: str | None) -> tuple[int | None, int | None]:
+    """ "58/76" -> (58, 76), external (whole bean) then ground reading."""
+    if value is None:
+        return None, None
+    external, _, ground = value.partition("/")
+    return parse_score(external), parse_score(ground)
+
+
+def parse_review_date(value: str | None) -> date | None:
+    """ "July 2024" -> date(2024, 7, 1)."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip(), REVIEW_DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+@dataclass(slots=True)
+class Review:
+    """One review with a fixed set of typed fields; see :data:`SCHEMA`."""
+
+    url: str
+    title: str | None = None
+    roaster: str | None = None
+    roaster_canonical: str | None = None
+    roaster_location: str | None = None
+    coffee_origin: str | None = None
+    roast_level: str | None = None
+    review_date: date | None = None
+    rating: int | None = None
+    aroma: int | None = None
+    acidity: int | None = None
+    body: int | None = None
+    flavor: int | None = None
+    aftertaste: int | None = None
+    with_milk: int | None = None
+    agtron_external: int | None = None
+    agtron_ground: int | None = None
+    est_price: str | None = None
+    blind_assessment: str | None = None
+    notes: str | None = None
+    bottom_line: str | None = None
+    # Spec-table rows outside the schema, keyed by their column name.
+    extra: dict[str, str] | None = None
+
+    @classmethod
+    def from_fields(cls, url: str, raw: Mapping[str, str | None]) -> Review:
+        """Build a record from :func:`coffee.parser.parse_html` output."""
+        review = cls(url)
+        extra: dict[str, str] = {}
+        for key, value in raw.items():
+            name = column_name(key)
+            if name in SCORE_COLUMNS:
+                score = parse_score(value)
+                # Aliased keys share a column; keep whichever parsed.
+                if score is not None:
+                    setattr(review, name, score)
+            elif name == "agtron":
+                review.agtron_external, review.agtron_ground = parse_agtron(value)
+            elif name == "review_date":
+                review.review_date = parse_review_date(value)
+            elif name in _STRING_FIELDS:
+                setattr(review, name, value.strip() if value else None)
+            elif value is not None:
+                extra[name] = value
+        review.extra = extra or None
+        return review
+
+
+_STRING_FIELDS = frozenset(
+    f.name
+    for f in fields(Review)
+    if f.name not in (*SCORE_COLUMNS, "review_date", "extra")
+    and not f.name.startswith("agtron")
+)
+
+
+class ReviewBatch:
+    """Column buffers that :class:`Review` records are appended to.
+
+    Integer columns live in ``array.array`` buffers plus a validity mask, so
+    tens of thousands of reviews cost a few bytes per score instead of a
+    Python int each, and convert to NumPy without a copy per element. A value
+    too large for its column's type (a typo on the site) is stored as missing.
+    """
+
+    def __init__(self, reviews: Iterable[Review] = ()):
+        self._objects: dict[str, list] = {}
+        self._ints: dict[str, tuple[array, bytearray]] = {}
+        self._limits: dict[str, int] = {}
+        for field in SCHEMA:
+            if pa.types.is_integer(field.type):
+                self._ints[field.name] = (array("h"), bytearray())
+                self._limits[field.name] = 2 ** (field.type.bit_width - 1) - 1
+            else:
+                self._objects[field.name] = []
+        self._length = 0
+        self.extend(reviews)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, review: Review) -> None:
+        for name, column in self._objects.items():
+            column.append(getattr(review, name))
+        for name, (values, valid) in self._ints.items():
+            value = getattr(review, name)
+            ok = value is not None and abs(value) <= self._limits[name]
+            values.append(value if ok else 0)
+            valid.append(ok)
+        self._length += 1
+
+    def extend(self, reviews: Iterable[Review]) -> None:
+        for review in reviews:
+            self.append(review)
+
+    def _ints_numpy(self, name: str) -> tuple[np.ndarray, np.ndarray]:
+        # Copied out: a view would pin the buffers, and the next append()
+        # would raise BufferError with the batch half-appended.
+        values, valid = self._ints[name]
+        return (
+            np.frombuffer(values, dtype=np.int16).copy(),
+            ~np.frombuffer(valid, dtype=np.bool_),
+        )
+
+    def to_numpy(self) -> dict[str, np.ma.MaskedArray]:
+        """Integer columns as masked arrays, masked where the value is missing."""
+        return {name: np.ma.MaskedArray(*self._ints_numpy(name)) for name in self._ints}
+
+    def _column(self, field: pa.Field) -> pa.Array:
+        if field.name in self._ints:
+            values, mask = self._ints_numpy(field.name)
+            return pa.array(values, mask=mask).cast(field.type)
+        column = self._objects[field.name]
+        if pa.types.is_dictionary(field.type):
+            return pa.array(column, pa.string()).dictionary_encode()
+        if pa.types.is_map(field.type):
+            return pa.array(
+                [None if m is None else list(m.items()) for m in column], field.type
+            )
+        return pa.array(column, field.type)
+
+    def to_table(self) -> pa.Table:
+        """The batch as a :data:`coffee.storage.SCHEMA` table plus ``review_year``."""
+        table = pa.Table.from_arrays(
+            [self._column(field) for field in SCHEMA], schema=SCHEMA
+        )
+        year = pc.year(table["review_date"]).cast(pa.int16())
+        return table.append_column(PARTITION_COLUMN, year)
@@ -2,28 +2,57 @@
 
 :func:`scrape_review` fetches a review URL through the shared retrying
 :func:`coffee.fetch.fetch`, parses the HTML off the event loop, and returns a
-dict of the review's fields tagged with its source URL (or ``None`` if the page
-could not be fetched).
+typed :class:`coffee.records.Review` for its source URL (or ``None`` if the
+page could not be fetched; `on_failure` hears why, see
+:func:`coffee.fetch.fetch`). Given a :class:`coffee.roasters.RoasterIndex`, it
+also attaches the roaster's canonical name as ``roaster_canonical``.
+
+Only the page's main content region is parsed. Given a
+:class:`coffee.changes.ContentManifest`, a page whose region hashes the same
+as last time isn't parsed at all: ``None`` is returned and the URL is noted
+in the manifest's ``unchanged`` set, its stored record being current.
 """
 
+from __future__ import annotations
+
 import asyncio
+from collections.abc import Callable
+from typing import TYPE_CHECKING
 
 import aiohttp
 
-from coffee.fetch import fetch
-from coffee.parser import parse_html
+from coffee.changes import ContentManifest
+from coffee.fetch import DEFAULT_BACKOFF, Backoff, FetchFailure, fetch
+from coffee.parser import main_content, parse_review
+from coffee.records import Review
+
+if TYPE_CHECKING:
+    # Type-only: the resolver pulls in scipy/rapidfuzz, which a plain scrape
+    # without an index shouldn't pay for.
+    from coffee.roasters import RoasterIndex
 
 
 async def scrape_review(
     url: str,
     session: aiohttp.ClientSession,
     semaphore: asyncio.Semaphore,
-    retries: int = 5,
-) -> dict | None:
-    review_page = await fetch(url, session, semaphore, retries=retries)
+    backoff: Backoff = DEFAULT_BACKOFF,
+    roaster_index: RoasterIndex | None = None,
+    on_failure: Callable[[FetchFailure], None] | None = None,
+    content_manifest: ContentManifest | None = None,
+) -> Review | None:
+    review_page = await fetch(
+        url, session, semaphore, backoff=backoff, on_failure=on_failure
+    )
     if review_page is None:
         return None
+    # A page without the expected region is hashed and parsed whole.
+    content = main_content(review_page) or review_page
+    if content_manifest is not None and not content_manifest.check(url, content):
+        return None
     # Parse off the event loop so CPU-bound parsing overlaps network I/O.
-    data = await asyncio.to_thread(parse_html, review_page)
-    data["url"] = url
-    return data
+    review = await asyncio.to_thread(parse_review, content, url)
+    if roaster_index is not None:
+        # O(1) dict lookups; unseen spellings are queued on the index.
+        review.roaster_canonical = roaster_index.lookup(review.roaster)
+    return review
@@ -0,0 +1,722 @@
+"""
+roasters.py — entity resolution for messy coffee roaster names.
+
+THE PROBLEM
+    Scraped review data spells the same roaster several ways:
+        "Onyx Coffee Lab" / "Onyx Coffee Lab LLC" / "onyx coffee lab" / "Onyx Coffee"
+    Group them, pick one canonical spelling, and persist the mapping.
+
+THE GOVERNING ASYMMETRY
+    The two error types are NOT equally costly, and every decision below is
+    bought with that fact:
+
+      False MERGE  (Black Oak + Black & White -> one roaster)  is SILENT.
+          Downstream analysis runs fine. Scores for "Black Oak" are now a
+          blend of two companies and you will never notice.
+
+      False SPLIT  ("Stumptown" and "Stumptown Coffee" stay separate)  is LOUD.
+          Stumptown shows up twice in your top-20 table. You catch it instantly.
+
+    So: optimize for PRECISION, not recall. Leave merges on the table rather
+    than make a wrong one. Recall failures announce themselves; precision
+    failures don't. (This is also why OpenRefine's UI is risky — approving a
+    cluster is one click, and all the friction sits on the *reject* side,
+    exactly backwards from where the risk lives.)
+
+THE CASCADE
+    Cheapest + most certain first; expensive + most doubtful last. Each stage
+    shrinks the input to the next, so by the time we reach the part that can be
+    wrong, there is very little left for it to be wrong about.
+
+        normalize  ->  exact key collision  ->  fuzzy score  ->  human/LLM review
+          free           free, ~100% precise      O(n^2), fallible     expensive
+
+OUTPUTS
+    crosswalk.csv   raw_name -> canonical_name.  THE DELIVERABLE. Commit to git.
+                    Next scrape, left-join against this: already-resolved names
+                    cost nothing and only NEW spellings reach the review queue.
+                    Manual effort per run decays toward zero instead of
+                    resetting to full every time (which is what OpenRefine does).
+
+    review.csv      Pairs in the honest-uncertainty band, with a blank `merge`
+                    column for you (or an LLM) to fill in.
+
+INCREMENTAL USE
+    resolve() is the batch step. RoasterIndex (section 5) is the lookup side:
+    it loads the committed crosswalk lazily and answers raw name -> canonical
+    in O(1), first by exact spelling and then by core key (the same ~100%
+    precise collision resolve() uses in Stage A). The scraper attaches a
+    `roaster_canonical` to every record this way as it streams out; only
+    spellings it has never seen are queued for the next batch resolution.
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from coffee.config import Config
+from coffee.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+# ==========================================================================
+# 1. NORMALIZATION
+# ==========================================================================
+
+# Words that carry near-zero information about *which* roaster this is, because
+# nearly every roaster has some subset of them. Deleting them before measuring
+# distance means the distance we measure is over signal only.
+#
+# Why this matters more than any algorithm choice:
+#   Under plain edit distance, "Stumptown" vs "Stumptown Coffee Roasters" is 15
+#   edits on a 24-char string — you'd need a threshold so loose it would merge
+#   half the dataset. Strip these words and BOTH become the string "stumptown".
+#   Not "similar". IDENTICAL. They now collide on an exact hash lookup, which
+#   has ~100% precision by construction: no threshold to tune, no judgment to
+#   get wrong. A large fraction of the problem is solved for free, right here.
+#
+# TUNING: this list is the first thing to edit for your data. Misspellings of
+# the stopwords themselves belong here too ("coffe", "cofee") — they'd
+# otherwise survive into the key as noise tokens.
+STOPWORDS = {
+    "coffee", "coffees", "coffe", "cofee",
+    "roaster", "roasters", "roasting", "roastery", "roasterie",
+    "cafe", "caffe", "kaffee", "espresso", "bean", "beans",
+    "co", "company", "inc", "incorporated", "llc", "ltd", "limited", "corp",
+    "the", "and",
+}
+
+# Applied BEFORE stopword removal, so that whatever an abbreviation expands to
+# can itself be stopworded if it belongs on the list above.
+ABBREV = {
+    "bros": "brothers",
+    "bro": "brothers",
+    "mfg": "manufacturing",
+    "intl": "international",
+    "st": "saint",
+    "mt": "mount",
+}
+
+
+def strip_accents(s: str) -> str:
+    """Café -> Cafe.
+
+    NFKD splits an accented char into base + combining mark; we drop the marks.
+    Necessary because a scraper will happily give you both spellings of the same
+    roaster depending on which page it hit.
+    """
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c)
+    )
+
+
+def tokens(name: str) -> list[str]:
+    """Raw name -> clean token list.
+
+    Most of the debugging in this problem is at the CHARACTER level, not the
+    algorithm level. Each line below closes a specific noise channel, and the
+    order matters. Two are landmines worth stating outright:
+
+    1. APOSTROPHES ARE DELETED.
+    2. SINGLE-LETTER RUNS ARE COLLAPSED.
+       "J.B.C. Coffee Roasters" punctuation-strips to ["j","b","c",...], which
+       shares nothing with "JBC Coffee" -> ["jbc",...]. Gluing runs of single
+       letters back together makes initialisms agree with their solid form.
+    """
+    s = strip_accents(str(name)).lower()
+    s = s.replace("&", " and ")
+    s = re.sub(r"['\u2019]", "", s)
+    s = re.sub(r"[^a-z0-9\s]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    toks = [ABBREV.get(t, t) for t in s.split()]
+
+    out: list[str] = []
+    run: list[str] = []
+    for t in toks:
+        if len(t) == 1 and t.isalpha():
+            run.append(t)
+        else:
+            if run:
+                out.append("".join(run))
+                run = []
+            out.append(t)
+    if run:
+        out.append("".join(run))
+    return out
+
+
+def fingerprint(name: str) -> str:
+    """OpenRefine's key-collision fingerprint, reimplemented.
+
+    Dedupe + sort the tokens, so word order stops mattering. Kept as a distinct
+    function because it's the safe fallback when stopwording is too aggressive
+    (see core_key).
+    """
+    return " ".join(sorted(set(tokens(name))))
+
+
+def core_key(name: str) -> str:
+    """Fingerprint with domain stopwords removed. The workhorse.
+
+        "Stumptown"                 -> "stumptown"
+        "Stumptown Coffee"          -> "stumptown"
+        "Stumptown Roasters"        -> "stumptown"
+        "Stumptown Coffee Roasters" -> "stumptown"
+
+    FAILURE MODE: a roaster genuinely named "The Coffee Company" stopwords down
+    to nothing. We fall back to the full fingerprint so it at least keeps an
+    identity. This is a patch, not a solution — such a name will also match
+    poorly against its own variants. Rare enough in practice to accept, but know
+    it's here.
+    """
+    toks = sorted({t for t in tokens(name) if t not in STOPWORDS})
+    if not toks:
+        return fingerprint(name)
+    return " ".join(toks)
+
+
+# ==========================================================================
+# 2. SIMILARITY
+# ==========================================================================
+
+def score(a: str, b: str, **kwargs) -> float:
+    """Similarity of two CORE KEYS (not raw names) in [0, 100].
+
+    Two DIFFERENT KINDS of variation survive normalization, and no single metric
+    handles both — hence the max of two:
+
+      token_set_ratio   handles SUBSET relationships. After stopwording,
+                        "Onyx Coffee" -> "onyx" and "Onyx Coffee Lab" -> "lab onyx".
+                        One key is a strict subset of the other. token_set
+                        partitions into intersection + the two remainders and
+                        scores the intersection against the wholes, so a strict
+                        subset scores 100.
+
+      token_sort_ratio  handles TYPOS and reordering. Sorts tokens, then runs a
+                        normal edit distance — robust to order, still sensitive
+                        to character noise ("Cofee" vs "Coffee").
+
+    Taking the max is deliberately PERMISSIVE: "if either view thinks these are
+    the same, treat them as candidates." That's only affordable because the
+    thresholds downstream are strict. Precision is enforced there, not here.
+
+    ------------------------------------------------------------------------
+    KNOWN HAZARD — token_set's subset behavior is a loaded gun.
+    ANY key that is a strict subset of another scores 100, no matter how little
+    it says. A bare key like "black" would score 100 against BOTH "black oak"
+    and "black white", and single linkage would then fuse all three into one
+    roaster. This doesn't blow up on real roaster data because real names have
+    distinctive heads. But if your data yields very short or generic residual
+    keys after stopwording, add a guard here: require the shorter key to be >= 2
+    tokens or >= 5 chars before trusting a subset match.
+    ------------------------------------------------------------------------
+
+    **kwargs absorbs the `score_cutoff` that rapidfuzz.process.cdist injects
+    into scorer callables. Without it, cdist raises TypeError.
+    """
+    return max(
+        fuzz.token_set_ratio(a, b),
+        fuzz.token_sort_ratio(a, b),
+    )
+
+
+# ==========================================================================
+# 3. CLUSTERING (SPARSE GRAPH)
+# ==========================================================================
+
+# Rows of the score matrix computed per cdist call. The full distinct-key x
+# distinct-key matrix is never held at once: each block is thresholded down to
+# the handful of pairs worth keeping and then dropped.
+BLOCK_SIZE = 1024
+
+LINKAGES = ("single", "complete")
+
+
+def score_edges(
+    keys: list[str], floor: int, block_size: int = BLOCK_SIZE
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """All pairs of keys scoring >= floor, as (i, j, score) arrays with i < j.
+
+    This is the ONLY place pairs are scored. Everything downstream — merging,
+    the review queue, chain detection, complete linkage — reads these edge
+    weights instead of calling score() again. Memory is block_size x n for the
+    transient block plus O(edges) for the result; since almost every pair of
+    distinct roasters scores far below the floor, the edge set is tiny.
+    """
+    rows, cols, weights = [], [], []
+    for start in range(0, len(keys), block_size):
+        block = process.cdist(
+            keys[start:start + block_size], keys,
+            scorer=score,
+            score_cutoff=floor,      # advisory only for custom scorers
+            workers=-1,              # all cores
+        )
+
+        # GOTCHA: cdist's score_cutoff is honored by BUILT-IN scorers but is
+        # merely passed through to custom ones (it lands in our **kwargs and
+        # we ignore it). So the cutoff must be enforced here by hand — omit
+        # this and every pair in the matrix, down to score 8, becomes an edge.
+        i, j = np.nonzero(block >= floor)
+        i += start
+        upper = i < j                # upper triangle only
+        rows.append(i[upper])
+        cols.append(j[upper])
+        weights.append(block[i[upper] - start, j[upper]])
+
+    if not rows:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(weights)
+
+
+def single_linkage(
+    n: int, rows: np.ndarray, cols: np.ndarray
+) -> np.ndarray:
+    """Connected components of the merge graph -> a label per key.
+
+    THE COST — CHAINING. Merges are transitive by construction: if A~B at 93
+    and B~C at 93, then A and C land in the same cluster even if they'd score
+    40 against each other. Classic failure mode, and exactly what OpenRefine's
+    nearest-neighbor clustering does too.
+
+    WHY IT'S THE DEFAULT ANYWAY. Complete linkage is stricter but not *correct*
+    — it just trades one error set for another. Meanwhile chaining is
+    DETECTABLE: resolve() reads each cluster's worst internal pairwise score
+    off the scored pairs and flags it (`chain_risk`). Cheap algorithm + an alarm
+    bell beats an expensive algorithm and no alarm bell.
+    """
+    graph = coo_matrix(
+        (np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n)
+    ).tocsr()
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+def complete_linkage(
+    n: int, rows: np.ndarray, cols: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    """Complete-linkage clusters over the merge edges -> a label per key.
+
+    Two clusters may merge only if EVERY cross pair is a merge edge, and the
+    most similar such pair of clusters (by their weakest cross edge) merges
+    first. A missing edge means the pair scored below auto_threshold, so
+    "no edge" is the same as "too far apart" — which is what lets this run on
+    the sparse edge set instead of the dense distance matrix that
+    scipy.cluster.hierarchy would need.
+
+    Complete-linkage clusters always nest inside single-linkage components, so
+    components are found first and only the ones that aren't already cliques
+    (i.e. the ones single linkage might have chained) are agglomerated.
+
+    Use it when chain_risk lights up frequently on your real data. Not before.
+    """
+    labels = single_linkage(n, rows, cols)
+    sizes = np.bincount(labels, minlength=n)
+    intra = np.bincount(labels[rows], minlength=n)
+    chained = np.flatnonzero(intra < sizes * (sizes - 1) // 2)
+    if not len(chained):
+        return labels
+
+    next_label = n
+    in_chained = np.isin(labels[rows], chained)
+    edges_by_comp: dict[int, list[tuple[int, int, float]]] = defaultdict(list)
+    for a, b, w in zip(
+        rows[in_chained], cols[in_chained], weights[in_chained], strict=True
+    ):
+        edges_by_comp[int(labels[a])].append((int(a), int(b), float(w)))
+
+    for edges in edges_by_comp.values():
+        for members in _agglomerate(edges):
+            labels[members] = next_label
+            next_label += 1
+
+    # Compact back to 0..k-1 so labels stay usable as array indices.
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def _agglomerate(edges: list[tuple[int, int, float]]) -> list[list[int]]:
+    """Complete-linkage agglomeration of one component's edge list.
+
+    `links` tracks, per pair of live clusters, how many cross pairs are edges
+    and the weakest of them. A pair is eligible once that count equals
+    |A| x |B|; the eligible pair with the strongest weakest link merges next.
+    """
+    members: dict[int, list[int]] = {}
+    links: dict[int, dict[int, tuple[int, float]]] = defaultdict(dict)
+    for a, b, w in edges:
+        members.setdefault(a, [a])
+        members.setdefault(b, [b])
+        links[a][b] = links[b][a] = (1, w)
+
+    heap = [(-w, a, b) for a, b, w in edges]
+    heapq.heapify(heap)
+    while heap:
+        neg_w, a, b = heapq.heappop(heap)
+        if a not in members or b not in members:
+            continue                 # stale: one side already merged away
+        count, worst = links[a].get(b, (0, 0.0))
+        if count != len(members[a]) * len(members[b]) or -neg_w != worst:
+            continue                 # stale: link changed since it was pushed
+
+        # Merge b into a, folding b's links into a's.
+        members[a] += members.pop(b)
+        del links[a][b]
+        for c, (count_c, worst_c) in links.pop(b).items():
+            if c == a:
+                continue
+            del links[c][b]
+            prev_count, prev_worst = links[a].get(c, (0, 100.0))
+            merged = (prev_count + count_c, min(prev_worst, worst_c))
+            links[a][c] = links[c][a] = merged
+        for c, (count_c, worst_c) in links[a].items():
+            if count_c == len(members[a]) * len(members[c]):
+                heapq.heappush(heap, (-worst_c, min(a, c), max(a, c)))
+
+    return list(members.values())
+
+
+# ==========================================================================
+# 4. RESOLUTION
+# ==========================================================================
+
+@profiled("roasters.resolve")
+def resolve(
+    raw_names: list[str],
+    auto_threshold: int = 92,
+    review_threshold: int = 82,
+    linkage: str = "single",
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Cluster raw names; return (crosswalk, review_queue).
+
+    WHY TWO THRESHOLDS, NOT ONE
+        A single threshold forces a lie — it asserts every pair is either a
+        match or not, with the boundary at a number you made up. But there is a
+        real middle region where the STRINGS SIMPLY DO NOT CONTAIN THE ANSWER:
+
+            "Black Oak Coffee Roasters" vs "Black & White Coffee Roasters" -> 71
+            "Red Bay Coffee"            vs "Red Rooster Coffee Roaster"    -> 60
+
+        These are not matches, but nothing in the strings says so. The only
+        thing that resolves them is knowing these are four different companies.
+        That's world knowledge, not string knowledge. So:
+
+            score >= auto_threshold      merge automatically
+            review..auto                 honest uncertainty -> review.csv
+            score <  review_threshold    leave alone
+
+        The review band is EXACTLY where an LLM earns its keep — and nowhere
+        else. Handing a model 500 raw names and asking it to canonicalize is
+        asking it to hallucinate at scale with no way to audit the result.
+        Handing it 30 pre-scored ambiguous pairs and asking "same company, y/n,
+        why?" is a bounded, verifiable task on precisely the cases where world
+        knowledge beats the string metric — and its errors land somewhere you're
+        already looking.
+
+    THRESHOLD TUNING (the softest part of this whole design)
+        92/82 are tuned on a toy set. Get real numbers for your data: run it,
+        sort review.csv by score descending, and find where TRUE matches stop
+        appearing. That score is your real `auto`. Then find where plausible
+        matches stop appearing entirely — that's your real `review` floor.
+
+    LINKAGE
+        "single" (default) merges connected components of the auto edges and
+        flags chaining after the fact; "complete" refuses to merge two clusters
+        unless every cross pair clears auto_threshold. See single_linkage().
+    """
+    if linkage not in LINKAGES:
+        raise ValueError(f"linkage must be one of {LINKAGES}, got {linkage!r}")
+
+    counts = Counter(raw_names)          # frequency drives canonical selection
+    uniques = sorted(counts)
+
+    # -- Stage A: exact core-key collision -----------------------------------
+    # Free and ~100% precise. No threshold, no judgment. This catches the bulk
+    # of real-world variation (suffix drift, casing, punctuation, word order)
+    # because normalization already erased exactly those differences. Names
+    # sharing a key are one node of the graph below, so they can never split.
+    keys = [core_key(n) for n in uniques]
+    by_key: dict[str, list[int]] = defaultdict(list)
+    for i, k in enumerate(keys):
+        by_key[k].append(i)
+    distinct_keys = sorted(by_key)
+
+    # -- Stage B: fuzzy scoring ----------------------------------------------
+    # Only mops up what Stage A missed: typos and word-order drift that survived
+    # normalization. Note we score the DISTINCT CORE KEYS, not the raw names —
+    # so the O(n^2) is over a much smaller n, and the comparison is over signal
+    # rather than boilerplate.
+    rows, cols, weights = score_edges(distinct_keys, review_threshold)
+
+    auto = weights >= auto_threshold
+    review_rows = [
+        {
+            "name_a": uniques[by_key[distinct_keys[i]][0]],
+            "name_b": uniques[by_key[distinct_keys[j]][0]],
+            "core_a": distinct_keys[i],    # keys are shown so you can see WHY
+            "core_b": distinct_keys[j],    # a pair scored the way it did
+            "score": round(float(s), 1),
+            "merge": "",                   # <- you (or an LLM) fill in y/n
+        }
+        for i, j, s in zip(rows[~auto], cols[~auto], weights[~auto], strict=True)
+    ]
+
+    # -- Stage C: assemble clusters ------------------------------------------
+    n_keys = len(distinct_keys)
+    scored_rows, scored_cols, scored_weights = rows, cols, weights
+    rows, cols, weights = rows[auto], cols[auto], weights[auto]
+    if linkage == "complete":
+        labels = complete_linkage(n_keys, rows, cols, weights)
+    else:
+        labels = single_linkage(n_keys, rows, cols)
+
+    # CHAIN DETECTION (see single_linkage). Single-linkage can fuse A and C via
+    # B. The WORST pairwise score inside each cluster says whether it did: if
+    # even the weakest internal pair clears auto_threshold, no chaining
+    # occurred. Every pair scoring >= review_threshold is already in the scored
+    # set, so the minimum over a cluster's scored pairs is read off it — no
+    # rescoring. A cluster of k keys missing some of its k(k-1)/2 pairs had a
+    # pair score below the review floor, exact value unknown: it's flagged
+    # `incomplete`, reports the weakest pair that WAS scored, and is always
+    # chain risk.
+    n_clusters = labels.max() + 1 if n_keys else 0
+    key_sizes = np.bincount(labels, minlength=n_clusters)
+    scored_labels = labels[scored_rows]
+    intra = scored_labels == labels[scored_cols]
+    n_scored = np.bincount(scored_labels[intra], minlength=n_clusters)
+    worst = np.full(n_clusters, 100.0)
+    np.minimum.at(worst, scored_labels[intra], scored_weights[intra])
+    incomplete = n_scored < key_sizes * (key_sizes - 1) // 2
+
+    clusters: dict[int, list[int]] = defaultdict(list)
+    for node, key in enumerate(distinct_keys):
+        clusters[int(labels[node])].extend(by_key[key])
+
+    rows_out = []
+    for cid, (label, members) in enumerate(
+        sorted(clusters.items(), key=lambda item: min(item[1]))
+    ):
+        members = sorted(members)
+        names = [uniques[m] for m in members]
+
+        # CANONICAL SELECTION: most frequent spelling in the source data wins;
+        # ties broken by length (longer = more complete form).
+        #
+        # ASSUMPTION: the most common spelling is the correct one. Usually true
+        # in scraped data, not always. When it picks something ugly, don't fight
+        # the heuristic — add a canonical_overrides.csv and apply it afterward.
+        canonical = max(names, key=lambda n: (counts[n], len(n)))
+
+        min_score = float(worst[label])
+        unscored = bool(incomplete[label])
+        for m, n in zip(members, names, strict=True):
+            rows_out.append({
+                "raw_name": n,
+                "core_key": keys[m],       # lets RoasterIndex match new spellings
+                "n_records": counts[n],
+                "cluster_id": cid,
+                "canonical_name": canonical,
+                "cluster_size": len(names),
+                "min_internal_score": round(min_score, 1),
+                "incomplete": unscored,    # some internal pair never scored
+                "chain_risk": unscored or min_score < auto_threshold,  # <- triage
+            })
+
+    # Sorted biggest-cluster-first: the largest clusters carry the most risk and
+    # are what you want to eyeball before trusting the run.
+    crosswalk = pd.DataFrame(rows_out).sort_values(
+        ["cluster_size", "cluster_id", "n_records"],
+        ascending=[False, True, False],
+    )
+    review = (
+        pd.DataFrame(review_rows).sort_values("score", ascending=False)
+        if review_rows
+        else pd.DataFrame(columns=["name_a", "name_b", "core_a", "core_b",
+                                   "score", "merge"])
+    )
+    return crosswalk, review
+
+
+# ==========================================================================
+# 5. INDEX (INLINE LOOKUP)
+# ==========================================================================
+
+DEFAULT_CROSSWALK = Config.DATA_DIR / "processed" / "roaster_crosswalk.csv"
+DEFAULT_PENDING = Config.DATA_DIR / "processed" / "roaster_pending.csv"
+
+
+class RoasterIndex:
+    """The committed crosswalk as an O(1) lookup: raw name -> canonical name.
+
+    Two dicts, consulted in order:
+
+        by_name   exact raw spelling -> canonical. Everything resolve() has
+                  already seen.
+        by_key    core key -> canonical. A NEW spelling that normalizes onto a
+                  known key ("Onyx Coffee Lab, LLC" vs "Onyx Coffee Lab LLC")
+                  is the same Stage A collision resolve() would have made, so
+                  it is answered here without queueing anything.
+
+    Anything that misses both is queued in `pending` (with its record count) and
+    looked up as None. Nothing fuzzy ever happens inline: fuzzy matching needs
+    the whole name set and a human on the review band, which is exactly what
+    the batch step is for. update() is that batch step, run over the known
+    names plus the queue; flush_pending() persists the queue between runs.
+
+    Loading is lazy — nothing is read until the first lookup — so constructing
+    an index for a run that never looks anything up costs nothing.
+
+    AMBIGUOUS KEYS. A hand-edited crosswalk can put two spellings with the same
+    core key into different clusters. That key is then dropped from by_key:
+    guessing would be a silent false merge, and a queued name is a loud one.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CROSSWALK):
+        self.path = Path(path)
+        self.pending: Counter[str] = Counter()
+        self._crosswalk: pd.DataFrame | None = None
+        self._by_name: dict[str, str] = {}
+        self._by_key: dict[str, str] = {}
+
+    def _ensure_loaded(self) -> None:
+        if self._crosswalk is not None:
+            return
+        if self.path.exists():
+            self._ingest(pd.read_csv(self.path, keep_default_na=False))
+            logger.info(
+                "Loaded %d roaster spellings from %s", len(self._by_name), self.path
+            )
+        else:
+            logger.info("No roaster crosswalk at %s; every name is new.", self.path)
+            self._ingest(pd.DataFrame(columns=["raw_name", "canonical_name"]))
+
+    def _ingest(self, crosswalk: pd.DataFrame) -> None:
+        # Older crosswalks predate the core_key column; derive it once here.
+        if "core_key" not in crosswalk:
+            crosswalk = crosswalk.assign(core_key=crosswalk["raw_name"].map(core_key))
+        self._crosswalk = crosswalk
+        self._by_name = dict(
+            zip(crosswalk["raw_name"], crosswalk["canonical_name"], strict=True)
+        )
+        by_key: dict[str, str] = {}
+        ambiguous: set[str] = set()
+        for key, canonical in zip(
+            crosswalk["core_key"], crosswalk["canonical_name"], strict=True
+        ):
+            if by_key.setdefault(key, canonical) != canonical:
+                ambiguous.add(key)
+        for key in ambiguous:
+            del by_key[key]
+        self._by_key = by_key
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._by_name)
+
+    def lookup(self, name: str | None) -> str | None:
+        """Canonical name for `name`, or None (queueing it) if it is unseen."""
+        if not name:
+            return None
+        self._ensure_loaded()
+        if (canonical := self._by_name.get(name)) is not None:
+            return canonical
+        if (canonical := self._by_key.get(core_key(name))) is not None:
+            return canonical
+        self.pending[name] += 1
+        return None
+
+    @property
+    def crosswalk(self) -> pd.DataFrame:
+        """The crosswalk the index currently answers from."""
+        self._ensure_loaded()
+        assert self._crosswalk is not None
+        return self._crosswalk
+
+    def counts(self) -> Counter[str]:
+        """Record count per known raw spelling, as resolve() last saw them."""
+        crosswalk = self.crosswalk
+        if "n_records" not in crosswalk:
+            return Counter(self._by_name.keys())
+        return Counter(
+            dict(
+                zip(
+                    crosswalk["raw_name"],
+                    crosswalk["n_records"].astype(int),
+                    strict=True,
+                )
+            )
+        )
+
+    def update(self, new_names: Counter[str], **resolve_kwargs) -> pd.DataFrame:
+        """Re-resolve the known names plus `new_names`; return the review queue.
+
+        Known spellings are passed with their record counts so canonical
+        selection weighs them as before. Names in `new_names` that the
+        crosswalk already has are skipped, so feeding the same queue twice
+        doesn't inflate their counts. Resolved names leave `pending`. Call
+        save() to persist the new crosswalk.
+        """
+        known = self.counts()
+        combined = known + Counter(
+            {name: n for name, n in new_names.items() if name not in known}
+        )
+        crosswalk, review = resolve(list(combined.elements()), **resolve_kwargs)
+        self._ingest(crosswalk)
+        for name in new_names:
+            self.pending.pop(name, None)
+        return review
+
+    def save(self, path: Path | None = None) -> Path:
+        """Write the current crosswalk to `path` (default: where it was loaded)."""
+        path = Path(path) if path is not None else self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.crosswalk.to_csv(path, index=False)
+        return path
+
+    def flush_pending(self, path: Path = DEFAULT_PENDING) -> int:
+        """Merge the queued names into the pending CSV; return how many are queued.
+
+        The file accumulates across runs (counts add up) until the batch step
+        consumes it, e.g. ``resolve_roasters.py <pending.csv> --index``.
+        """
+        if not self.pending:
+            return 0
+        queued = load_name_counts(path) if Path(path).exists() else Counter()
+        queued.update(self.pending)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame(
+            sorted(queued.items()), columns=["roaster", "n_records"]
+        ).to_csv(path, index=False)
+        self.pending.clear()
+        return len(queued)
+
+    @staticmethod
+    def clear_pending(path: Path = DEFAULT_PENDING) -> None:
+        """Empty the pending CSV (keeping its header) once update() consumed it."""
+        pd.DataFrame(columns=["roaster", "n_records"]).to_csv(path, index=False)
+
+
+def load_name_counts(path: Path, column: str = "roaster") -> Counter[str]:
+    """Name -> record count from a CSV of names.
+
+    A plain scrape has one row per record; a pending queue has one row per
+    name plus an `n_records` column. Both reduce to the same Counter.
+    """
+    df = pd.read_csv(path)
+    names = df[column].dropna().astype(str)
+    if "n_records" not in df:
+        return Counter(names)
+    weights = df.loc[names.index, "n_records"].astype(int)
+    return Counter(weights.groupby(names).sum().to_dict())
+
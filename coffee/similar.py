@@ -0,0 +1,214 @@
+"""Find the reviews whose tasting notes read most like a given review.
+
+:class:`SimilarityIndex` projects TF-IDF rows from a
+:class:`coffee.tfidf.TfidfStore` onto a truncated SVD basis (the same
+``TruncatedSVD(n_components=500)`` reduction the text notebook explores),
+L2-normalizes them to float32, and answers cosine top-k queries with a blocked
+matrix multiply. At corpus scale (tens of thousands of reviews x 500 dims)
+one query is a single pass over a few tens of MB, which is milliseconds; no
+approximate structure is needed.
+
+On disk the index is a directory::
+
+    meta.json        n_components, n_features the basis was fit on
+    components.npy   SVD basis, n_components x n_features
+    vectors.f32      row-major float32 vectors, appended in place
+    urls.txt         one review URL per line, in vector order
+
+``vectors.f32`` is memory-mapped on load and new reviews are appended to it
+(and to ``urls.txt``) without rewriting what is already there. Only rows
+present in both files count: an append interrupted between the two is
+ignored on load and cut off before the next one, so URLs never shift
+against their vectors. The basis is
+fixed at :meth:`SimilarityIndex.build` time; terms that appear later are
+outside it and don't contribute, so rebuild occasionally as the vocabulary
+drifts.
+
+scikit-learn's ``TruncatedSVD`` is used only by :meth:`build` and imported
+there, since scikit-learn is in the ``analysis`` dependency group.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from coffee.config import Config
+from coffee.profiling import profiled
+from coffee.tfidf import TfidfStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX = Config.DATA_DIR / "processed" / "similarity_index"
+DEFAULT_COMPONENTS = 500
+BLOCK_SIZE = 65_536  # vectors scored per matrix multiply
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def top_k(
+    vectors: np.ndarray, queries: np.ndarray, k: int, block_size: int = BLOCK_SIZE
+) -> tuple[np.ndarray, np.ndarray]:
+    """Exact top-k rows of `vectors` by dot product with each query row.
+
+    Scores `block_size` vectors at a time and keeps a running top-k per query
+    with argpartition, so memory is queries x block regardless of corpus size.
+    Returns (indices, scores), each queries x k, best first.
+    """
+    n = len(vectors)
+    k = min(k, n)
+    m = len(queries)
+    best_idx = np.empty((m, 0), dtype=np.int64)
+    best_scores = np.empty((m, 0), dtype=np.float32)
+    for start in range(0, n, block_size):
+        scores = queries @ vectors[start : start + block_size].T
+        idx = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        scores = np.concatenate([best_scores, scores], axis=1)
+        idx = np.concatenate([best_idx, idx], axis=1)
+        if scores.shape[1] > k:
+            keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, keep, axis=1)
+            idx = np.take_along_axis(idx, keep, axis=1)
+        best_scores, best_idx = scores, idx
+    order = np.argsort(-best_scores, axis=1)
+    return (
+        np.take_along_axis(best_idx, order, axis=1),
+        np.take_along_axis(best_scores, order, axis=1),
+    )
+
+
+class SimilarityIndex:
+    """Normalized SVD vectors per review URL, searchable by cosine similarity."""
+
+    def __init__(self, path: Path = DEFAULT_INDEX):
+        self.path = Path(path)
+        meta = json.loads((self.path / "meta.json").read_text())
+        self.n_components: int = meta["n_components"]
+        self.n_features: int = meta["n_features"]
+        self.components = np.load(self.path / "components.npy", mmap_mode="r")
+        text = (self.path / "urls.txt").read_text(encoding="utf-8")
+        urls = text.splitlines()
+        if text and not text.endswith("\n"):
+            urls.pop()  # torn last line
+        rows = (self.path / "vectors.f32").stat().st_size // self._row_bytes
+        self.urls: list[str] = urls[:rows]
+        self.positions = {url: i for i, url in enumerate(self.urls)}
+        self._vectors: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.n_components * np.dtype(np.float32).itemsize
+
+    def __contains__(self, url: object) -> bool:
+        return url in self.positions
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """All review vectors, memory-mapped (len(self) x n_components)."""
+        if self._vectors is None:
+            if not self.urls:
+                return np.empty((0, self.n_components), dtype=np.float32)
+            self._vectors = np.memmap(
+                self.path / "vectors.f32",
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self.urls), self.n_components),
+            )
+        return self._vectors
+
+    @classmethod
+    @profiled("similar.build")
+    def build(
+        cls,
+        store: TfidfStore,
+        path: Path = DEFAULT_INDEX,
+        n_components: int = DEFAULT_COMPONENTS,
+        random_state: int = 0,
+    ) -> SimilarityIndex:
+        """Fit the SVD basis on every review in `store` and write a new index."""
+        from sklearn.decomposition import TruncatedSVD
+
+        tfidf = store.matrix()
+        n_components = min(n_components, tfidf.shape[1] - 1)
+        logger.info(
+            "Fitting %d-component SVD on %d x %d TF-IDF",
+            n_components,
+            *tfidf.shape,
+        )
+        svd = TruncatedSVD(n_components=n_components, random_state=random_state)
+        svd.fit(tfidf)
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "components.npy", svd.components_.astype(np.float32))
+        (path / "vectors.f32").write_bytes(b"")
+        (path / "urls.txt").write_text("")
+        (path / "meta.json").write_text(
+            json.dumps({"n_components": n_components, "n_features": tfidf.shape[1]})
+        )
+        index = cls(path)
+        index._append(list(store.urls), tfidf)
+        return index
+
+    def project(self, tfidf: csr_matrix) -> np.ndarray:
+        """TF-IDF rows -> normalized float32 vectors in this index's basis."""
+        # Columns added to the store after the basis was fit have no component.
+        tfidf = tfidf[:, : self.n_features]
+        return _normalize(tfidf @ np.asarray(self.components).T)
+
+    def _append(self, urls: list[str], tfidf: csr_matrix) -> None:
+        vectors = self.project(tfidf)
+        self._vectors = None
+        # Cut off whatever an interrupted append left past the indexed rows.
+        os.truncate(self.path / "vectors.f32", len(self.urls) * self._row_bytes)
+        os.truncate(
+            self.path / "urls.txt", sum(len(url.encode()) + 1 for url in self.urls)
+        )
+        with open(self.path / "vectors.f32", "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self.path / "urls.txt", "a", encoding="utf-8") as f:
+            f.writelines(f"{url}\n" for url in urls)
+        for url in urls:
+            self.positions[url] = len(self.urls)
+            self.urls.append(url)
+        self._vectors = None  # remap to pick up the new rows
+
+    def add(self, store: TfidfStore) -> int:
+        """Append every review in `store` that isn't indexed yet; return count."""
+        new = [url for url in store.urls if url not in self.positions]
+        if new:
+            self._append(new, store.rows(new))
+            logger.info("Indexed %d new reviews (%d total)", len(new), len(self))
+        return len(new)
+
+    def search(self, queries: np.ndarray, k: int = 10) -> list[list[tuple[str, float]]]:
+        """Top-k ``(url, cosine similarity)`` for each normalized query vector."""
+        queries = np.atleast_2d(queries).astype(np.float32, copy=False)
+        idx, scores = top_k(self.vectors, queries, k)
+        return [
+            [(self.urls[i], float(s)) for i, s in zip(row_i, row_s, strict=True)]
+            for row_i, row_s in zip(idx, scores, strict=True)
+        ]
+
+    def similar(self, url: str, k: int = 10) -> list[tuple[str, float]]:
+        """The `k` indexed reviews most similar to the indexed review `url`."""
+        hits = self.search(self.vectors[self.positions[url]], k + 1)[0]
+        return [hit for hit in hits if hit[0] != url][:k]
+
+    def similar_to_text(
+        self, text: str, store: TfidfStore, k: int = 10
+    ) -> list[tuple[str, float]]:
+        """The `k` indexed reviews most similar to free text, e.g. new notes."""
+        return self.search(self.project(store.transform([text])), k)[0]
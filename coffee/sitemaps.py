@@ -0,0 +1,308 @@
+"""Discover review URLs from the site's XML sitemaps, with lastmod tracking.
+
+Crawling the paginated listings (:func:`coffee.review_urls.get_urls`) costs a
+request per twenty reviews and says nothing about which reviews were edited.
+The site's sitemaps list every review URL with its ``lastmod``, a thousand or
+more per file, so a full discovery pass is a handful of requests:
+
+1. fetch the sitemap index (``/sitemap_index.xml``, else ``/sitemap.xml``);
+2. follow its review sitemaps (``review-sitemap*.xml``; every child sitemap
+   if none is named for reviews);
+3. keep the ``<url>`` entries under the review listing root.
+
+Sitemaps are parsed as they download, with an incremental pull parser that
+clears each entry once read, so no document tree is built; gzipped sitemaps
+(``.xml.gz``) are inflated on the fly.
+
+A :class:`LastmodManifest` remembers the ``lastmod`` of every review scraped so
+far. :func:`discover` compares the sitemap against it and returns only new or
+modified reviews. If the site has no usable sitemap, it falls back to the
+listing crawl and returns every review.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import logging
+import os
+import zlib
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import cast
+from urllib.parse import urljoin, urlsplit
+from xml.etree.ElementTree import Element, ParseError, XMLPullParser
+
+import aiohttp
+
+from coffee.config import Config
+from coffee.fetch import fetch_with
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_PATHS = ("/sitemap_index.xml", "/sitemap.xml")
+DEFAULT_MANIFEST = Config.DATA_DIR / "processed" / "review_lastmod.csv"
+_CHUNK_SIZE = 64 * 1024
+
+# Discovery modes.
+AUTO = "auto"  # sitemaps, falling back to the crawl
+SITEMAP = "sitemap"
+CRAWL = "crawl"
+MODES = (AUTO, SITEMAP, CRAWL)
+
+
+def parse_lastmod(text: str | None) -> datetime | None:
+    """A W3C datetime (``2024-07-25``, ``2024-07-25T10:00:00+00:00``) as UTC."""
+    if not text:
+        return None
+    try:
+        parsed = datetime.fromisoformat(text.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=UTC)
+    return parsed.astimezone(UTC)
+
+
+@dataclass
+class _Sitemap:
+    """What one sitemap file lists: child sitemaps and/or page URLs."""
+
+    children: list[str] = field(default_factory=list)
+    urls: dict[str, datetime | None] = field(default_factory=dict)
+
+
+def _local(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+class _SitemapParser:
+    """Incremental sitemap parser: feed bytes, collect entries, keep no tree."""
+
+    def __init__(self, gzipped: bool = False):
+        self.result = _Sitemap()
+        self._parser: XMLPullParser[Element] = XMLPullParser(events=("start", "end"))
+        self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        self._root: Element | None = None
+        self._loc: str | None = None
+        self._lastmod: str | None = None
+
+    def feed(self, data: bytes) -> None:
+        if self._inflate is not None:
+            data = self._inflate.decompress(data)
+        self._parser.feed(data)
+        # Only start/end events are requested, and those carry an Element.
+        events = cast("Iterator[tuple[str, Element]]", self._parser.read_events())
+        for event, elem in events:
+            if event == "start":
+                if self._root is None:
+                    self._root = elem
+                continue
+            tag = _local(elem.tag)
+            if tag == "loc":
+                self._loc = (elem.text or "").strip()
+            elif tag == "lastmod":
+                self._lastmod = elem.text
+            elif tag in ("url", "sitemap"):
+                if self._loc:
+                    if tag == "sitemap":
+                        self.result.children.append(self._loc)
+                    else:
+                        self.result.urls[self._loc] = parse_lastmod(self._lastmod)
+                self._loc = self._lastmod = None
+                # Entries are read; drop them so the root never holds them all.
+                if self._root is not None:
+                    self._root.clear()
+
+    def close(self) -> _Sitemap:
+        if self._inflate is not None:
+            self._parser.feed(self._inflate.flush())
+        self._parser.close()
+        return self.result
+
+
+async def _read_sitemap(url: str, response: aiohttp.ClientResponse) -> _Sitemap:
+    parser = _SitemapParser(gzipped=urlsplit(url).path.endswith(".gz"))
+    async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+        parser.feed(chunk)
+    return parser.close()
+
+
+async def fetch_sitemap(
+    url: str, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore
+) -> _Sitemap | None:
+    """Fetch and parse one sitemap; None if it's missing or not a sitemap."""
+
+    async def read(response: aiohttp.ClientResponse) -> _Sitemap:
+        return await _read_sitemap(url, response)
+
+    try:
+        return await fetch_with(url, session, semaphore, read)
+    except ParseError as e:
+        logger.warning("Ignoring unparseable sitemap %s: %s", url, e)
+        return None
+
+
+def is_review_url(url: str, base_url: str) -> bool:
+    """Whether `url` is an individual review under the listing root `base_url`."""
+    base = urlsplit(base_url)
+    parts = urlsplit(url)
+    if parts.netloc != base.netloc or not parts.path.startswith(base.path):
+        return False
+    rest = parts.path[len(base.path) :].strip("/")
+    return bool(rest) and not rest.startswith("page")
+
+
+def _review_sitemaps(children: list[str]) -> list[str]:
+    """The children of an index that list reviews (all, if none says so)."""
+    named = [c for c in children if "review" in urlsplit(c).path.rsplit("/", 1)[-1]]
+    return named or children
+
+
+async def sitemap_entries(
+    base_url: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+) -> dict[str, datetime | None] | None:
+    """Every review URL in the site's sitemaps, with its lastmod.
+
+    Returns None if no sitemap is found or none lists a review, so the caller
+    can fall back to crawling.
+    """
+    for path in SITEMAP_PATHS:
+        root = urljoin(base_url, path)
+        sitemap = await fetch_sitemap(root, session, semaphore)
+        if sitemap is not None and (sitemap.children or sitemap.urls):
+            break
+    else:
+        logger.info("No sitemap found under %s", base_url)
+        return None
+
+    entries = dict(sitemap.urls)
+    seen = {root}
+    frontier = _review_sitemaps(sitemap.children)
+    while frontier:
+        seen.update(frontier)
+        results = await asyncio.gather(
+            *(fetch_sitemap(url, session, semaphore) for url in frontier)
+        )
+        children: list[str] = []
+        for url, result in zip(frontier, results, strict=True):
+            if result is None:
+                logger.warning("Sitemap %s could not be read", url)
+                continue
+            entries.update(result.urls)
+            children += result.children
+        frontier = [c for c in _review_sitemaps(children) if c not in seen]
+        logger.debug("Read %d sitemaps; %d entries so far", len(seen), len(entries))
+
+    reviews = {url: m for url, m in entries.items() if is_review_url(url, base_url)}
+    logger.info("Sitemaps list %d review URLs (%d sitemaps)", len(reviews), len(seen))
+    return reviews or None
+
+
+class LastmodManifest:
+    """Review URL -> lastmod of the copy last scraped, kept in a two-column CSV.
+
+    A URL scraped from the crawl (no lastmod known) is stored with an empty
+    lastmod, which any sitemap lastmod counts as newer.
+    """
+
+    def __init__(self, path: Path = DEFAULT_MANIFEST):
+        self.path = Path(path)
+        self.lastmod: dict[str, datetime | None] = {}
+        if self.path.exists():
+            with self.path.open(newline="") as f:
+                for row in csv.DictReader(f):
+                    self.lastmod[row["url"]] = parse_lastmod(row["lastmod"])
+
+    def __len__(self) -> int:
+        return len(self.lastmod)
+
+    def changed(self, entries: Mapping[str, datetime | None]) -> list[str]:
+        """URLs in `entries` that are new, or whose lastmod is later than stored."""
+        out = []
+        for url, lastmod in entries.items():
+            if url not in self.lastmod:
+                out.append(url)
+            elif lastmod is not None:
+                stored = self.lastmod[url]
+                if stored is None or lastmod > stored:
+                    out.append(url)
+        return out
+
+    def update(self, entries: Mapping[str, datetime | None]) -> None:
+        self.lastmod.update(entries)
+
+    def save(self) -> Path:
+        """Write the manifest atomically; returns its path."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["url", "lastmod"])
+            for url in sorted(self.lastmod):
+                lastmod = self.lastmod[url]
+                writer.writerow([url, lastmod.isoformat() if lastmod else ""])
+        os.replace(tmp, self.path)
+        return self.path
+
+
+@dataclass
+class Discovery:
+    """The outcome of :func:`discover`.
+
+    `urls` are the reviews to scrape; `lastmod` holds the sitemap lastmod of
+    each of them (empty after a crawl). `total` counts every review the
+    source listed, changed or not.
+    """
+
+    source: str
+    urls: list[str]
+    lastmod: dict[str, datetime | None]
+    total: int
+
+    @property
+    def incremental(self) -> bool:
+        """Whether `urls` is a subset of the site rather than all of it."""
+        return len(self.urls) < self.total
+
+
+async def discover(
+    base_url: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    manifest: LastmodManifest | None = None,
+    mode: str = AUTO,
+) -> Discovery:
+    """Find the reviews to scrape: new or modified ones if `manifest` is given.
+
+    `mode` is :data:`AUTO` (sitemaps, else crawl), :data:`SITEMAP` (fail if the
+    site has none) or :data:`CRAWL`. A crawl can't tell which reviews changed,
+    so it returns every review.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+
+    if mode != CRAWL:
+        entries = await sitemap_entries(base_url, session, semaphore)
+        if entries is not None:
+            urls = manifest.changed(entries) if manifest is not None else list(entries)
+            if manifest is not None:
+                logger.info(
+                    "%d of %d reviews are new or modified since the last scrape",
+                    len(urls),
+                    len(entries),
+                )
+            lastmod = {url: entries[url] for url in urls}
+            return Discovery(SITEMAP, urls, lastmod, total=len(entries))
+        if mode == SITEMAP:
+            raise RuntimeError(f"No review sitemap found for {base_url}")
+        logger.info("Falling back to crawling the review listings")
+
+    from coffee.review_urls import get_urls
+
+    urls = sorted(await get_urls(base_url, session, semaphore))
+    return Discovery(CRAWL, urls, {}, total=len(urls))
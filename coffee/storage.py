@@ -0,0 +1,307 @@
+"""Typed Parquet storage for scraped reviews, partitioned by review year.
+
+Scrapes used to be exchanged as CSV (plus a full JSON copy), so every load
+re-inferred all-object dtypes from text. Here reviews are written once, under a
+declared :data:`SCHEMA`, as a hive-partitioned Parquet dataset::
+
+    reviews/
+      review_year=2023/part-0.parquet
+      review_year=2024/part-0.parquet
+      ...
+
+- Scores are small integers, ``review_date`` is a date and the agtron reading
+  is split into its external and ground numbers, all parsed at write time.
+- Roaster, origin and roast level are dictionary-encoded, so a few hundred
+  distinct roasters cost a few hundred strings per file rather than one per
+  review, and come back as pandas categoricals.
+- Spec-table rows the schema doesn't know are kept, as strings, in the
+  ``extra`` map column.
+- :func:`load_reviews` projects columns and pushes row filters down to the
+  files: a year range prunes whole partition directories, and a rating
+  threshold is checked against row-group statistics before any page is read.
+
+:func:`to_table` maps raw scrape records (``"review date"``, ``"est. price"``
+etc.) or a CSV of them onto the schema; records parsed straight into
+:class:`coffee.records.Review` arrive already typed, via
+:class:`coffee.records.ReviewBatch`.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from coffee.config import Config
+from coffee.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATASET = Config.DATA_DIR / "processed" / "reviews"
+PARTITION_COLUMN = "review_year"
+REVIEW_DATE_FORMAT = "%B %Y"  # e.g. "July 2024"
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+SCORE_COLUMNS = (
+    "rating",
+    "aroma",
+    "acidity",
+    "body",
+    "flavor",
+    "aftertaste",
+    "with_milk",
+)
+SCHEMA = pa.schema(
+    [
+        ("url", pa.string()),
+        ("title", pa.string()),
+        ("roaster", _CATEGORY),
+        ("roaster_canonical", _CATEGORY),
+        ("roaster_location", _CATEGORY),
+        ("coffee_origin", _CATEGORY),
+        ("roast_level", _CATEGORY),
+        ("review_date", pa.date32()),
+        *((col, pa.int8()) for col in SCORE_COLUMNS),
+        ("agtron_external", pa.int16()),
+        ("agtron_ground", pa.int16()),
+        ("est_price", pa.string()),
+        ("blind_assessment", pa.string()),
+        ("notes", pa.string()),
+        ("bottom_line", pa.string()),
+        ("extra", pa.map_(pa.string(), pa.string())),
+    ]
+)
+PARTITIONING = ds.partitioning(
+    pa.schema([(PARTITION_COLUMN, pa.int16())]), flavor="hive"
+)
+# Directory name hive partitioning gives reviews without a date.
+_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Arrow integer type -> pandas nullable dtype, for to_pandas(types_mapper=...).
+_NULLABLE_INTS = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+}
+
+# The site renamed this spec row at some point; both mean the same score.
+ALIASES = {"acidity/structure": "acidity"}
+
+
+def column_name(key: str) -> str:
+    """Spec-table key -> schema column, as the cleaning notebook names them."""
+    name = key.strip().lower().replace(" ", "_").replace(".", "")
+    return ALIASES.get(name, name)
+
+
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    out: dict[str, pd.Series] = {}
+    for key in df.columns:
+        name = column_name(str(key))
+        # Aliased columns are coalesced: a review carries one or the other.
+        out[name] = out[name].fillna(df[key]) if name in out else df[key]
+    return pd.DataFrame(out, index=df.index)
+
+
+def _scores(values: pd.Series) -> pd.Series:
+    # A few reviews carry qualitative values (e.g. acidity "Very Low").
+    return pd.to_numeric(values, errors="coerce").round().astype("Int8")
+
+
+def _agtron(values: pd.Series) -> tuple[pd.Series, pd.Series]:
+    parts = values.astype("string").str.split("/", n=1, expand=True)
+    parts = parts.reindex(columns=[0, 1])
+    return tuple(  # type: ignore[return-value]
+        pd.to_numeric(parts[i].str.strip(), errors="coerce").astype("Int16")
+        for i in (0, 1)
+    )
+
+
+def _review_dates(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, format=REVIEW_DATE_FORMAT, errors="coerce")
+
+
+def to_table(records: pd.DataFrame | Iterable[Mapping[str, Any]]) -> pa.Table:
+    """Raw scrape records -> a table with :data:`SCHEMA` plus ``review_year``.
+
+    Accepts raw scrape dicts or a DataFrame of them (e.g. a raw CSV). Schema
+    columns a record lacks are null; columns outside the schema are folded
+    into each row's ``extra`` map, skipping missing values.
+    """
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+    df = _normalize_columns(df)
+    if "agtron" in df:
+        df["agtron_external"], df["agtron_ground"] = _agtron(df.pop("agtron"))
+    extra: list[list[tuple[str, str]] | None] = [None] * len(df)
+    if unknown := sorted(set(df.columns) - set(SCHEMA.names)):
+        logger.info("Keeping columns outside the review schema in extra: %s", unknown)
+        extra = [
+            [(k, str(v)) for k, v in zip(unknown, row, strict=True) if pd.notna(v)]
+            or None
+            for row in df[unknown].itertuples(index=False)
+        ]
+
+    typed = SCHEMA.remove(SCHEMA.get_field_index("extra"))
+    df = df.reindex(columns=typed.names)
+    for col in SCORE_COLUMNS:
+        df[col] = _scores(df[col])
+    df["review_date"] = _review_dates(df["review_date"])
+    for field in typed:
+        if pa.types.is_string(field.type) or pa.types.is_dictionary(field.type):
+            df[field.name] = df[field.name].astype("string").str.strip()
+
+    table = pa.Table.from_pandas(df, schema=typed, preserve_index=False)
+    table = table.append_column(
+        SCHEMA.field("extra"), pa.array(extra, SCHEMA.field("extra").type)
+    )
+    year = pc.year(table["review_date"]).cast(pa.int16())
+    return table.append_column(PARTITION_COLUMN, year)
+
+
+@profiled("storage.write_reviews")
+def write_reviews(
+    records: pa.Table | pd.DataFrame | Iterable[Mapping[str, Any]],
+    root: Path = DEFAULT_DATASET,
+) -> pa.Table:
+    """Write reviews under `root`, one ``review_year=YYYY`` directory per year.
+
+    `records` is either a table already in the schema (e.g.
+    :meth:`coffee.records.ReviewBatch.to_table`) or anything :func:`to_table`
+    accepts. Years present in `records` replace what is on disk for those
+    years; other years are left alone, so re-scraping recent reviews doesn't
+    rewrite the archive. Returns the table that was written.
+    """
+    table = records if isinstance(records, pa.Table) else to_table(records)
+    root = Path(root)
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}.parquet",
+    )
+    logger.info("Wrote %d reviews to %s", table.num_rows, root)
+    return table
+
+
+@profiled("storage.upsert_reviews")
+def upsert_reviews(
+    records: pa.Table | pd.DataFrame | Iterable[Mapping[str, Any]],
+    root: Path = DEFAULT_DATASET,
+) -> pa.Table:
+    """Merge reviews into the dataset, replacing stored rows with the same URL.
+
+    For an incremental scrape: unlike :func:`write_reviews`, the other reviews
+    of the years being written are kept. Only the partitions holding a new or
+    replaced review are rewritten (including the old year of a review whose
+    date changed, or that had none). Returns the table that was written.
+    """
+    table = records if isinstance(records, pa.Table) else to_table(records)
+    root = Path(root)
+    if not root.exists():
+        return write_reviews(table, root)
+
+    dataset = open_dataset(root)
+    index = dataset.to_table(columns=["url", PARTITION_COLUMN])
+    replaced = pc.is_in(index["url"], value_set=table["url"].combine_chunks())
+    years = pc.unique(
+        pa.chunked_array(
+            [
+                *table[PARTITION_COLUMN].chunks,
+                *index.filter(replaced)[PARTITION_COLUMN].chunks,
+            ],
+            type=pa.int16(),
+        )
+    )
+    year = ds.field(PARTITION_COLUMN)
+    touched = year.isin(years.drop_null())
+    if years.null_count:
+        touched |= year.is_null()
+    kept = dataset.to_table(filter=touched)
+    kept = kept.filter(
+        pc.invert(pc.is_in(kept["url"], value_set=table["url"].combine_chunks()))
+    )
+    merged = pa.concat_tables([kept, table.cast(kept.schema)]).sort_by("url")
+
+    # A year whose only reviews moved to another year (likewise the undated
+    # partition, once its reviews got a date) has nothing left to write, so
+    # delete_matching wouldn't touch it; remove it explicitly.
+    written = pc.unique(merged[PARTITION_COLUMN])
+    stale = set(years.drop_null().to_pylist()) - set(written.to_pylist())
+    if years.null_count and not written.null_count:
+        stale.add(_NULL_PARTITION)
+    for name in stale:
+        for file in (root / f"{PARTITION_COLUMN}={name}").glob("*.parquet"):
+            file.unlink()
+    return write_reviews(merged, root)
+
+
+def open_dataset(root: Path = DEFAULT_DATASET) -> ds.Dataset:
+    """The review dataset at `root`, read with the declared schema."""
+    return ds.dataset(
+        root,
+        schema=SCHEMA.append(pa.field(PARTITION_COLUMN, pa.int16())),
+        format="parquet",
+        partitioning=PARTITIONING,
+    )
+
+
+def read_reviews(urls: Iterable[str], root: Path = DEFAULT_DATASET) -> pa.Table:
+    """The stored rows for `urls`, as a table in the dataset's schema."""
+    wanted = pa.array(sorted(set(urls)), pa.string())
+    return open_dataset(root).to_table(filter=ds.field("url").isin(wanted))
+
+
+def review_filter(
+    years: int | tuple[int, int] | None = None,
+    min_rating: int | None = None,
+) -> ds.Expression | None:
+    """Dataset filter for a year (or inclusive year range) and minimum rating."""
+    conditions = []
+    if years is not None:
+        first, last = (years, years) if isinstance(years, int) else years
+        year = ds.field(PARTITION_COLUMN)
+        conditions += [year >= first, year <= last]
+    if min_rating is not None:
+        conditions.append(ds.field("rating") >= min_rating)
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression &= condition
+    return expression
+
+
+def load_reviews(
+    root: Path = DEFAULT_DATASET,
+    columns: Sequence[str] | None = None,
+    years: int | tuple[int, int] | None = None,
+    min_rating: int | None = None,
+    filter: ds.Expression | None = None,  # noqa: A002 - pyarrow's name
+) -> pd.DataFrame:
+    """Load reviews as a DataFrame, reading only the columns and rows asked for.
+
+    `years` and `min_rating` build the common filters (see
+    :func:`review_filter`); `filter` takes any other pyarrow expression, e.g.
+    ``ds.field("roast_level") == "Light"``, and is combined with them.
+    Dictionary columns load as pandas categoricals, ``review_date`` as
+    datetime64, and the integer columns as nullable ``Int8``/``Int16`` (a
+    missing score stays missing rather than turning the column to float).
+    """
+    expression = review_filter(years, min_rating)
+    if filter is not None:
+        expression = filter if expression is None else expression & filter
+    table = open_dataset(root).to_table(
+        columns=list(columns) if columns is not None else None, filter=expression
+    )
+    return table.to_pandas(date_as_object=False, types_mapper=_NULLABLE_INTS.get)
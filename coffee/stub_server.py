@@ -0,0 +1,493 @@
+"""A synthetic CoffeeReview.com for load and fault-injection testing.
+
+:func:`make_app` builds an aiohttp application that looks to the scraper like
+the real site:
+
+- ``/review/`` and ``/review/page/N/``: listing pages with review links and
+  WordPress-style pagination (neighbouring pages, first and last);
+- ``/review/<slug>-<id>/``: review pages with the markup :mod:`coffee.parser`
+  reads (rating span, roaster, title, the two spec tables, and the Blind
+  Assessment / Notes / Bottom Line sections);
+- ``/sitemap_index.xml``: a Yoast-style sitemap index pointing at
+  ``/review-sitemap.xml``, ``/review-sitemap2.xml``, ... (each listing review
+  URLs with ``lastmod``) and a ``/page-sitemap.xml`` of non-review pages.
+
+Every page is generated on request from the review id and a seed, so 100k
+reviews cost no memory or disk, and the same id always renders the same page.
+Pass :data:`StubConfig.base_url` to ``scrape_all_reviews`` (or ``coffee scrape
+--base-url``) to scrape it.
+
+:class:`StubConfig` controls the page count and the faults:
+
+- latency: log-normal per request, by median and spread;
+- 429 and 5xx responses at given rates, the 429s carrying ``Retry-After``;
+- a concurrency capacity above which requests get 429 (backpressure);
+- ``ETag`` headers, answering a matching ``If-None-Match`` with 304;
+- edits: with ``revision`` > 0, every ``edit_every``-th review has a revised
+  bottom line and a ``lastmod`` moved forward by that many days, as if the
+  site had edited it; every page's sidebar ad also rotates per revision, as
+  boilerplate outside the review's content;
+- removals: every ``gone_every``-th review answers 410 Gone while the listings
+  and sitemaps still link to it.
+
+``GET /geocode/search?q=...&api_key=...`` stands in for the geocoding API
+:mod:`coffee.geocode` calls (see :func:`render_geocode`); latency and faults
+apply to it as to every page.
+
+``GET /_stats`` returns the request counts by status, the peak number of
+requests in flight and the total bytes served, for benchmarks to read.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import html
+import json
+import logging
+import math
+import random
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8089
+SERVER_ERRORS = (500, 502, 503, 504)
+
+_ORIGINS = (
+    "Ethiopia",
+    "Kenya",
+    "Colombia",
+    "Guatemala",
+    "Panama",
+    "Costa Rica",
+    "Yemen",
+    "Sumatra, Indonesia",
+    "Burundi",
+    "Brazil",
+)
+_PROCESSES = ("Washed", "Natural", "Honey", "Anaerobic Natural")
+_ROASTERS = (
+    ("JBC Coffee Roasters", "Madison, Wisconsin"),
+    ("Paradise Roasters", "Minneapolis, Minnesota"),
+    ("Kakalove Cafe", "Chia-Yi, Taiwan"),
+    ("Hula Daddy Kona Coffee", "Holualoa, Hawaii"),
+    ("Bird Rock Coffee Roasters", "San Diego, California"),
+    ("Equator Coffees", "San Rafael, California"),
+)
+_ROAST_LEVELS = ("Light", "Medium-Light", "Medium", "Medium-Dark")
+_DESCRIPTORS = (
+    "bergamot",
+    "dark chocolate",
+    "lemon zest",
+    "blueberry",
+    "cedar",
+    "honeysuckle",
+    "brown sugar",
+    "red currant",
+    "almond",
+    "jasmine",
+)
+_MONTHS = (
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+)
+_REVIEW_ID = re.compile(r"-(\d+)$")
+_FIRST_LASTMOD = datetime(2024, 1, 1, tzinfo=UTC)
+_SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+@dataclass(frozen=True)
+class StubConfig:
+    """Shape and failure behaviour of the stub site.
+
+    Rates are probabilities per request. `latency` is the median delay in
+    seconds and `latency_sigma` the log-normal shape (0 for a fixed delay).
+    `capacity` caps concurrent requests; over it, requests get 429 at once.
+    """
+
+    n_reviews: int = 1_000
+    per_page: int = 20
+    pagination_window: int = 2
+    latency: float = 0.0
+    latency_sigma: float = 0.5
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    retry_after: int | None = 1
+    capacity: int | None = None
+    etag: bool = True
+    padding: int = 0  # bytes of filler per page, to mimic the real page size
+    sitemap_size: int = 1_000  # URLs per review sitemap, as Yoast writes them
+    revision: int = 0
+    edit_every: int = 100
+    gone_every: int = 0  # 0: no removed reviews
+    seed: int = 0
+    host: str = DEFAULT_HOST
+    port: int = DEFAULT_PORT
+
+    @property
+    def n_pages(self) -> int:
+        return max(1, math.ceil(self.n_reviews / self.per_page))
+
+    @property
+    def n_sitemaps(self) -> int:
+        return max(1, math.ceil(self.n_reviews / self.sitemap_size))
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/review/"
+
+    def edited(self, review_id: int) -> bool:
+        """Whether the site has revised this review (see `revision`)."""
+        return self.revision > 0 and review_id % self.edit_every == 0
+
+    def gone(self, review_id: int) -> bool:
+        """Whether this review was removed (see `gone_every`)."""
+        # Ids count from 0: the Nth, 2Nth, ... review, so 1 removes them all.
+        return self.gone_every > 0 and (review_id + 1) % self.gone_every == 0
+
+    def lastmod(self, review_id: int) -> datetime:
+        published = _FIRST_LASTMOD + timedelta(minutes=review_id)
+        if self.edited(review_id):
+            return published + timedelta(days=self.revision)
+        return published
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def review_fields(review_id: int, seed: int = 0) -> dict[str, str]:
+    """The generated content of review `review_id`; stable for a given seed."""
+    rng = random.Random(seed * 1_000_003 + review_id)
+    origin = rng.choice(_ORIGINS)
+    roaster, location = rng.choice(_ROASTERS)
+    notes = rng.sample(_DESCRIPTORS, 4)
+    rating = rng.randint(84, 97)
+    return {
+        "title": f"{origin.split(',')[0]} {rng.choice(_PROCESSES)} {review_id}",
+        "roaster": roaster,
+        "rating": str(rating),
+        "Roaster Location": location,
+        "Coffee Origin": origin,
+        "Roast Level": rng.choice(_ROAST_LEVELS),
+        "Agtron": f"{rng.randint(40, 65)}/{rng.randint(60, 85)}",
+        "Est. Price": f"${rng.randint(14, 60)}.00/12 ounces",
+        "Review Date": f"{rng.choice(_MONTHS)} {rng.randint(1997, 2024)}",
+        "Aroma": str(rng.randint(7, 10)),
+        "Acidity/Structure": str(rng.randint(7, 10)),
+        "Body": str(rng.randint(7, 10)),
+        "Flavor": str(rng.randint(7, 10)),
+        "Aftertaste": str(rng.randint(7, 10)),
+        "blind_assessment": (
+            f"Richly sweet, {notes[0]}-toned. {notes[0].capitalize()}, "
+            f"{notes[1]}, {notes[2]}, {notes[3]} in aroma and cup."
+        ),
+        "notes": f"Produced by smallholding farmers in {origin}. Roasted by "
+        f"{roaster}, {location}.",
+        "bottom_line": f"A {notes[1]}-forward cup with a {notes[3]} finish.",
+    }
+
+
+def review_path(review_id: int, seed: int = 0) -> str:
+    return f"/review/{_slug(review_fields(review_id, seed)['title'])}-{review_id}/"
+
+
+def _table(fields: dict[str, str], keys: tuple[str, ...]) -> str:
+    rows = "".join(
+        f"<tr><td>{key}:</td><td>{html.escape(fields[key])}</td></tr>" for key in keys
+    )
+    return f'<table class="review-template-table">{rows}</table>'
+
+
+def render_review(review_id: int, config: StubConfig) -> str:
+    f = review_fields(review_id, config.seed)
+    if config.edited(review_id):
+        f["bottom_line"] += f" (Revised in revision {config.revision}.)"
+    esc = {k: html.escape(v) for k, v in f.items()}
+    specs = _table(
+        f, ("Roaster Location", "Coffee Origin", "Roast Level", "Agtron", "Est. Price")
+    )
+    scores = _table(
+        f, ("Review Date", "Aroma", "Acidity/Structure", "Body", "Flavor", "Aftertaste")
+    )
+    return f"""<!DOCTYPE html>
+<html><head><title>{esc["title"]} | Coffee Review</title></head><body>
+<div class="review-template">
+<div class="row row-1">
+<div class="column col-1">
+<span class="review-template-rating">{esc["rating"]}</span></div>
+<div class="column col-2"><p class="review-roaster">{esc["roaster"]}</p>
+<h1 class="review-title">{esc["title"]}</h1></div>
+</div>
+<div class="row row-2">
+<div class="column col-1">{specs}</div>
+<div class="column col-2">{scores}</div>
+</div>
+<h2>Blind Assessment</h2>
+<p>{esc["blind_assessment"]}</p>
+<h2>Notes</h2>
+<p>{esc["notes"]}</p>
+<h2>Bottom Line</h2>
+<p>{esc["bottom_line"]}</p>
+<h2>Explore Similar Coffees</h2>
+</div>
+<aside class="sidebar"><div class="widget">Sponsored roaster offer
+#{(review_id * 7919 + config.revision) % 1000}</div></aside>
+<!-- {"x" * config.padding} -->
+</body></html>
+"""
+
+
+def render_listing(page: int, config: StubConfig) -> str:
+    start = (page - 1) * config.per_page
+    ids = range(start, min(start + config.per_page, config.n_reviews))
+    items = "".join(
+        f'<article><h2><a href="{review_path(i, config.seed)}">'
+        f"{html.escape(review_fields(i, config.seed)['title'])}</a></h2></article>"
+        for i in ids
+    )
+    window = range(
+        max(1, page - config.pagination_window),
+        min(config.n_pages, page + config.pagination_window) + 1,
+    )
+    numbers = sorted({1, *window, config.n_pages} - {page})
+    links = "".join(
+        f'<li><a href="{"/review/" if n == 1 else f"/review/page/{n}/"}">{n}</a></li>'
+        for n in numbers
+    )
+    return f"""<!DOCTYPE html>
+<html><head><title>Reviews | Page {page}</title></head><body>
+<main class="content">{items}
+<div class="archive-pagination pagination"><ul>{links}</ul></div></main>
+<!-- {"x" * config.padding} -->
+</body></html>
+"""
+
+
+def _sitemap_name(n: int) -> str:
+    return "review-sitemap.xml" if n == 1 else f"review-sitemap{n}.xml"
+
+
+def render_sitemap_index(origin: str, config: StubConfig) -> str:
+    names = [_sitemap_name(n) for n in range(1, config.n_sitemaps + 1)]
+    entries = "".join(
+        f"<sitemap><loc>{origin}/{name}</loc></sitemap>"
+        for name in [*names, "page-sitemap.xml"]
+    )
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<sitemapindex xmlns="{_SITEMAP_NS}">{entries}</sitemapindex>\n'
+    )
+
+
+def render_sitemap(n: int, origin: str, config: StubConfig) -> str:
+    start = (n - 1) * config.sitemap_size
+    ids = range(start, min(start + config.sitemap_size, config.n_reviews))
+    urls = "".join(
+        f"<url><loc>{origin}{review_path(i, config.seed)}</loc>"
+        f"<lastmod>{config.lastmod(i).isoformat()}</lastmod></url>"
+        for i in ids
+    )
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<urlset xmlns="{_SITEMAP_NS}">{urls}</urlset>\n'
+    )
+
+
+def render_page_sitemap(origin: str) -> str:
+    urls = "".join(
+        f"<url><loc>{origin}/{path}</loc></url>"
+        for path in ("", "about/", "review/", "advertise/")
+    )
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<urlset xmlns="{_SITEMAP_NS}">{urls}</urlset>\n'
+    )
+
+
+def render_geocode(query: str) -> list[dict[str, str]]:
+    """A geocode.maps.co-style search answer with made-up, stable coordinates.
+
+    Queries containing "nowhere" get no match, like an unknown place.
+    """
+    if not query.strip() or "nowhere" in query.lower():
+        return []
+    digest = hashlib.blake2b(query.lower().encode(), digest_size=8).digest()
+    lat = int.from_bytes(digest[:4]) / 2**32 * 180 - 90
+    lon = int.from_bytes(digest[4:]) / 2**32 * 360 - 180
+    return [
+        {
+            "lat": f"{lat:.7f}",
+            "lon": f"{lon:.7f}",
+            "display_name": query.title(),
+            "importance": "0.5",
+        }
+    ]
+
+
+class StubSite:
+    """Request handlers plus the fault injection and counters they share."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.statuses: Counter[int] = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.bytes_sent = 0
+
+    def _fault(self) -> web.Response | None:
+        config = self.config
+        roll = self.rng.random()
+        if roll < config.rate_429:
+            return self._too_many()
+        if roll < config.rate_429 + config.rate_5xx:
+            return web.Response(status=self.rng.choice(SERVER_ERRORS))
+        return None
+
+    def _too_many(self) -> web.Response:
+        headers = {}
+        if self.config.retry_after is not None:
+            headers["Retry-After"] = str(self.config.retry_after)
+        return web.Response(status=429, headers=headers)
+
+    def _page(
+        self, request: web.Request, body: str, content_type: str = "text/html"
+    ) -> web.Response:
+        if not self.config.etag:
+            return web.Response(text=body, content_type=content_type)
+        etag = hashlib.blake2b(body.encode(), digest_size=8).hexdigest()
+        if request.headers.get("If-None-Match") == f'"{etag}"':
+            return web.Response(status=304, headers={"ETag": f'"{etag}"'})
+        response = web.Response(text=body, content_type=content_type)
+        response.etag = etag
+        return response
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        if request.path == "/_stats":
+            return await handler(request)
+        capacity = self.config.capacity
+        if capacity is not None and self.in_flight >= capacity:
+            # Turned away on arrival, so a rejected request never holds a slot.
+            response = self._too_many()
+            self.statuses[response.status] += 1
+            return response
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.config.latency > 0:
+                delay = self.config.latency
+                if self.config.latency_sigma > 0:
+                    delay = self.rng.lognormvariate(
+                        math.log(delay), self.config.latency_sigma
+                    )
+                await asyncio.sleep(delay)
+            response = self._fault() or await handler(request)
+        except web.HTTPException as e:  # e.g. 404 for an unknown path
+            self.statuses[e.status] += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.statuses[response.status] += 1
+        self.bytes_sent += response.content_length or 0
+        return response
+
+    async def listing(self, request: web.Request) -> web.Response:
+        page = int(request.match_info.get("page", 1))
+        if not 1 <= page <= self.config.n_pages:
+            return web.Response(status=404)
+        return self._page(request, render_listing(page, self.config))
+
+    async def review(self, request: web.Request) -> web.Response:
+        match = _REVIEW_ID.search(request.match_info["slug"])
+        if match is None or int(match[1]) >= self.config.n_reviews:
+            return web.Response(status=404)
+        if self.config.gone(int(match[1])):
+            return web.Response(status=410)
+        return self._page(request, render_review(int(match[1]), self.config))
+
+    async def sitemap_index(self, request: web.Request) -> web.Response:
+        body = render_sitemap_index(str(request.url.origin()), self.config)
+        return self._page(request, body, "application/xml")
+
+    async def sitemap(self, request: web.Request) -> web.Response:
+        n = int(request.match_info["n"] or 1)
+        if not 1 <= n <= self.config.n_sitemaps:
+            return web.Response(status=404)
+        body = render_sitemap(n, str(request.url.origin()), self.config)
+        return self._page(request, body, "application/xml")
+
+    async def page_sitemap(self, request: web.Request) -> web.Response:
+        body = render_page_sitemap(str(request.url.origin()))
+        return self._page(request, body, "application/xml")
+
+    async def geocode_search(self, request: web.Request) -> web.Response:
+        if not request.query.get("api_key"):
+            return web.json_response({"error": "Missing API Key"}, status=401)
+        body = json.dumps(render_geocode(request.query.get("q", "")))
+        return self._page(request, body, "application/json")
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats_dict())
+
+    def stats_dict(self) -> dict[str, object]:
+        return {
+            "requests": sum(self.statuses.values()),
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "peak_in_flight": self.peak_in_flight,
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+def make_app(config: StubConfig | None = None) -> web.Application:
+    """The stub site as an aiohttp application; its StubSite is ``app["site"]``."""
+    site = StubSite(config or StubConfig())
+    app = web.Application(middlewares=[site.middleware])
+    app["site"] = site
+    app.router.add_get("/_stats", site.stats)
+    app.router.add_get("/review/", site.listing)
+    app.router.add_get(r"/review/page/{page:\d+}/", site.listing)
+    app.router.add_get("/review/{slug}/", site.review)
+    app.router.add_get("/sitemap_index.xml", site.sitemap_index)
+    app.router.add_get(r"/review-sitemap{n:\d*}.xml", site.sitemap)
+    app.router.add_get("/page-sitemap.xml", site.page_sitemap)
+    app.router.add_get("/geocode/search", site.geocode_search)
+    return app
+
+
+async def start(config: StubConfig | None = None) -> web.AppRunner:
+    """Start serving in the running event loop; ``await runner.cleanup()`` stops.
+
+    With ``port=0`` the OS picks a free port; read the bound one from
+    :func:`bound_base_url`.
+    """
+    config = config or StubConfig()
+    runner = web.AppRunner(make_app(config), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, config.host, config.port).start()
+    logger.info("Stub CoffeeReview serving %s", bound_base_url(runner))
+    return runner
+
+
+def bound_base_url(runner: web.AppRunner) -> str:
+    """The ``/review/`` base URL a started runner is actually listening on."""
+    host, port = runner.addresses[0][:2]
+    return f"http://{host}:{port}/review/"
@@ -0,0 +1,264 @@
+"""Synthetic roaster names with known ground truth, for measuring the resolver.
+
+:func:`generate_names` builds a population of roaster entities from real
+naming patterns (a distinctive head such as "Black Oak" or "Kalavera" plus
+trade suffixes such as "Coffee Roasters") and emits noisy spellings of each:
+typos, suffix drift, initialisms, accents, reordering and casing. Every
+spelling carries the id of the entity it came from, so
+:func:`pair_precision_recall` can score any clustering of those spellings
+(e.g. a :func:`coffee.roasters.resolve` crosswalk) against the truth.
+
+Every entity owns its core keys (:func:`coffee.roasters.core_key`): no
+entity's head key equals, or is a token subset of, another's ("Pine" next to
+"Blue Pine" scores 100, see :func:`coffee.roasters.score`), and a variant that
+would normalize onto another entity's key is emitted as its entity's clean
+spelling instead. Such pairs are indistinguishable by construction, so letting
+them through would charge the resolver for the generator's collisions.
+Generation is deterministic for a given ``seed``.
+"""
+
+import random
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+from coffee.roasters import core_key
+
+# Building blocks for entity heads. Real roaster names are mostly an evocative
+# word pair ("Black Oak", "Red Bay"), an invented brand word ("Kalavera"), or a
+# possessive ("Jim's"), followed by some trade suffix.
+# fmt: off
+ADJECTIVES = (
+    "black", "blue", "red", "green", "golden", "silver", "little", "big",
+    "wild", "old", "new", "north", "south", "east", "west", "happy", "lucky",
+    "iron", "copper", "stone", "white", "bright", "dark", "true", "good",
+    "grand", "hidden", "high", "sweet", "quiet", "brave", "rusty", "crimson",
+)
+NOUNS = (
+    "oak", "bay", "bottle", "bear", "fox", "owl", "river", "mountain", "harbor",
+    "anchor", "crow", "wolf", "pine", "cedar", "bird", "rooster", "lantern",
+    "compass", "ridge", "hollow", "valley", "canyon", "forest", "island",
+    "moon", "sun", "star", "tide", "summit", "bridge", "mill", "field", "creek",
+)
+FIRST_NAMES = (
+    "jim", "ana", "kenji", "maria", "olav", "priya", "tomas", "lucia", "sam",
+    "noor", "david", "mei", "ivan", "rosa", "ben", "yuki", "carlos", "lena",
+)
+ONSETS = (
+    "b", "c", "d", "f", "g", "k", "l", "m", "n", "p", "r", "s", "t", "v", "z",
+    "br", "kr", "st", "tr", "ch",
+)
+VOWELS = ("a", "e", "i", "o", "u", "ai", "ou")
+
+# Trade suffixes a real roaster drifts between across pages and years.
+SUFFIXES = (
+    "", "Coffee", "Coffee Roasters", "Coffee Co.", "Coffee Company",
+    "Roasters", "Roasting Co.", "Roastery", "Coffee Roasting Company",
+    "Coffee LLC", "Coffee Roasters, Inc.", "Café",
+)
+# fmt: on
+ACCENTS = {"a": "á", "e": "é", "i": "í", "o": "ó", "u": "ü", "n": "ñ"}
+
+# Relative frequency of each noise channel per emitted variant.
+NOISE_WEIGHTS = {
+    "clean": 4,
+    "suffix": 4,
+    "case": 2,
+    "typo": 3,
+    "accent": 1,
+    "initialism": 1,
+    "reorder": 1,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class SyntheticNames:
+    """Spellings in emission order, plus the entity id each one came from."""
+
+    names: list[str]
+    entity_ids: list[int]
+    canonical: list[str]  # canonical spelling per entity id
+
+    @property
+    def n_entities(self) -> int:
+        return len(self.canonical)
+
+    def truth(self) -> dict[str, int]:
+        """Raw spelling -> entity id.
+
+        Spellings never collide across entities: equal spellings have equal
+        core keys, and each core key belongs to one entity.
+        """
+        out: dict[str, int] = {}
+        for name, eid in zip(self.names, self.entity_ids, strict=True):
+            out.setdefault(name, eid)
+        return out
+
+
+def _pseudo_word(rng: random.Random) -> str:
+    return "".join(
+        rng.choice(ONSETS) + rng.choice(VOWELS) for _ in range(rng.randint(2, 3))
+    )
+
+
+def _head(rng: random.Random) -> str:
+    pattern = rng.random()
+    if pattern < 0.45:
+        words = [rng.choice(ADJECTIVES), rng.choice(NOUNS)]
+    elif pattern < 0.8:
+        words = [_pseudo_word(rng)]
+        if rng.random() < 0.3:
+            words.append(rng.choice(NOUNS))
+    else:
+        words = [rng.choice(FIRST_NAMES) + "'s", rng.choice(NOUNS)]
+    return " ".join(w.capitalize() for w in words)
+
+
+def _typo(rng: random.Random, s: str) -> str:
+    letters = [i for i, c in enumerate(s) if c.isalpha()]
+    if len(letters) < 4:
+        return s
+    i = rng.choice(letters[1:])  # keep the first letter; typos rarely hit it
+    op = rng.randrange(4)
+    if op == 0:  # drop
+        return s[:i] + s[i + 1 :]
+    if op == 1:  # duplicate
+        return s[:i] + s[i] + s[i:]
+    if op == 2 and i + 1 < len(s) and s[i + 1].isalpha():  # transpose
+        return s[:i] + s[i + 1] + s[i] + s[i + 2 :]
+    return s[:i] + rng.choice("aeioulnrst") + s[i + 1 :]  # substitute
+
+
+def _accent(rng: random.Random, s: str) -> str:
+    spots = [i for i, c in enumerate(s) if c in ACCENTS]
+    if not spots:
+        return s
+    i = rng.choice(spots)
+    return s[:i] + ACCENTS[s[i]] + s[i + 1 :]
+
+
+def _initialism(head: str) -> str:
+    words = head.split()
+    if len(words) < 2:
+        return head
+    return ".".join(w[0].upper() for w in words) + "."
+
+
+def _reorder(rng: random.Random, head: str, suffix: str) -> str:
+    words = head.split() + suffix.split()
+    if len(words) < 2:
+        return head
+    rng.shuffle(words)
+    return " ".join(words)
+
+
+def _variant(rng: random.Random, head: str, suffix: str, channel: str) -> str:
+    if channel == "suffix":
+        suffix = rng.choice(SUFFIXES)
+    elif channel == "typo":
+        head = _typo(rng, head)
+    elif channel == "accent":
+        head = _accent(rng, head)
+    elif channel == "initialism":
+        head = _initialism(head)
+    elif channel == "reorder":
+        return _reorder(rng, head, suffix)
+    name = f"{head} {suffix}".strip()
+    if channel == "case":
+        name = rng.choice((str.lower, str.upper, str.title))(name)
+    return name
+
+
+def generate_names(
+    n: int,
+    variants_per_entity: float = 4.0,
+    bases: Sequence[str] | None = None,
+    seed: int = 0,
+) -> SyntheticNames:
+    """Emit `n` noisy roaster spellings drawn from ~n / variants_per_entity entities.
+
+    Entity heads are generated from the patterns above, or taken from `bases`
+    (e.g. real canonical names from a crosswalk) when given, skipping any whose
+    core key has, or is a token subset of, an earlier entity's key. Variants
+    never take another entity's core key either (see the module docstring).
+    Per-entity record counts are skewed (a few roasters are reviewed far more
+    often than most), which is what makes canonical selection meaningful.
+    """
+    rng = random.Random(seed)
+    n_entities = max(1, round(n / variants_per_entity))
+
+    heads: list[str] = []
+    owners: dict[str, int] = {}  # core key -> the entity that emits it
+    by_token: dict[str, list[frozenset[str]]] = {}  # token -> head keys with it
+    pool = list(bases) if bases else []
+    while len(heads) < n_entities:
+        head = pool.pop() if pool else _head(rng)
+        key = core_key(head)
+        words = frozenset(key.split())
+        if any(
+            words <= other or other <= words
+            for token in words
+            for other in by_token.get(token, ())
+        ):
+            continue
+        for token in words:
+            by_token.setdefault(token, []).append(words)
+        owners[key] = len(heads)
+        heads.append(head)
+    suffixes = [rng.choice(SUFFIXES[1:]) for _ in heads]
+    canonical = [f"{h} {s}".strip() for h, s in zip(heads, suffixes, strict=True)]
+
+    channels = list(NOISE_WEIGHTS)
+    weights = list(NOISE_WEIGHTS.values())
+    # Zipf-ish popularity, so some entities dominate like real top roasters.
+    popularity = [1 / (rank + 1) ** 0.8 for rank in range(n_entities)]
+    entity_ids = list(range(n_entities)) + rng.choices(
+        range(n_entities), weights=popularity, k=max(0, n - n_entities)
+    )
+    rng.shuffle(entity_ids)
+
+    names = []
+    for eid in entity_ids:
+        name = _variant(
+            rng, heads[eid], suffixes[eid], rng.choices(channels, weights)[0]
+        )
+        # E.g. the initialism "B.O." of both Black Oak and Blue Owl, or a typo
+        # that lands on a neighbour's head.
+        if owners.setdefault(core_key(name), eid) != eid:
+            name = canonical[eid]
+        names.append(name)
+    return SyntheticNames(names, entity_ids, canonical)
+
+
+def pair_precision_recall(
+    predicted: Iterable[tuple[str, int | str]],
+    truth: dict[str, int],
+) -> tuple[float, float]:
+    """Pairwise merge precision and recall of a clustering of raw spellings.
+
+    `predicted` yields (raw_name, cluster label), e.g. the raw_name and
+    cluster_id columns of a crosswalk. A pair of distinct spellings is a
+    predicted merge if they share a label and a true merge if they share an
+    entity; precision = correct merges / predicted merges and recall =
+    correct merges / true merges, counted from the contingency table rather
+    than by enumerating pairs. Both are 1.0 when there is nothing to merge.
+    """
+    cells: Counter[tuple[int | str, int]] = Counter()
+    for name, label in predicted:
+        cells[label, truth[name]] += 1
+
+    def pairs(counts: Iterable[int]) -> int:
+        return sum(c * (c - 1) // 2 for c in counts)
+
+    by_label: Counter[int | str] = Counter()
+    by_entity: Counter[int] = Counter()
+    for (label, entity), c in cells.items():
+        by_label[label] += c
+        by_entity[entity] += c
+
+    correct = pairs(cells.values())
+    predicted_pairs = pairs(by_label.values())
+    true_pairs = pairs(by_entity.values())
+    precision = correct / predicted_pairs if predicted_pairs else 1.0
+    recall = correct / true_pairs if true_pairs else 1.0
+    return precision, recall
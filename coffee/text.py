@@ -0,0 +1,166 @@
+"""Lemmatize review text with spaCy, cached on disk by content hash.
+
+:func:`prepare_text_spacy` turns a column of review text (e.g.
+``blind_assessment``) into space-joined, lowercased lemmas with stop words and
+non-alphabetic tokens removed, ready for TF-IDF. It differs from running the
+full pipeline in a notebook in three ways:
+
+- Only the components lemmas need are loaded (tok2vec, tagger,
+  attribute_ruler, lemmatizer); the dependency parser and NER are excluded.
+- Uncached texts go through ``nlp.pipe`` with ``n_process``/``batch_size``, so
+  large batches spread across cores.
+- Every result is stored in a SQLite cache keyed by a hash of the text and the
+  settings that produced it, so re-running after a scrape only processes new
+  or changed reviews.
+
+spaCy is part of the ``analysis`` dependency group, so it is imported on first
+use rather than at module import.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+from collections.abc import Iterable, Iterator
+from contextlib import closing
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from coffee.config import Config
+from coffee.profiling import profiled
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+
+logger = logging.getLogger(__name__)
+
+SPACY_MODEL = "en_core_web_sm"
+# Lemmas need POS tags (tagger + attribute_ruler) but nothing structural.
+EXCLUDE = ("parser", "senter", "ner")
+DEFAULT_CACHE = Config.DATA_DIR / "intermediate" / "spacy_lemmas.sqlite"
+DEFAULT_BATCH_SIZE = 256
+
+
+@lru_cache(maxsize=4)
+def load_nlp(model: str = SPACY_MODEL) -> Language:
+    """Load `model` without the components lemmatization doesn't need."""
+    import spacy
+
+    return spacy.load(model, exclude=list(EXCLUDE))
+
+
+def _settings_tag(nlp: Language, filter_adv: bool) -> str:
+    # Anything that changes the output for the same text belongs in the key,
+    # so upgrading the model or flipping an option can't serve stale lemmas.
+    meta = nlp.meta
+    return f"{meta['lang']}_{meta['name']}-{meta['version']}|adv={int(filter_adv)}"
+
+
+def content_hash(text: str, tag: str = "") -> str:
+    """Stable cache key for `text` processed under settings `tag`."""
+    return hashlib.blake2b(f"{tag}\x00{text}".encode(), digest_size=16).hexdigest()
+
+
+class LemmaCache:
+    """On-disk ``content hash -> lemmas`` store backed by a single SQLite file."""
+
+    def __init__(self, path: Path = DEFAULT_CACHE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS lemmas (key TEXT PRIMARY KEY, text TEXT)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, str]:
+        keys = list(set(keys))
+        found: dict[str, str] = {}
+        with closing(self._connect()) as conn:
+            # Stay under SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 900):
+                chunk = keys[start : start + 900]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(
+                    conn.execute(
+                        f"SELECT key, text FROM lemmas WHERE key IN ({placeholders})",
+                        chunk,
+                    ).fetchall()
+                )
+        return found
+
+    def put_many(self, items: Iterable[tuple[str, str]]) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO lemmas VALUES (?, ?)", items)
+
+
+def lemmatize(
+    texts: Iterable[str],
+    nlp: Language,
+    filter_adv: bool = False,
+    n_process: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[str]:
+    """Yield space-joined lowercase lemmas of alphabetic, non-stop-word tokens."""
+    for doc in nlp.pipe(texts, n_process=n_process, batch_size=batch_size):
+        yield " ".join(
+            token.lemma_.lower()
+            for token in doc
+            if token.is_alpha
+            and not token.is_stop
+            and not (filter_adv and token.pos_ == "ADV")
+        )
+
+
+@profiled("text.prepare_text_spacy")
+def prepare_text_spacy(
+    text: pd.Series,
+    filter_adv: bool = False,
+    cache_path: Path | None = DEFAULT_CACHE,
+    n_process: int = -1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    model: str = SPACY_MODEL,
+) -> pd.Series:
+    """Prepare text for TF-IDF vectorization using spaCy.
+
+    Returns lemmatized strings aligned to `text`'s index; missing text becomes
+    "". Results are read from and written to the cache at `cache_path`
+    (``None`` disables caching). Multiple processes are only started when there
+    is more than one batch of uncached text to amortize their startup over.
+    """
+    nlp = load_nlp(model)
+    tag = _settings_tag(nlp, filter_adv)
+    values = text.fillna("").astype(str)
+    keys = [content_hash(t, tag) for t in values]
+
+    cache = LemmaCache(cache_path) if cache_path is not None else None
+    done = cache.get_many(keys) if cache is not None else {}
+
+    # Deduplicate: identical texts are lemmatized once.
+    todo = {k: t for k, t in zip(keys, values, strict=True) if k not in done}
+    if todo:
+        logger.info(
+            "Lemmatizing %d of %d texts (%d cached)",
+            len(todo),
+            len(values),
+            len(values) - len(todo),
+        )
+        procs = n_process if len(todo) > batch_size else 1
+        fresh = dict(
+            zip(
+                todo,
+                lemmatize(todo.values(), nlp, filter_adv, procs, batch_size),
+                strict=True,
+            )
+        )
+        if cache is not None:
+            cache.put_many(fresh.items())
+        done.update(fresh)
+
+    return pd.Series([done[k] for k in keys], index=text.index, dtype=object)
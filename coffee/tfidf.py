@@ -0,0 +1,325 @@
+"""Append-only, memory-mappable TF-IDF feature store for review text.
+
+:class:`TfidfStore` keeps raw term counts for every review on disk, keyed by
+review URL, and derives TF-IDF from them on read. Nothing is ever refit:
+
+- The vocabulary only grows. A new term gets the next column index, so rows
+  written earlier stay valid (they just have no entries in the new columns).
+- Document frequencies are maintained alongside the vocabulary, so IDF is
+  always current for the whole corpus without revisiting old rows.
+- Counts are written in batches as segments of plain ``.npy`` CSR arrays
+  (``data``/``indices``/``indptr``), which :func:`numpy.load` memory-maps.
+
+TF-IDF weighting and row normalization match
+``TfidfVectorizer(stop_words="english")`` (smooth IDF, L2 norm), and all
+aggregates — mean or summed TF-IDF per term — are computed on the sparse
+matrix; nothing is densified to reviews x vocabulary.
+
+Tokenization reuses scikit-learn's analyzer, imported on first use since
+scikit-learn is in the ``analysis`` dependency group.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, diags, vstack
+
+from coffee.config import Config
+from coffee.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE = Config.DATA_DIR / "processed" / "tfidf_store"
+DEFAULT_BATCH_SIZE = 5_000
+
+
+def _replace(path: Path, write: Callable[[BinaryIO], object]) -> None:
+    """Write `path` through a temporary file, so it is never half-written."""
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _replace_text(path: Path, text: str) -> None:
+    _replace(path, lambda f: f.write(text.encode()))
+
+
+def _build_analyzer(stop_words: str | None) -> Callable[[str], list[str]]:
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    return CountVectorizer(stop_words=stop_words).build_analyzer()
+
+
+class TfidfStore:
+    """Term counts per review URL on disk, with TF-IDF computed on read.
+
+    Layout of the store directory::
+
+        meta.json          segment names, doc count, vocabulary size, number
+                           of stored entries, analyzer settings
+        vocabulary.json    terms, in column order
+        df.npy             document frequency per column
+        segments/NNNNNN/   data.npy, indices.npy, indptr.npy, urls.json
+
+    Every file is replaced atomically and meta.json is written last on every
+    append; meta.json is what commits it. An append interrupted before then
+    leaves an orphaned segment directory (overwritten by the next append) and
+    possibly a vocabulary and document frequencies that already count it. On
+    load the vocabulary is cut back to the size meta.json records, and
+    document frequencies that don't add up to its entry count are recounted
+    from the listed segments, so the store never disagrees with itself.
+    """
+
+    def __init__(self, path: Path = DEFAULT_STORE, stop_words: str | None = "english"):
+        self.path = Path(path)
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            self.stop_words = meta["stop_words"]
+            self.segment_names: list[str] = meta["segments"]
+            self.n_docs: int = meta["n_docs"]
+            terms: list[str] = json.loads((self.path / "vocabulary.json").read_text())
+            # Terms only ever append, so any past n_terms are uncommitted.
+            self.terms = terms[: meta.get("n_terms", len(terms))]
+            self.df = np.load(self.path / "df.npy")
+            # Each stored (row, term) entry adds one to one document frequency.
+            if len(self.df) != len(self.terms) or (
+                "nnz" in meta and int(self.df.sum()) != meta["nnz"]
+            ):
+                logger.warning("Recounting document frequencies of %s", self.path)
+                self.df = self._recount_df()
+        else:
+            self.stop_words = stop_words
+            self.segment_names = []
+            self.n_docs = 0
+            self.terms = []
+            self.df = np.zeros(0, dtype=np.int64)
+        self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+        self._urls: dict[str, int] | None = None
+        self._analyzer: Callable[[str], list[str]] | None = None
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def __contains__(self, url: object) -> bool:
+        return url in self.urls
+
+    @property
+    def analyzer(self) -> Callable[[str], list[str]]:
+        """Text -> terms, with the settings the store was created with."""
+        if self._analyzer is None:
+            self._analyzer = _build_analyzer(self.stop_words)
+        return self._analyzer
+
+    @property
+    def urls(self) -> dict[str, int]:
+        """Review URL -> row number across all segments (built on first use)."""
+        if self._urls is None:
+            self._urls = {}
+            for name in self.segment_names:
+                for url in self._segment_urls(name):
+                    self._urls[url] = len(self._urls)
+        return self._urls
+
+    # -- writing -------------------------------------------------------------
+
+    @profiled("tfidf.append")
+    def append(
+        self,
+        records: Iterable[tuple[str, str]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> int:
+        """Add ``(url, text)`` records in batches; return how many were added.
+
+        URLs already in the store are skipped, as are duplicates within
+        `records` — a review's features are written once. Missing text is
+        stored as an empty row so the review still has a row.
+        """
+        urls = self.urls
+        records = iter(records)
+        added = 0
+        while batch := list(islice(records, batch_size)):
+            fresh: dict[str, str] = {}
+            for url, text in batch:
+                if url not in urls and url not in fresh:
+                    fresh[url] = text if isinstance(text, str) else ""
+            if fresh:
+                self._write_segment(list(fresh), list(fresh.values()))
+                added += len(fresh)
+        if added:
+            logger.info(
+                "Added %d reviews to %s (%d total)", added, self.path, len(self)
+            )
+        return added
+
+    def _count(
+        self, texts: Iterable[str], grow: bool
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """CSR (data, indices, indptr) of term counts for `texts`.
+
+        With `grow`, unseen terms are added to the vocabulary; otherwise they
+        are dropped, as a fitted vectorizer would drop them.
+        """
+        indptr = [0]
+        indices: list[int] = []
+        data: list[int] = []
+        for text in texts:
+            counts: dict[int, int] = {}
+            for term in self.analyzer(text):
+                col = self.vocabulary.get(term)
+                if col is None:
+                    if not grow:
+                        continue
+                    col = self.vocabulary[term] = len(self.terms)
+                    self.terms.append(term)
+                counts[col] = counts.get(col, 0) + 1
+            cols = sorted(counts)
+            indices += cols
+            data += (counts[c] for c in cols)
+            indptr.append(len(indices))
+        return (
+            np.asarray(data, dtype=np.int32),
+            np.asarray(indices, dtype=np.int32),
+            np.asarray(indptr, dtype=np.int64),
+        )
+
+    def _write_segment(self, urls: list[str], texts: list[str]) -> None:
+        data, indices, indptr = self._count(texts, grow=True)
+        df = np.zeros(len(self.terms), dtype=np.int64)
+        df[: len(self.df)] = self.df
+        # Each (row, term) appears once per row, so counting columns counts docs.
+        df += np.bincount(indices, minlength=len(self.terms))
+
+        name = f"{len(self.segment_names):06d}"
+        seg = self.path / "segments" / name
+        seg.mkdir(parents=True, exist_ok=True)
+        np.save(seg / "data.npy", data)
+        np.save(seg / "indices.npy", indices)
+        np.save(seg / "indptr.npy", indptr)
+        (seg / "urls.json").write_text(json.dumps(urls))
+
+        self.df = df
+        _replace(self.path / "df.npy", lambda f: np.save(f, df))
+        _replace_text(self.path / "vocabulary.json", json.dumps(self.terms))
+        self.segment_names.append(name)
+        self.n_docs += len(urls)
+        for url in urls:
+            self.urls[url] = len(self.urls)
+        # Last: this is what commits the segment.
+        _replace_text(
+            self.path / "meta.json",
+            json.dumps(
+                {
+                    "segments": self.segment_names,
+                    "n_docs": self.n_docs,
+                    "n_terms": len(self.terms),
+                    "nnz": int(df.sum()),
+                    "stop_words": self.stop_words,
+                }
+            ),
+        )
+
+    def _recount_df(self) -> np.ndarray:
+        """Document frequencies counted from the listed segments alone."""
+        df = np.zeros(len(self.terms), dtype=np.int64)
+        for name in self.segment_names:
+            indices = np.load(
+                self.path / "segments" / name / "indices.npy", mmap_mode="r"
+            )
+            df += np.bincount(indices, minlength=len(self.terms))
+        return df
+
+    # -- reading -------------------------------------------------------------
+
+    def _segment_urls(self, name: str) -> list[str]:
+        return json.loads((self.path / "segments" / name / "urls.json").read_text())
+
+    def _segment_counts(self, name: str) -> csr_matrix:
+        seg = self.path / "segments" / name
+        data, indices, indptr = (
+            np.load(seg / f"{part}.npy", mmap_mode="r")
+            for part in ("data", "indices", "indptr")
+        )
+        # Earlier segments were written against a smaller vocabulary; widening
+        # the shape is all it takes, since their indices are still valid.
+        return csr_matrix(
+            (data, indices, indptr), shape=(len(indptr) - 1, len(self.terms))
+        )
+
+    def idf(self) -> np.ndarray:
+        """Smooth IDF per column, as TfidfVectorizer computes it."""
+        return np.log((1 + self.n_docs) / (1 + self.df)) + 1.0
+
+    def _weight(self, counts: csr_matrix, idf: np.ndarray) -> csr_matrix:
+        weighted = (counts.astype(np.float32) @ diags(idf.astype(np.float32))).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return (diags(1 / norms) @ weighted).tocsr()
+
+    def iter_segments(
+        self, tfidf: bool = True
+    ) -> Iterator[tuple[list[str], csr_matrix]]:
+        """Yield ``(urls, matrix)`` per segment, for streaming consumers.
+
+        Counts are memory-mapped; with ``tfidf=True`` each segment is weighted
+        with the current corpus-wide IDF, one segment in memory at a time.
+        """
+        idf = self.idf()
+        for name in self.segment_names:
+            counts = self._segment_counts(name)
+            yield (
+                self._segment_urls(name),
+                self._weight(counts, idf) if tfidf else counts,
+            )
+
+    def matrix(self, tfidf: bool = True) -> csr_matrix:
+        """All reviews as one sparse matrix, rows in :attr:`urls` order."""
+        parts = [m for _, m in self.iter_segments(tfidf)]
+        if not parts:
+            return csr_matrix((0, len(self.terms)), dtype=np.float32)
+        return vstack(parts, format="csr")
+
+    def rows(self, urls: Iterable[str], tfidf: bool = True) -> csr_matrix:
+        """The rows for `urls`, in the order given."""
+        return self.matrix(tfidf)[[self.urls[u] for u in urls]]
+
+    def transform(self, texts: Iterable[str]) -> csr_matrix:
+        """TF-IDF rows for unstored `texts` against the current vocabulary.
+
+        Read-only: terms the store has never seen are dropped, exactly as a
+        fitted TfidfVectorizer would drop them.
+        """
+        texts = (t if isinstance(t, str) else "" for t in texts)
+        data, indices, indptr = self._count(texts, grow=False)
+        counts = csr_matrix(
+            (data, indices, indptr), shape=(len(indptr) - 1, len(self.terms))
+        )
+        return self._weight(counts, self.idf())
+
+    def term_stats(self) -> pd.DataFrame:
+        """Per-term document frequency and summed / mean TF-IDF, sorted by sum.
+
+        Accumulated segment by segment with sparse column sums, so the cost is
+        one segment plus one vocabulary-length vector at a time.
+        """
+        total = np.zeros(len(self.terms), dtype=np.float64)
+        for _, segment in self.iter_segments(tfidf=True):
+            total += np.asarray(segment.sum(axis=0)).ravel()
+        return pd.DataFrame(
+            {
+                "df": self.df,
+                "tfidf_sum": total,
+                "tfidf_mean": total / max(self.n_docs, 1),
+            },
+            index=pd.Index(self.terms, name="term"),
+        ).sort_values("tfidf_sum", ascending=False)
@@ -0,0 +1,128 @@
+"""Benchmark roaster resolution on synthetic names with known ground truth.
+
+Runs :func:`coffee.roasters.resolve` over generated spellings at each size and
+reports wall time, peak memory, pairs scored, and pairwise merge precision and
+recall, so performance work and threshold changes are measured together.
+
+Each size runs in a fresh worker process, so peak RSS is that run's alone and
+nothing (caches, allocator high-water marks) leaks from one size to the next.
+"""
+
+import argparse
+import json
+import logging
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from coffee.commands.options import positive_int
+from coffee.roasters import LINKAGES, resolve
+from coffee.synthetic_roasters import generate_names, pair_precision_recall
+
+logger = logging.getLogger(__name__)
+
+# resolve() scores every pair of distinct core keys, so time grows with the
+# square of the size: 100k names take ~100x as long as 10k. Pass -n for that.
+DEFAULT_SIZES = (1_000, 10_000)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_once(
+    n: int,
+    auto_threshold: int,
+    review_threshold: int,
+    linkage: str,
+    seed: int,
+) -> dict[str, Any]:
+    """Generate `n` names, resolve them, and measure the run."""
+    synthetic = generate_names(n, seed=seed)
+    baseline_mb = _peak_rss_mb()
+
+    start = time.perf_counter()
+    crosswalk, review = resolve(
+        synthetic.names, auto_threshold, review_threshold, linkage
+    )
+    wall = time.perf_counter() - start
+
+    precision, recall = pair_precision_recall(
+        zip(crosswalk["raw_name"], crosswalk["cluster_id"], strict=True),
+        synthetic.truth(),
+    )
+    n_keys = crosswalk["core_key"].nunique()
+    return {
+        "n_names": n,
+        "n_entities": synthetic.n_entities,
+        "n_spellings": len(crosswalk),
+        "n_keys": n_keys,
+        # score_edges() evaluates every (row, column) of the key x key matrix.
+        "pairs_scored": n_keys * n_keys,
+        "n_clusters": crosswalk["cluster_id"].nunique(),
+        "n_review": len(review),
+        "wall_s": round(wall, 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "resolve_rss_mb": round(_peak_rss_mb() - baseline_mb, 1),
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n",
+        "--sizes",
+        type=positive_int,
+        nargs="+",
+        default=list(DEFAULT_SIZES),
+        help="Numbers of raw names to resolve, one run each.",
+    )
+    parser.add_argument("--auto", type=int, default=92, help="auto_threshold")
+    parser.add_argument("--review", type=int, default=82, help="review_threshold")
+    parser.add_argument("--linkage", choices=LINKAGES, default="single")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="Optional JSON file to write the results to.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    args = parse_args()
+
+    results = []
+    for n in args.sizes:
+        logger.info("Resolving %d synthetic names", n)
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(
+                run_once, n, args.auto, args.review, args.linkage, args.seed
+            ).result()
+        logger.info("%s", result)
+        results.append(result)
+
+    columns = list(results[0])
+    print("\t".join(columns))
+    for result in results:
+        print("\t".join(str(result[c]) for c in columns))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+        logger.info("Wrote results to %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Benchmark the scraper end to end against the local stub CoffeeReview server.
+
+For each site size, starts ``coffee stub-server`` in a subprocess (so the
+server doesn't compete with the scraper's event loop), runs
+:func:`coffee.commands.scrape_reviews.scrape_all_reviews` against it into a
+temporary directory, and reports wall time, reviews per second, how many
+reviews were lost, and the server's view: requests (so retries), status
+counts, and peak requests in flight (backpressure). Latency and fault rates
+are passed through to the server.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+
+from coffee.commands.options import positive_int
+from coffee.commands.scrape_reviews import scrape_all_reviews
+from coffee.storage import open_dataset
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (1_000, 10_000)
+STARTUP_TIMEOUT = 10.0
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(port: int) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"stub server did not start on port {port}")
+
+
+async def _stats(base_url: str) -> dict[str, Any]:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(base_url.replace("/review/", "/_stats")) as response:
+            return await response.json()
+
+
+def benchmark(n_reviews: int, args: argparse.Namespace) -> dict[str, Any]:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}/review/"
+    server_args = [
+        "--port",
+        str(port),
+        "--reviews",
+        str(n_reviews),
+        "--latency",
+        str(args.latency),
+        "--rate-429",
+        str(args.rate_429),
+        "--rate-5xx",
+        str(args.rate_5xx),
+        "--padding",
+        str(args.padding),
+    ]
+    if args.capacity:
+        server_args += ["--capacity", str(args.capacity)]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "coffee", "stub-server", *server_args],
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for(port)
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            asyncio.run(
+                scrape_all_reviews(
+                    Path(tmp),
+                    args.concurrency,
+                    dataset_dir=Path(tmp) / "reviews",
+                    base_url=base_url,
+                )
+            )
+            elapsed = time.perf_counter() - start
+            dataset = Path(tmp) / "reviews"
+            scraped = open_dataset(dataset).count_rows() if dataset.exists() else 0
+        stats = asyncio.run(_stats(base_url))
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "reviews": n_reviews,
+        "scraped": scraped,
+        "seconds": round(elapsed, 2),
+        "reviews_per_s": round(scraped / elapsed, 1),
+        "requests": stats["requests"],
+        "statuses": stats["statuses"],
+        "peak_in_flight": stats["peak_in_flight"],
+        "max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n",
+        "--sizes",
+        type=positive_int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Site sizes (number of reviews) to benchmark.",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=positive_int,
+        default=10,
+        help="Scraper concurrency.",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Median stub response delay in seconds (log-normal).",
+    )
+    parser.add_argument(
+        "--rate-429",
+        type=float,
+        default=0.0,
+        help="Share of stub requests given 429.",
+    )
+    parser.add_argument(
+        "--rate-5xx",
+        type=float,
+        default=0.0,
+        help="Share of stub requests given a 5xx.",
+    )
+    parser.add_argument(
+        "--capacity",
+        type=int,
+        help="Concurrent requests the stub serves before answering 429 "
+        "(default: no cap).",
+    )
+    parser.add_argument(
+        "--padding",
+        type=int,
+        default=0,
+        help="Filler bytes per stub page, to mimic the real site's page size.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="Optional JSON file to write the results to.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    args = parse_args()
+
+    results = []
+    for n in args.sizes:
+        print(f"Scraping a {n:,}-review stub site...", file=sys.stderr)
+        results.append(benchmark(n, args))
+
+    columns = list(results[0])
+    print("\t".join(columns))
+    for result in results:
+        print("\t".join(str(result[c]) for c in columns))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+        logger.info("Wrote results to %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
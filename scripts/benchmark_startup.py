@@ -0,0 +1,166 @@
+"""Guard the ``coffee`` command's startup time against eager imports.
+
+Runs ``python -m coffee [COMMAND] --help`` for the top level and every
+subcommand in fresh interpreters and reports, per invocation:
+
+- the best and median wall time over several runs, and the overhead above a
+  bare ``python -c pass``;
+- which heavy dependencies (pandas, aiohttp, pyarrow, ...) got imported,
+  from one run under ``-X importtime``.
+
+Exits non-zero if any invocation imports a heavy dependency or its overhead
+exceeds ``--budget-ms``, so it can run in CI or a pre-push hook. The import
+check is the reliable signal; wall time varies with the machine, which is
+why the budget is generous by default.
+
+Staying light means commands copy some library defaults rather than import
+them, so it also fails if a copy no longer matches its source (see
+:mod:`coffee.commands.options`).
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from coffee.cli import COMMANDS
+from coffee.commands.options import mirror_mismatches
+
+logger = logging.getLogger(__name__)
+
+# Third-party packages no --help path should need. dotenv is here because
+# .env loading is deferred to the first API-key access.
+HEAVY_MODULES = (
+    "aiohttp",
+    "bs4",
+    "dotenv",
+    "lxml",
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "rapidfuzz",
+    "requests",
+    "scipy",
+    "sklearn",
+    "spacy",
+    "tqdm",
+)
+DEFAULT_REPEAT = 7
+DEFAULT_BUDGET_MS = 150.0
+
+
+def _wall_ms(argv: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(argv, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def imported_modules(argv: list[str]) -> set[str]:
+    """Top-level names of every module `argv` imports, via -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv[1:]],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    names = set()
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            names.add(name.split(".")[0])
+    return names
+
+
+def measure(command: list[str], repeat: int, baseline_ms: float) -> dict[str, Any]:
+    argv = [sys.executable, "-m", "coffee", *command, "--help"]
+    times = [_wall_ms(argv) for _ in range(repeat)]
+    heavy = sorted(imported_modules(argv) & set(HEAVY_MODULES))
+    return {
+        "invocation": " ".join(["coffee", *command, "--help"]),
+        "best_ms": round(min(times), 1),
+        "median_ms": round(statistics.median(times), 1),
+        "overhead_ms": round(min(times) - baseline_ms, 1),
+        "heavy_imports": ",".join(heavy) or "-",
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Runs per invocation; the best is compared to the budget.",
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help="Maximum startup overhead over a bare interpreter, in ms.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="Optional JSON file to write the results to.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    args = parse_args()
+
+    baseline_ms = min(
+        _wall_ms([sys.executable, "-c", "pass"]) for _ in range(args.repeat)
+    )
+    logger.info("Bare interpreter startup: %.1f ms", baseline_ms)
+    results = [
+        measure(command, args.repeat, baseline_ms)
+        for command in ([], *([name] for name in COMMANDS))
+    ]
+
+    columns = list(results[0])
+    print("\t".join(columns))
+    for result in results:
+        print("\t".join(str(result[c]) for c in columns))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+        logger.info("Wrote results to %s", args.output)
+
+    failures = [
+        r
+        for r in results
+        if r["heavy_imports"] != "-" or r["overhead_ms"] > args.budget_ms
+    ]
+    for r in failures:
+        logger.error(
+            "%s: %.1f ms over the interpreter (budget %.0f), heavy imports: %s",
+            r["invocation"],
+            r["overhead_ms"],
+            args.budget_ms,
+            r["heavy_imports"],
+        )
+
+    # After the timings: this imports the heavy modules into this process.
+    mismatches = mirror_mismatches()
+    for message in mismatches:
+        logger.error("Mirrored default drifted: %s", message)
+    if failures or mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+from coffee.pipeline import RAN, SKIPPED, Pipeline, Stage
+
+# Copies the queue's rows to the output, then empties the queue to its header.
+_DRAIN = (
+    "import sys; q, out = sys.argv[1:]; lines = open(q).readlines(); "
+    "open(out, 'a').writelines(lines[1:]); open(q, 'w').write(lines[0])"
+)
+
+
+def _pipeline(tmp_path) -> tuple[Pipeline, Path]:
+    queue, out = tmp_path / "queue.csv", tmp_path / "out.csv"
+    queue.write_text("name\nfoo\n")
+    stage = Stage(
+        "drain",
+        (sys.executable, "-c", _DRAIN, str(queue), str(out)),
+        inputs=(queue,),
+        outputs=(out,),
+        consumes=(queue,),
+    )
+    return Pipeline([stage], state=tmp_path / "state.json"), queue
+
+
+def test_emptied_queue_is_up_to_date(tmp_path):
+    pipeline, _ = _pipeline(tmp_path)
+
+    assert pipeline.run(jobs=1) == {"drain": RAN}
+    reloaded = Pipeline(list(pipeline.stages.values()), state=pipeline.state_path)
+    assert reloaded.run(jobs=1) == {"drain": SKIPPED}
+
+
+def test_new_queue_entries_rerun(tmp_path):
+    pipeline, queue = _pipeline(tmp_path)
+    pipeline.run(jobs=1)
+
+    queue.write_text("name\nbar\n")
+
+    assert pipeline.run(jobs=1) == {"drain": RAN}
+    assert (tmp_path / "out.csv").read_text() == "foo\nbar\n"
@@ -0,0 +1,29 @@
+from coffee.storage import PARTITION_COLUMN, load_reviews, upsert_reviews
+
+
+def _review(url: str, date: str | None, rating: int) -> dict:
+    return {"url": url, "title": url, "review date": date, "rating": rating}
+
+
+def _stored(root) -> list[tuple]:
+    df = load_reviews(root, columns=["url", "rating", PARTITION_COLUMN])
+    return sorted(df.astype(object).where(df.notna(), None).itertuples(index=False))
+
+
+def test_upsert_moves_undated_review_to_its_year(tmp_path):
+    root = tmp_path / "reviews"
+    upsert_reviews([_review("a", None, 90), _review("b", "May 2020", 91)], root)
+
+    upsert_reviews([_review("a", "July 2024", 93)], root)
+
+    assert _stored(root) == [("a", 93, 2024), ("b", 91, 2020)]
+    assert not list(root.glob(f"{PARTITION_COLUMN}=__HIVE_DEFAULT_PARTITION__/*"))
+
+
+def test_upsert_keeps_other_undated_reviews(tmp_path):
+    root = tmp_path / "reviews"
+    upsert_reviews([_review("a", None, 90), _review("b", None, 91)], root)
+
+    upsert_reviews([_review("a", "July 2024", 93)], root)
+
+    assert _stored(root) == [("a", 93, 2024), ("b", 91, None)]